@@ -0,0 +1,136 @@
+"""
+Benchmarks of rst2html5.
+
+They are not part of the package and are run from the repository root::
+
+    $ python -m benchmarks.corpus
+
+Results can be saved as JSON to compare releases or changes (see :mod:`benchmarks.corpus`).
+"""
+
+import gc
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import docutils
+import pygments
+
+from rst2html5 import __version__
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+# the benchmarks also run on releases that lack these modules
+try:
+    from rst2html5.highlight import highlight_cache
+except ImportError:
+    highlight_cache = None  # type: ignore[assignment]
+try:
+    from rst2html5.memory import format_size
+except ImportError:
+
+    def format_size(size: float) -> str:
+        return f'{size:,.0f} B'
+
+
+KIB = 1024
+
+
+def clear_highlight_cache() -> None:
+    """
+    Empty the highlighting cache of the releases that have one
+    """
+    if highlight_cache is not None:
+        highlight_cache.clear()
+
+
+def environment() -> Dict[str, Any]:
+    """
+    Versions and platform the results were measured on
+    """
+    return {
+        'rst2html5': __version__,
+        'docutils': docutils.__version__,
+        'pygments': pygments.__version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+    }
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of ``values``. ``fraction`` is between 0 and 1.
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return math.nan
+    rank = max(math.ceil(fraction * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def timed(func: Callable[[], Any]) -> Tuple[float, Any]:
+    """
+    Call ``func`` and return the time it took in seconds and its result
+    """
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def peak_memory(func: Callable[[], Any]) -> int:
+    """
+    Peak of memory allocated by Python while ``func`` runs, in bytes
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def max_rss() -> Optional[int]:
+    """
+    Maximum resident set size of the process in bytes, if the platform reports it
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * KIB
+
+
+def format_table(header: Sequence[str], rows: Sequence[Sequence[Any]]) -> str:
+    """
+    Plain text table. The first column is aligned to the left and the others to the right.
+    """
+    lines = [list(map(str, header))] + [list(map(str, row)) for row in rows]
+    widths = [max(len(line[i]) for line in lines) for i in range(len(header))]
+    return '\n'.join(
+        '  '.join(
+            cell.ljust(width) if i == 0 else cell.rjust(width)
+            for i, (cell, width) in enumerate(zip(line, widths))
+        ).rstrip()
+        for line in lines
+    )
+
+
+def save_json(result: Dict[str, Any], path: str) -> None:
+    if path == '-':
+        json.dump(result, sys.stdout, indent=2)
+        print()
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+        f.write('\n')
@@ -0,0 +1,246 @@
+"""
+End-to-end benchmark of :class:`rst2html5.HTML5Writer` on the test corpus.
+
+The corpus is made of every case in ``tests/cases.py``
+and of the docutils functional inputs in ``tests/docutils_functional_test``.
+Each document is converted by :func:`docutils.core.publish_string`,
+as ``rst2html5`` does for a single file, ``--repeat`` times after a warm-up pass.
+
+Usage::
+
+    $ python -m benchmarks.corpus
+    $ python -m benchmarks.corpus --repeat 50 --json results-2.0.1.json
+    $ python -m benchmarks.corpus --compare results-2.0.1.json
+    $ python -m benchmarks.corpus --filter 'table*' --json -
+
+The report gives documents and source bytes converted per second,
+the p50 and p99 latencies of single conversions
+and the peak memory allocated while converting each document, measured by :mod:`tracemalloc`
+in a separate pass so that tracing does not slow down the timed ones.
+The highlighting cache is cleared before each conversion unless ``--warm-cache`` is given,
+so that repeating a document does not turn its code blocks into cache hits.
+"""
+
+import argparse
+import fnmatch
+import gc
+import json
+import os
+import runpy
+import sys
+from io import StringIO
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from docutils.core import publish_string
+
+from rst2html5 import HTML5Writer
+
+from . import (
+    clear_highlight_cache,
+    environment,
+    format_size,
+    format_table,
+    max_rss,
+    peak_memory,
+    percentile,
+    save_json,
+    timed,
+)
+
+TESTS = Path(__file__).resolve().parent.parent / 'tests'
+FUNCTIONAL_TESTS = TESTS / 'docutils_functional_test'
+# keys of a test case that are not settings
+CASE_KEYS = ('rst', 'part', 'out', 'error')
+
+
+class Document(NamedTuple):
+    name: str
+    source: str
+    source_path: Optional[str] = None
+    overrides: Dict[str, Any] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self.source.encode('utf-8'))
+
+
+def load_corpus(pattern: str = '*') -> List[Document]:
+    """
+    Documents of the test corpus whose name matches the glob ``pattern``
+    """
+    cases = runpy.run_path(str(TESTS / 'cases.py'))
+    documents = [
+        Document(
+            f'cases/{name}',
+            case['rst'],
+            overrides={key: value for key, value in case.items() if key not in CASE_KEYS},
+        )
+        for name, case in sorted(cases.items())
+        if not name.startswith('__') and isinstance(case, dict)
+    ]
+    paths = [FUNCTIONAL_TESTS / 'html4css1.rst', *sorted(FUNCTIONAL_TESTS.glob('data/*.txt'))]
+    for path in paths:
+        name = path.relative_to(FUNCTIONAL_TESTS).as_posix()
+        documents.append(Document(name, path.read_text(encoding='utf-8'), str(path)))
+    return [
+        document
+        for document in documents
+        if fnmatch.fnmatch(document.name, pattern)
+        or fnmatch.fnmatch(document.name.rpartition('/')[2], pattern)
+    ]
+
+
+def convert(document: Document, clear_cache: bool = True) -> bytes:
+    if clear_cache:
+        clear_highlight_cache()
+    overrides = {**document.overrides, 'warning_stream': StringIO()}
+    return publish_string(
+        document.source,
+        source_path=document.source_path,
+        writer=HTML5Writer(),
+        settings_overrides=overrides,
+    )
+
+
+def run(
+    documents: Sequence[Document], repeat: int = 10, clear_cache: bool = True
+) -> Dict[str, Any]:
+    """
+    Convert each document ``repeat`` times and return the results
+    """
+    # the test cases refer to files of the tests directory
+    cwd = os.getcwd()
+    os.chdir(TESTS)
+    try:
+        # warm-up
+        output_sizes = {
+            document.name: len(convert(document, clear_cache)) for document in documents
+        }
+        latencies: Dict[str, List[float]] = {document.name: [] for document in documents}
+        gc.collect()
+        for _ in range(repeat):
+            for document in documents:
+                elapsed, _ = timed(lambda: convert(document, clear_cache))  # noqa: B023
+                latencies[document.name].append(elapsed)
+        peaks = {
+            document.name: peak_memory(lambda: convert(document, clear_cache))  # noqa: B023
+            for document in documents
+        }
+    finally:
+        os.chdir(cwd)
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    total_time = sum(all_latencies)
+    total_bytes = sum(document.size for document in documents) * repeat
+    return {
+        'environment': environment(),
+        'repeat': repeat,
+        'warm_cache': not clear_cache,
+        'summary': {
+            'documents': len(documents),
+            'conversions': len(all_latencies),
+            'total_time': total_time,
+            'documents_per_second': len(all_latencies) / total_time if total_time else None,
+            'bytes_per_second': total_bytes / total_time if total_time else None,
+            'p50': percentile(all_latencies, 0.5),
+            'p99': percentile(all_latencies, 0.99),
+            'peak_memory': max(peaks.values(), default=0),
+            'max_rss': max_rss(),
+        },
+        'documents': {
+            document.name: {
+                'size': document.size,
+                'output_size': output_sizes[document.name],
+                'p50': percentile(latencies[document.name], 0.5),
+                'p99': percentile(latencies[document.name], 0.99),
+                'min': min(latencies[document.name], default=None),
+                'peak_memory': peaks[document.name],
+            }
+            for document in documents
+        },
+    }
+
+
+def format_report(result: Dict[str, Any], top: int = 10) -> str:
+    summary = result['summary']
+    lines = [
+        f'{summary["documents"]} documents, {summary["conversions"]} conversions '
+        f'in {summary["total_time"]:.3f}s',
+        f'documents/s: {summary["documents_per_second"]:.1f}',
+        f'bytes/s:     {format_size(summary["bytes_per_second"])}',
+        f'p50:         {summary["p50"] * 1000:.3f} ms',
+        f'p99:         {summary["p99"] * 1000:.3f} ms',
+        f'peak memory: {format_size(summary["peak_memory"])}',
+    ]
+    if summary['max_rss'] is not None:
+        lines.append(f'max RSS:     {format_size(summary["max_rss"])}')
+    slowest = sorted(result['documents'].items(), key=lambda item: item[1]['p50'], reverse=True)
+    rows = [
+        (
+            name,
+            format_size(stats['size']),
+            f'{stats["p50"] * 1000:.3f}',
+            f'{stats["p99"] * 1000:.3f}',
+            format_size(stats['peak_memory']),
+        )
+        for name, stats in slowest[:top]
+    ]
+    lines += ['', format_table(('slowest documents', 'size', 'p50 ms', 'p99 ms', 'peak'), rows)]
+    return '\n'.join(lines)
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any]) -> str:
+    """
+    Change of the summary metrics relative to ``baseline``
+    """
+    rows = []
+    for metric in ('documents_per_second', 'bytes_per_second', 'p50', 'p99', 'peak_memory'):
+        old = baseline['summary'].get(metric)
+        new = result['summary'].get(metric)
+        change = f'{(new - old) / old:+.1%}' if old and new is not None else '-'
+        rows.append(
+            (
+                metric,
+                f'{old:.6g}' if old is not None else '-',
+                f'{new:.6g}' if new is not None else '-',
+                change,
+            )
+        )
+    versions = f'{baseline["environment"]["rst2html5"]} -> {result["environment"]["rst2html5"]}'
+    return format_table(
+        (f'compared to baseline ({versions})', 'baseline', 'current', 'change'), rows
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.corpus',
+        description='End-to-end benchmark of HTML5Writer on the test corpus.',
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=10, help='conversions of each document. Default: 10'
+    )
+    parser.add_argument('--filter', default='*', help='glob selecting documents by name')
+    parser.add_argument('--json', metavar='PATH', help='save the results as JSON. "-" is stdout')
+    parser.add_argument('--compare', metavar='PATH', help='JSON results to compare with')
+    parser.add_argument(
+        '--warm-cache', action='store_true', help='keep the highlighting cache between conversions'
+    )
+    args = parser.parse_args(argv)
+    documents = load_corpus(args.filter)
+    if not documents:
+        parser.error(f'no document matches {args.filter!r}')
+    result = run(documents, args.repeat, clear_cache=not args.warm_cache)
+    report = sys.stderr if args.json == '-' else sys.stdout
+    print(format_report(result), file=report)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print('\n' + compare(result, json.load(f)), file=report)
+    if args.json:
+        save_json(result, args.json)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
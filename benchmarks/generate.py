@@ -0,0 +1,257 @@
+"""
+Generator of synthetic reStructuredText documents of controllable size and shape.
+
+Each shape repeats one construct ``size`` times,
+so that the cost of the construct can be measured at growing sizes::
+
+    >>> from benchmarks.generate import generate
+    >>> print(generate('option_list', 2), end='')
+    Options
+    =======
+    <BLANKLINE>
+    -a, --option-0=<value0>  Description of option 0.
+    -b, --option-1=<value1>  Description of option 1.
+    <BLANKLINE>
+
+The output is deterministic: the same shape and size always give the same document.
+Generated documents can also be written to a file::
+
+    $ python -m benchmarks.generate api_reference 5000 -o api.rst
+    $ python -m benchmarks.generate --list
+"""
+
+import argparse
+import sys
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+LANGUAGES = ('python', 'bash', 'json', 'c')
+
+
+class Shape(NamedTuple):
+    name: str
+    function: Callable[[int], str]
+    # smallest size worth measuring
+    start: int
+    description: str
+
+
+SHAPES: Dict[str, Shape] = {}
+
+
+def shape(start: int) -> Callable[[Callable[[int], str]], Callable[[int], str]]:
+    """
+    Register a generator function. Its docstring is the description of the shape.
+    """
+
+    def register(function: Callable[[int], str]) -> Callable[[int], str]:
+        name = function.__name__
+        SHAPES[name] = Shape(name, function, start, (function.__doc__ or '').strip())
+        return function
+
+    return register
+
+
+def generate(name: str, size: int) -> str:
+    """
+    Document of shape ``name`` that repeats its construct ``size`` times
+    """
+    return SHAPES[name].function(size)
+
+
+def _title(text: str, char: str = '=') -> str:
+    return f'{text}\n{char * len(text)}\n\n'
+
+
+def _paragraph(i: int) -> str:
+    return (
+        f'Paragraph {i} has *emphasis*, **strong text**, ``literal {i}``, '
+        f'an anonymous `reference <https://example.com/{i}>`__ and a sentence '
+        f'long enough to wrap over more than one line of text in the source.\n\n'
+    )
+
+
+def _code(i: int, language: str) -> str:
+    if language == 'python':
+        return f'def function_{i}(value):\n    """Docstring {i}"""\n    return value * {i} + 1\n'
+    if language == 'bash':
+        return f'for file in *.rst; do\n    rst2html5 "$file" > "out_{i}_$file.html"\ndone\n'
+    if language == 'json':
+        return f'{{\n    "id": {i},\n    "name": "item {i}",\n    "tags": ["a", "b"]\n}}\n'
+    return f'int function_{i}(int value) {{\n    return value * {i} + 1;\n}}\n'
+
+
+def _indent(text: str, prefix: str = '    ') -> str:
+    return ''.join(prefix + line if line.strip() else line for line in text.splitlines(True))
+
+
+@shape(start=100)
+def paragraphs(size: int) -> str:
+    """Paragraphs with inline markup and hyperlinks"""
+    return _title('Paragraphs') + ''.join(_paragraph(i) for i in range(size))
+
+
+@shape(start=50)
+def api_reference(size: int) -> str:
+    """Generated API reference: a section per function with signature, fields and an example"""
+    parts = [_title('API Reference')]
+    for i in range(size):
+        parts.append(
+            _title(f'module_{i // 10}.function_{i}', '-')
+            + f'.. _function-{i}:\n\n'
+            + f'``function_{i}(value, *, option=None)``\n\n'
+            + _paragraph(i)
+            + f':param value: value to transform, see function-{i}_.\n'
+            + ':param option: optional setting.\n'
+            + ':returns: the transformed value.\n'
+            + ':raises ValueError: if the value is invalid.\n\n'
+            + 'Example::\n\n'
+            + _indent(f'>>> function_{i}(2)\n{2 * i + 1}\n')
+            + '\n'
+        )
+    return ''.join(parts)
+
+
+@shape(start=50)
+def sections(size: int) -> str:
+    """Sections nested six levels deep, over and over again"""
+    chars = '=-~^"+'
+    parts = []
+    for i in range(size):
+        level = i % len(chars)
+        parts.append(_title(f'Section {i}', chars[level]) + f'Text of section {i}.\n\n')
+    return ''.join(parts)
+
+
+@shape(start=250)
+def table(size: int) -> str:
+    """Grid table with ``size`` rows"""
+    border = '+' + '-' * 12 + '+' + '-' * 22 + '+' + '-' * 12 + '+\n'
+    header = '+' + '=' * 12 + '+' + '=' * 22 + '+' + '=' * 12 + '+\n'
+    rows = [border, '| Key        | Description          | Value      |\n', header]
+    for i in range(size):
+        description = f'description *{i}*'
+        rows.append(f'| key {i:<6} | {description:<20} | {i * 7:<10} |\n')
+        rows.append(border)
+    return _title('Table') + ''.join(rows) + '\n'
+
+
+@shape(start=250)
+def list_table(size: int) -> str:
+    """list-table with ``size`` rows"""
+    rows = ['.. list-table:: Values\n    :header-rows: 1\n\n']
+    rows.append('    * - Key\n      - Description\n      - Value\n')
+    for i in range(size):
+        rows.append(f'    * - key {i}\n      - description *{i}*\n      - {i * 7}\n')
+    return _title('List Table') + ''.join(rows) + '\n'
+
+
+@shape(start=50)
+def nested_list(size: int) -> str:
+    """Bullet and enumerated lists nested eight levels deep"""
+    parts = []
+    for i in range(size):
+        for depth in range(8):
+            marker = '-' if depth % 2 else '#.'
+            parts.append('  ' * depth * 2 + f'{marker} item {i}.{depth} with *text*\n\n')
+    return _title('Nested Lists') + ''.join(parts)
+
+
+@shape(start=50)
+def block_quotes(size: int) -> str:
+    """Block quotes nested eight levels deep"""
+    parts = []
+    for i in range(size):
+        for depth in range(8):
+            parts.append('    ' * depth + f'Quote {i}.{depth} with *text*.\n\n')
+        parts.append('..\n\n')
+    return _title('Block Quotes') + ''.join(parts)
+
+
+@shape(start=25)
+def code_blocks(size: int) -> str:
+    """Highlighted code blocks, all different, in several languages"""
+    parts = [_title('Code Blocks')]
+    for i in range(size):
+        language = LANGUAGES[i % len(LANGUAGES)]
+        parts.append(f'.. code-block:: {language}\n\n' + _indent(_code(i, language)) + '\n')
+    return ''.join(parts)
+
+
+@shape(start=100)
+def line_blocks(size: int) -> str:
+    """Line blocks with nested lines"""
+    parts = []
+    for i in range(size):
+        parts.append(f'| Line {i}\n|     indented line {i}\n|         more indented {i}\n\n')
+    return _title('Line Blocks') + ''.join(parts)
+
+
+@shape(start=100)
+def citations(size: int) -> str:
+    """Citations and their references"""
+    references = ''.join(f'Reference to [CIT{i}]_.\n\n' for i in range(size))
+    definitions = ''.join(f'.. [CIT{i}] Citation {i}.\n' for i in range(size))
+    return _title('Citations') + references + definitions + '\n'
+
+
+@shape(start=100)
+def option_list(size: int) -> str:
+    """Option list with ``size`` options"""
+    options = ''.join(
+        f'-{chr(ord("a") + i % 26)}, --option-{i}=<value{i}>  Description of option {i}.\n'
+        for i in range(size)
+    )
+    return _title('Options') + options + '\n'
+
+
+@shape(start=50)
+def figures(size: int) -> str:
+    """Figures with captions and legends"""
+    parts = [_title('Figures')]
+    for i in range(size):
+        parts.append(
+            f'.. figure:: image_{i}.png\n    :alt: image {i}\n    :width: 200px\n\n'
+            f'    Caption of figure {i}.\n\n    Legend of figure {i}.\n\n'
+        )
+    return ''.join(parts)
+
+
+@shape(start=100)
+def targets(size: int) -> str:
+    """Hyperlink targets, internal and external, and references to them"""
+    parts = [_title('Targets')]
+    for i in range(size):
+        parts.append(
+            f'.. _internal-{i}:\n\nParagraph {i} refers to internal-{i}_ and external-{i}_.\n\n'
+            f'.. _external-{i}: https://example.com/{i}\n\n'
+        )
+    return ''.join(parts)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.generate',
+        description='Generate a synthetic reStructuredText document.',
+    )
+    parser.add_argument('shape', nargs='?', choices=sorted(SHAPES), help='shape of the document')
+    parser.add_argument('size', nargs='?', type=int, help='number of repetitions of its construct')
+    parser.add_argument('-o', '--output', help='output file. Default: stdout')
+    parser.add_argument('--list', action='store_true', help='list the shapes and exit')
+    args = parser.parse_args(argv)
+    if args.list:
+        for name in sorted(SHAPES):
+            print(f'{name:16} {SHAPES[name].description}')
+        return 0
+    if args.shape is None or args.size is None:
+        parser.error('shape and size are required')
+    document = generate(args.shape, args.size)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(document)
+    else:
+        sys.stdout.write(document)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Scaling benchmark of :class:`rst2html5.HTML5Writer` on generated documents.
+
+Each shape of :mod:`benchmarks.generate` is converted at doubling sizes.
+The time and peak memory of each size show how the cost grows with the document.
+For each shape, the growth exponent is the slope of log(time) over log(size):
+about 1 for a linear cost and 2 for a quadratic one.
+Shapes whose exponent is above ``--threshold`` are reported as super-linear.
+
+Usage::
+
+    $ python -m benchmarks.scaling
+    $ python -m benchmarks.scaling --steps 6 table api_reference
+    $ python -m benchmarks.scaling --json scaling.json
+
+The time of each size is the best of ``--repeat`` conversions.
+The peak memory is measured by :mod:`tracemalloc` in a separate conversion.
+"""
+
+import argparse
+import math
+import sys
+from io import StringIO
+from typing import Any, Dict, List, Optional, Sequence
+
+from docutils.core import publish_string
+
+from rst2html5 import HTML5Writer
+
+from . import (
+    clear_highlight_cache,
+    environment,
+    format_size,
+    format_table,
+    peak_memory,
+    save_json,
+    timed,
+)
+from .generate import SHAPES, generate
+
+
+def convert(source: str) -> bytes:
+    clear_highlight_cache()
+    return publish_string(
+        source,
+        writer=HTML5Writer(),
+        settings_overrides={'warning_stream': StringIO(), 'traceback': True},
+    )
+
+
+def growth_exponent(sizes: Sequence[float], values: Sequence[float]) -> float:
+    """
+    Least squares slope of log(values) over log(sizes)
+    """
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(value) for value in values]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    if not variance:
+        return math.nan
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance
+
+
+def measure_shape(
+    name: str, steps: int = 4, repeat: int = 3, start: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Convert the shape ``name`` at ``steps`` doubling sizes
+    """
+    size = start or SHAPES[name].start
+    convert(generate(name, size))  # warm-up
+    results = []
+    for _ in range(steps):
+        source = generate(name, size)
+        elapsed = min(timed(lambda: convert(source))[0] for _ in range(repeat))  # noqa: B023
+        results.append(
+            {
+                'size': size,
+                'lines': source.count('\n'),
+                'bytes': len(source.encode('utf-8')),
+                'time': elapsed,
+                'peak_memory': peak_memory(lambda: convert(source)),  # noqa: B023
+            }
+        )
+        size *= 2
+    sizes = [result['size'] for result in results]
+    return {
+        'description': SHAPES[name].description,
+        'steps': results,
+        'time_exponent': growth_exponent(sizes, [result['time'] for result in results]),
+        'memory_exponent': growth_exponent(sizes, [result['peak_memory'] for result in results]),
+    }
+
+
+def run(
+    names: Sequence[str], steps: int = 4, repeat: int = 3, threshold: float = 1.25
+) -> Dict[str, Any]:
+    shapes = {name: measure_shape(name, steps, repeat) for name in names}
+    return {
+        'environment': environment(),
+        'steps': steps,
+        'repeat': repeat,
+        'threshold': threshold,
+        'shapes': shapes,
+        'super_linear': sorted(
+            name for name, shape in shapes.items() if shape['time_exponent'] > threshold
+        ),
+    }
+
+
+def format_report(result: Dict[str, Any]) -> str:
+    blocks = []
+    for name, shape in result['shapes'].items():
+        rows = []
+        previous: Optional[Dict[str, Any]] = None
+        for step in shape['steps']:
+            rows.append(
+                (
+                    step['size'],
+                    step['lines'],
+                    format_size(step['bytes']),
+                    f'{step["time"] * 1000:.2f}',
+                    f'{step["time"] / step["size"] * 1e6:.1f}',
+                    f'{step["time"] / previous["time"]:.2f}' if previous else '-',
+                    format_size(step['peak_memory']),
+                    f'{step["peak_memory"] / previous["peak_memory"]:.2f}' if previous else '-',
+                )
+            )
+            previous = step
+        header = (name, 'lines', 'bytes', 'ms', 'µs/unit', 'x time', 'peak', 'x peak')
+        flag = '  SUPER-LINEAR' if name in result['super_linear'] else ''
+        blocks.append(
+            f'{shape["description"]}\n'
+            + format_table(header, rows)
+            + f'\ngrowth exponent: time {shape["time_exponent"]:.2f}, '
+            f'memory {shape["memory_exponent"]:.2f}{flag}'
+        )
+    return '\n\n'.join(blocks)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.scaling',
+        description='Scaling benchmark of HTML5Writer on generated documents.',
+    )
+    parser.add_argument(
+        'shapes', nargs='*', metavar='shape', help='shapes to measure. Default: all'
+    )
+    parser.add_argument('--steps', type=int, default=4, help='number of doubling sizes. Default: 4')
+    parser.add_argument(
+        '--repeat', type=int, default=3, help='conversions of each size. Default: 3'
+    )
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=1.25,
+        help='growth exponent above which a shape is super-linear. Default: 1.25',
+    )
+    parser.add_argument('--json', metavar='PATH', help='save the results as JSON. "-" is stdout')
+    args = parser.parse_args(argv)
+    unknown = sorted(set(args.shapes) - set(SHAPES))
+    if unknown:
+        parser.error(
+            f'unknown shapes: {", ".join(unknown)}. Choose from {", ".join(sorted(SHAPES))}'
+        )
+    names = args.shapes or sorted(SHAPES)
+    result = run(names, args.steps, args.repeat, args.threshold)
+    report = sys.stderr if args.json == '-' else sys.stdout
+    print(format_report(result), file=report)
+    if result['super_linear']:
+        print(f'\nsuper-linear: {", ".join(result["super_linear"])}', file=report)
+    if args.json:
+        save_json(result, args.json)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
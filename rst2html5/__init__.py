@@ -2,11 +2,12 @@ import re
 import sys
 from collections import OrderedDict
 from importlib import metadata
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 
 import docutils
-from docutils import nodes, writers
-from docutils.frontend import OptionParser, Values
+from docutils import languages, nodes, writers
+from docutils.frontend import OptionParser, Values, validate_comma_separated_list
+from docutils.io import FileOutput, Output
 from docutils.nodes import (
     Bibliographic,
     Text,
@@ -55,11 +56,14 @@ from docutils.nodes import (
 from docutils.nodes import Element as NodeElement
 from docutils.transforms import Transform
 from docutils.utils.math import pick_math_environment
-from genshi.builder import Element, Fragment, tag
-from genshi.core import Markup
-from genshi.output import XHTMLSerializer
 
 from . import directives, roles  # noqa: F401
+from .builder import SERIALIZERS, Element, Fragment, Markup, serialize, tag
+from .directives import get_setting
+from .memory import get_memory_profiler
+from .profiling import get_profile
+from .stats import StartTransforms, count_nodes, get_timer, phase
+from .tracing import get_tracer, now
 
 __docformat__ = 'reStructuredText'
 try:
@@ -187,6 +191,7 @@ def _script_callback_option_parser(
 
 class HTML5Writer(writers.Writer):
     supported = ('html', 'html5', 'html5css3')
+    parts: Dict[str, Any]  # type: ignore[assignment]
 
     config_section = 'html5writer'
     config_section_dependencies = 'writers'
@@ -299,6 +304,129 @@ class HTML5Writer(writers.Writer):
                     'action': 'append',
                 },
             ),
+            (
+                "Don't compute the pseudoxml part. "
+                'It is a dump of the whole doctree, as large as the document.',
+                ['--no-pseudoxml'],
+                {
+                    'default': True,
+                    'action': 'store_false',
+                    'dest': 'pseudoxml_part',
+                },
+            ),
+            (
+                'Write the output file while the document is translated, section by section, '
+                'instead of building the whole document in memory. '
+                'The output is the same. It only applies when the destination is a file.',
+                ['--stream'],
+                {
+                    'default': False,
+                    'action': 'store_true',
+                },
+            ),
+            (
+                'HTML serializer: "native" or "genshi". '
+                'Both produce the same output but the native one is faster. '
+                'Default: native.',
+                ['--serializer'],
+                {
+                    'metavar': '<native|genshi>',
+                    'default': 'native',
+                    'type': 'choice',
+                    'choices': SERIALIZERS,
+                },
+            ),
+            (
+                'SQLite file where highlighted code blocks are cached. '
+                'The cache is shared by parallel processes and successive runs.',
+                ['--highlight-cache'],
+                {
+                    'metavar': '<path>',
+                    'default': None,
+                },
+            ),
+            (
+                'Maximum size in bytes of the highlight cache. '
+                'The least recently used entries are discarded beyond it. '
+                'Default: 64 MiB.',
+                ['--highlight-cache-size'],
+                {
+                    'metavar': '<bytes>',
+                    'default': 64 * 1024 * 1024,
+                    'type': 'int',
+                },
+            ),
+            (
+                'Comma separated list of languages whose Pygments lexers are loaded '
+                'when a worker process starts. '
+                '(This option can be used multiple times)',
+                ['--highlight-preload'],
+                {
+                    'metavar': '<language[,language,...]>',
+                    'default': None,
+                    'action': 'append',
+                    'validator': validate_comma_separated_list,
+                },
+            ),
+            (
+                'Measure the wall and CPU time of each conversion phase '
+                '(parse, transforms, translate, serialize, template and write). '
+                'They are returned as the "stats" part and printed to stderr by the command line.',
+                ['--stats'],
+                {
+                    'default': False,
+                    'action': 'store_true',
+                },
+            ),
+            (
+                'Count and time the calls to each visit and depart handler of the translator '
+                'and to the code-block directive. They are returned as the "profile" part '
+                'and printed to stderr by the command line.',
+                ['--profile'],
+                {
+                    'default': False,
+                    'action': 'store_true',
+                },
+            ),
+            (
+                'Write a trace of the conversion phases, transforms and top-level sections '
+                'to a JSON file in the Chrome Trace Event Format.',
+                ['--trace'],
+                {
+                    'metavar': '<path>',
+                    'default': None,
+                },
+            ),
+            (
+                'Trace the memory allocated while parsing, translating, serializing and '
+                'applying the template. The peak, retained memory and top allocation sites '
+                'of each phase are returned as the "memory" part '
+                'and printed to stderr by the command line.',
+                ['--memory-profile'],
+                {
+                    'default': False,
+                    'action': 'store_true',
+                },
+            ),
+            (
+                'Append a JSON line to this file for each document whose conversion takes '
+                'longer than --slow-threshold, with its phase times and most expensive node types.',
+                ['--slow-log'],
+                {
+                    'metavar': '<path>',
+                    'default': None,
+                },
+            ),
+            (
+                'Conversion time in seconds above which a document goes to the slow log. '
+                'Default: 1.',
+                ['--slow-threshold'],
+                {
+                    'metavar': '<seconds>',
+                    'default': 1.0,
+                    'type': 'float',
+                },
+            ),
         ),
     )
 
@@ -312,15 +440,57 @@ class HTML5Writer(writers.Writer):
     def __init__(self) -> None:
         writers.Writer.__init__(self)
         self.translator_class = HTML5Translator
+        self.stream: Optional[Callable[[str], Any]] = None
 
-    def translate(self) -> None:
-        self.parts['pseudoxml'] = self.document.pformat()  # get pseudoxml before HTML5.translate
-        self.document.reporter.debug(
-            '%s pseudoxml:\n %s' % (self.__class__.__name__, self.parts['pseudoxml'])
+    def write(self, document: document, destination: Output) -> Any:
+        """
+        With ``--stream``, the output is written to the destination file while it is translated.
+        """
+        self.document = document
+        self.language = languages.get_language(  # type: ignore[assignment]
+            document.settings.language_code, document.reporter
         )
+        self.destination = destination
+        timer = get_timer(document)
+        if timer is not None and 'transforms' in timer.marks:
+            timer.add('transforms', timer.marks.pop('transforms'))
+        if not (document.settings.stream and isinstance(destination, FileOutput)):
+            self.translate()
+            with phase(document, 'write'):
+                return destination.write(self.output)  # type: ignore[arg-type]
+        # the file must stay open between writes
+        autoclose, destination.autoclose = destination.autoclose, False
+        self.stream = destination.write
+        if timer is not None:
+            self.stream = _counting_writes(destination.write, timer)
+        try:
+            self.translate()
+        finally:
+            self.stream = None
+            destination.autoclose = autoclose
+            if autoclose:
+                destination.close()
+        return self.output
+
+    def translate(self) -> None:
+        reporter = self.document.reporter
+        self.parts.pop('pseudoxml', None)
+        if self.document.settings.pseudoxml_part or reporter.debug_flag:
+            # get pseudoxml before HTML5.translate
+            self.parts['pseudoxml'] = self.document.pformat()
+            if reporter.debug_flag:
+                reporter.debug(f'{self.__class__.__name__} pseudoxml:\n {self.parts["pseudoxml"]}')
         visitor = self.translator_class(self.document)
-        self.document.walkabout(visitor)
-        self.output = visitor.output
+        timer = get_timer(self.document)  # type: ignore[arg-type]
+        if timer is not None:
+            timer.count('nodes', count_nodes(self.document))  # type: ignore[arg-type]
+        if self.stream is not None:
+            visitor.start_streaming(self.stream)
+        with phase(self.document, 'translate'):  # type: ignore[arg-type]
+            self.document.walkabout(visitor)
+        self.output = visitor.output if self.stream is None else ''
+        if timer is not None and self.stream is None:
+            timer.count('output_bytes', len(self.output.encode('utf-8')))
         self.head = visitor.head
         self.body = visitor.body
         self.title = visitor.title
@@ -332,17 +502,85 @@ class HTML5Writer(writers.Writer):
         self.parts['body'] = self.body
         self.parts['title'] = self.title
         self.parts['docinfo'] = self.docinfo
+        self.parts.pop('stats', None)
+        settings = self.document.settings  # type: ignore[union-attr]
+        # the slow log also measures the documents without the stats and profile settings
+        timer = get_timer(self.document)  # type: ignore[arg-type]
+        if timer is not None and settings.stats:
+            self.parts['stats'] = timer.as_dict()
+        self.parts.pop('profile', None)
+        profile = get_profile(self.document)  # type: ignore[arg-type]
+        if profile is not None and settings.profile:
+            self.parts['profile'] = profile.as_dict()
+        self.parts.pop('trace', None)
+        tracer = get_tracer(self.document)  # type: ignore[arg-type]
+        if tracer is not None:
+            self.parts['trace'] = tracer.events
+        self.parts.pop('memory', None)
+        memory = get_memory_profiler(self.document)  # type: ignore[arg-type]
+        if memory is not None:
+            memory.finish()
+            self.parts['memory'] = memory.as_dict()
 
     def get_transforms(self) -> List[Transform]:
         return writers.Writer.get_transforms(self) + [
+            StartTransforms,
             FooterToBottom,
             WrapTopTitle,
         ]
 
 
+def _counting_writes(write: Callable[[str], Any], timer: Any) -> Callable[[str], Any]:
+    def counting_write(data: str) -> Any:
+        timer.count('output_bytes', len(data.encode('utf-8')))
+        return write(data)
+
+    return counting_write
+
+
 StackElement = Union[Fragment, Element, str, Markup]
 
 
+class TableState:
+    """
+    State of a table being translated
+    """
+
+    __slots__ = ('th_required', 'th_available', 'in_thead')
+
+    def __init__(self) -> None:
+        self.th_required = 0  # number of stub columns
+        self.th_available = 0  # stub cells still due in the current row
+        self.in_thead = False
+
+
+class RenderState:
+    """
+    Mutable state of the translation of a single document.
+
+    Everything that changes while the doctree is walked is kept here,
+    so that neither the translator class nor the document settings are changed
+    and settings can be shared by documents translated at the same time.
+    """
+
+    def __init__(self, heading_level: int = 0) -> None:
+        self.heading_level = heading_level
+        self.saved_heading_levels: List[int] = []
+        # greater than zero inside literals, whose spaces are kept as they are
+        self.preserve_space = 0
+        # cleared by elements whose ids must not become anchors. It is reset by the next element
+        self.expand_id_to_anchor = True
+        self.tables: List[TableState] = []
+        self.line_block_level = 0
+        self.line_level = -1
+        self.option_level = 0
+        self.has_math_script = False
+
+    def pop_expand_id_to_anchor(self) -> bool:
+        expand, self.expand_id_to_anchor = self.expand_id_to_anchor, True
+        return expand
+
+
 class ElemStack:
 
     """
@@ -354,6 +592,8 @@ class ElemStack:
         self.indent_level = 0
         self.indent_output = settings.indent_output
         self.indent_width = settings.tab_width
+        # the native serializer renders each element as soon as it is complete
+        self.render_on_commit = getattr(settings, 'serializer', 'native') == 'native'
 
     def _indent_elem(self, element: StackElement, indent: bool) -> List:
         result = []
@@ -396,11 +636,28 @@ class ElemStack:
         """
         pop = self.stack.pop()
         elem(*pop)
+        if self.render_on_commit and isinstance(elem, Element):
+            elem.render()
         self.indent_level -= 1
         self.append(elem, indent)
 
+    def pop_completed(self, final: bool = False) -> Fragment:
+        """
+        Remove and return the items of the current context that can be serialized already.
+        Unless ``final``, trailing text is kept since it is joined to the text that follows it.
+        """
+        completed = Fragment()(self.stack[-1])
+        children = completed.children
+        pending = []
+        if not final:
+            while children and not isinstance(children[-1], Element):
+                pending.append(children.pop())
+            pending.reverse()
+        self.stack[-1] = [pending] if pending else []
+        return completed
+
     def pop(self) -> Element:
-        return self.pop_elements(1)[0]
+        return self.pop_elements(1)[0]  # type: ignore[return-value]
 
     def pop_elements(self, num_elements: int) -> List[StackElement]:
         assert num_elements > 0
@@ -532,7 +789,7 @@ class HTML5Translator(nodes.NodeVisitor):
             False,
         ),
         'revision': (None, 'visit_bibliographic_field', None),
-        'row': ('tr', 'visit_row', 'depart_row'),
+        'row': ('tr', 'visit_row', dp),
         'rubric': ('p', dv, 'depart_rubric', True),
         'section': ('section', 'visit_section', 'depart_section'),
         'sidebar': ('aside', 'visit_aside', 'depart_aside', True),
@@ -559,46 +816,129 @@ class HTML5Translator(nodes.NodeVisitor):
         'warning': ('aside', 'visit_aside', 'depart_aside', True),
     }
 
+    # docutils attributes renamed to their HTML counterparts. None means the attribute is dropped
+    attribute_map: Dict[str, Optional[str]] = {
+        'refuri': 'href',
+        'uri': 'src',
+        'refid': 'href',
+        'morerows': 'rowspan',
+        'morecols': 'colspan',
+        'classes': 'class',
+        'ids': 'id',
+        'names': None,
+        'dupnames': None,
+        'bullet': None,
+        'enumtype': None,
+        'colwidth': None,
+        'stub': None,
+        'backrefs': None,
+        'auto': None,
+        'anonymous': None,
+    }
+
+    _dispatch_table: Dict[type, Tuple[Callable, Callable]]
+    _parse_plans: Dict[type, Tuple[str, bool, bool]]
+
+    # marks the position of the body in the template while streaming
+    _body_placeholder = '\x00body\x00'
+
     default_template = (
         '<!DOCTYPE html>\n<html{html_attr}>\n' '<head>{head}</head>\n<body>{body}</body>\n</html>'
     )
 
-    def _map_terms_to_functions(self) -> None:
+    @classmethod
+    def _resolve_handlers(cls, node_class: type) -> Tuple[Callable, Callable]:
         """
-        Map terms to visit and departure functions
+        Find the visit and departure functions of a node class.
+        ``rst_terms`` takes precedence over ``visit_<term>`` and ``depart_<term>`` methods.
+        The result is stored in the dispatch table of the translator class.
         """
-        for term, spec in self.rst_terms.items():
-            visit_func = spec[1] and getattr(self, str(spec[1]), self.unknown_visit)
-            depart_func = spec[2] and getattr(self, str(spec[2]), self.unknown_departure)
-            if visit_func:
-                setattr(self, 'visit_' + term, visit_func)
-            if depart_func:
-                setattr(self, 'depart_' + term, depart_func)
+        term = node_class.__name__
+        spec = cls.rst_terms.get(term, (None, None, None))
+        visit = getattr(cls, str(spec[1] or 'visit_' + term), cls.unknown_visit)
+        depart = getattr(cls, str(spec[2] or 'depart_' + term), cls.unknown_departure)
+        handlers = cls._dispatch_table[node_class] = (visit, depart)
+        return handlers
+
+    @classmethod
+    def _compile_parse_plan(cls, node_class: type) -> Tuple[str, bool, bool]:
+        """
+        Tag name, class name insertion and indentation of a node class according to ``rst_terms``.
+        The result is stored in the parse plans of the translator class.
+        """
+        term = node_class.__name__
+        spec = cls.rst_terms[term]
+        tag_name = str(spec[0] or term)
+        use_name_in_class = bool(len(spec) > 3 and spec[3])
+        indent = bool(spec[4]) if len(spec) > 4 else True
+        plan = cls._parse_plans[node_class] = (tag_name, use_name_in_class, indent)
+        return plan
+
+    def dispatch_visit(self, node: nodes.Node) -> Any:
+        node_class = node.__class__
+        handlers = self._dispatch_table.get(node_class) or self._resolve_handlers(node_class)
+        return handlers[0](self, node)
+
+    def dispatch_departure(self, node: nodes.Node) -> Any:
+        node_class = node.__class__
+        handlers = self._dispatch_table.get(node_class) or self._resolve_handlers(node_class)
+        result = handlers[1](self, node)
+        if self.streamed and self.streamed[-1][0] == len(self.context.stack):
+            self._flush()
+        return result
+
+    def __getattr__(self, name: str) -> Callable:
+        """
+        ``visit_<term>`` and ``depart_<term>`` of terms mapped by ``rst_terms``
+        are not real methods but they are still reachable as attributes.
+        """
+        action, _, term = name.partition('_')
+        spec = self.rst_terms.get(term)
+        if spec and action in ('visit', 'depart'):
+            func = spec[1] if action == 'visit' else spec[2]
+            if func:
+                return getattr(self, str(func))
+        raise AttributeError(f'{self.__class__.__name__!r} object has no attribute {name!r}')
 
     def __init__(self, document: document) -> None:
         nodes.NodeVisitor.__init__(self, document)
-        self.heading_level = int(getattr(self.document.settings, 'initial_header_level', 0))
-        if self.heading_level > 0:
-            self.heading_level -= 1
+        cls = self.__class__
+        if '_dispatch_table' not in cls.__dict__:
+            # one table per class since subclasses might change rst_terms or handlers
+            cls._dispatch_table = {}
+            cls._parse_plans = {}
+        heading_level = int(getattr(self.document.settings, 'initial_header_level', 0))
+        self.state = RenderState(max(heading_level - 1, 0))
         self.context = ElemStack(document.settings)
         self.docinfo: Dict = OrderedDict()
+        self.stream_write: Optional[Callable[[str], Any]] = None
+        # (context depth, tag name, indent) of the elements being streamed
+        self.streamed: List[Tuple[int, str, bool]] = []
+        self._template_suffix: Optional[str] = None
+        self.tracer = get_tracer(document)
+        self._section_start = 0.0
+        profile = get_profile(document)
+        if profile is not None:
+            wrap = profile.wrap
+            self.dispatch_visit = wrap('visit', self.dispatch_visit)  # type: ignore[method-assign]
+            self.dispatch_departure = wrap('depart', self.dispatch_departure)  # type: ignore[method-assign]
         self._parse_params()
-        self._map_terms_to_functions()
 
     def _parse_params(self) -> None:
         self.metatags = [tag.meta(charset=self.document.settings.output_encoding)]
         self.stylesheets = []
-        stylesheets = self.document.settings.stylesheet or []
+        stylesheets = get_setting(self.document, 'stylesheet') or []
         for href in stylesheets:
             self.stylesheets.append(tag.link(rel='stylesheet', href=href))
         stylesheets_inline = []
-        for path in self.document.settings.stylesheet_inline or []:
+        for path in get_setting(self.document, 'stylesheet_inline') or []:
             with open(path) as f:
                 stylesheets_inline.append(f.read())
+            self.document.settings.record_dependencies.add(path)
         if stylesheets_inline:
             self.stylesheets.append(tag.style(Markup(''.join(stylesheets_inline))))
         self.scripts = []
-        scripts = self.document.settings.script or []
+        scripts = get_setting(self.document, 'script') or []
         for src, attributes in scripts:
             script = tag.script(src=src)
             if attributes:
@@ -606,7 +946,7 @@ class HTML5Translator(nodes.NodeVisitor):
             self.scripts.append(script)
 
     def _get_template(self) -> str:
-        template = self.document.settings.template
+        template = get_setting(self.document, 'template')
         if not template:
             return self.default_template
         import os
@@ -614,27 +954,29 @@ class HTML5Translator(nodes.NodeVisitor):
         if os.path.isfile(template):
             from io import open
 
+            self.document.settings.record_dependencies.add(template)
             with open(template, 'r', encoding='utf-8') as template_file:
                 return template_file.read()
         else:
             return template
 
-    def _get_template_values(self) -> Dict[str, Any]:
+    def _get_template_values(self, body: Optional[str] = None) -> Dict[str, Any]:
         html_attrs = self.document.settings.html_tag_attr
         html_attrs = html_attrs and ' ' + ' '.join(html_attrs) or ''
-        head = self.metatags + self.stylesheets + self.scripts
+        head: List[StackElement] = [*self.metatags, *self.stylesheets, *self.scripts]
         for key, value in self.docinfo.items():
             head.append(tag.meta(content=value, name=key))
         # indent head
         if self.document.settings.indent_output:
             indent = '\n' + ' ' * self.document.settings.tab_width
-            result = []
+            result: List[StackElement] = []
             for f in head:
                 result.append(tag(indent, f))
             result.append('\n')
             head = result
-        self.head = ''.join(XHTMLSerializer()(tag(*head)))
-        self.body = ''.join(XHTMLSerializer()(tag(*self.context.stack)))
+        method = self.document.settings.serializer
+        self.head = serialize(tag(*head), method)
+        self.body = serialize(tag(*self.context.stack), method) if body is None else body
         values = {}
         values['html_attr'] = html_attrs
         values['head'] = self.head
@@ -643,71 +985,125 @@ class HTML5Translator(nodes.NodeVisitor):
 
     @property
     def output(self) -> str:
-        template = self._get_template()
-        values = self._get_template_values()
-        return template.format(**values)
+        with phase(self.document, 'serialize'):
+            values = self._get_template_values()
+        with phase(self.document, 'template'):
+            return self._get_template().format(**values)
+
+    #
+    # streaming
+    #
+
+    def start_streaming(self, write: Callable[[str], Any]) -> None:
+        """
+        Pass the output to ``write`` while the document is translated.
+        The body is written as soon as its top elements are complete
+        and sections are opened as they are visited,
+        so only the section being translated is kept in memory.
+
+        The head is written first.
+        Thus, the nodes that contribute to it are processed beforehand.
+        """
+        self.stream_write = write
+        self._collect_head(self.document)
+
+    def _collect_head(self, node: NodeElement) -> None:
+        for child in list(node.children):
+            if isinstance(child, (nodes.math, nodes.math_block)):
+                self._add_math_script()
+            elif isinstance(child, (nodes.meta, nodes.field)) or (
+                isinstance(child, nodes.Bibliographic) and not isinstance(child, nodes.docinfo)
+            ):
+                try:
+                    self.dispatch_visit(child)
+                except nodes.SkipNode:
+                    pass
+                if isinstance(child, nodes.meta):
+                    node.remove(child)  # already in self.metatags
+            elif isinstance(child, nodes.Element) and not isinstance(
+                # skipped by the translation
+                child,
+                (nodes.substitution_definition, nodes.substitution_reference, raw, comment),
+            ):
+                self._collect_head(child)
+
+    def _stream(self, html: str) -> None:
+        assert self.stream_write is not None
+        if self._template_suffix is None:
+            values = self._get_template_values(body=self._body_placeholder)
+            self.body = ''
+            prefix, _, self._template_suffix = (
+                self._get_template().format(**values).partition(self._body_placeholder)
+            )
+            self.stream_write(prefix)
+        if html:
+            self.stream_write(html)
+
+    def _flush(self, final: bool = False) -> None:
+        completed = self.context.pop_completed(final)
+        if completed.children:
+            self._stream(serialize(completed, self.document.settings.serializer))
+
+    def _open_stream(self, node: NodeElement) -> None:
+        """
+        Write the start tag of ``node`` and everything that precedes it.
+        Its content will be written as it is translated.
+        """
+        tag_name, indent, attributes = self.parse(node)
+        context = self.context
+        indent = indent and bool(context.indent_output)
+        current = context.stack.pop()
+        if indent:
+            # see ElemStack._indent_elem
+            context.append('\n' + context.indent_width * (context.indent_level - 1) * ' ', False)
+        self._flush(final=True)
+        context.stack.append(current)
+        self._stream(getattr(tag, tag_name)(**attributes).start_tag())
+        self.streamed.append((len(context.stack), tag_name, indent))
+
+    def _close_stream(self) -> None:
+        _, tag_name, indent = self.streamed.pop()
+        self._flush(final=True)
+        self._stream(f'</{tag_name}>')
+        context = self.context
+        context.stack.pop()
+        context.indent_level -= 1
+        if indent:
+            context.append('\n' + context.indent_width * (context.indent_level - 1) * ' ', False)
+
+    def _is_streamed(self, depth: int) -> bool:
+        return bool(self.streamed) and self.streamed[-1][0] == depth
 
     def parse(self, node: NodeElement) -> Tuple[str, bool, Dict[str, Any]]:
         """
         Get tag name, indentantion and correct attributes of a node according
         to its class
         """
-        node_class_name = node.__class__.__name__
-        spec = self.rst_terms[node_class_name]
-        tag_name = str(spec[0] or node_class_name)
-        use_name_in_class = len(spec) > 3 and spec[3]
-        indent = bool(spec[4]) if len(spec) > 4 else True
+        node_class = node.__class__
+        plan = self._parse_plans.get(node_class) or self._compile_parse_plan(node_class)
+        tag_name, use_name_in_class, indent = plan
         if use_name_in_class:
-            node['classes'].insert(0, node_class_name)
-
-        replacements = {
-            'refuri': 'href',
-            'uri': 'src',
-            'refid': 'href',
-            'morerows': 'rowspan',
-            'morecols': 'colspan',
-            'classes': 'class',
-            'ids': 'id',
-        }
-        ignores = (
-            'names',
-            'dupnames',
-            'bullet',
-            'enumtype',
-            'colwidth',
-            'stub',
-            'backrefs',
-            'auto',
-            'anonymous',
-        )
+            node['classes'].insert(0, node_class.__name__)
+
+        attribute_map = self.attribute_map
         attributes = {}
         for k, v in node.attributes.items():
-            if k in ignores or not v:
+            if not v:
+                continue
+            name = attribute_map.get(k, k)
+            if name is None:
                 continue
-            if k in replacements:
-                k = replacements[k]
             if isinstance(v, list):
                 v = ' '.join(v)
-            attributes[k] = v
+            attributes[name] = v
 
         return tag_name, indent, attributes
 
-    def once_attr(self, name: str, default: Optional[bool] = None) -> Union[bool, Any]:
-        """
-        The attribute is used once and then it is deleted
-        """
-        if hasattr(self, name):
-            result = getattr(self, name)
-            delattr(self, name)
-            return result
-        else:
-            return default
-
     def default_visit(self, node: NodeElement) -> None:
         """
         Initiate a new context to store inner HTML5 elements.
         """
-        if 'ids' in node and self.once_attr('expand_id_to_anchor', default=True):
+        if 'ids' in node and self.state.pop_expand_id_to_anchor():
             # create an anchor <a id=id></a> on top of the current element
             # for each id found.
             for id in node['ids'][1:]:
@@ -770,38 +1166,48 @@ class HTML5Translator(nodes.NodeVisitor):
 
     def visit_Text(self, node: Text) -> None:
         text = node.astext()
-        if not getattr(self, 'preserve_space', None):
+        if not self.state.preserve_space:
             text = _strip_spaces(text)
         self.context.append(text, indent=False)
         raise nodes.SkipDeparture
 
     def visit_section(self, node: section) -> None:
-        self.heading_level += 1
+        if self.tracer is not None and isinstance(node.parent, nodes.document):
+            self._section_start = now()
+        self.state.heading_level += 1
         self.default_visit(node)
+        if self._is_streamed(len(self.context.stack) - 1):
+            self._open_stream(node)
 
     def depart_section(self, node: section) -> None:
-        self.heading_level -= 1
-        self.default_departure(node)
+        self.state.heading_level -= 1
+        if self._is_streamed(len(self.context.stack)):
+            self._close_stream()
+        else:
+            self.default_departure(node)
+        if self.tracer is not None and isinstance(node.parent, nodes.document):
+            name = f'section {node["ids"][0]}' if node['ids'] else 'section'
+            self.tracer.span(name, self._section_start, category='section')
 
     def depart_title(self, node: title) -> None:
         spec, indent, attr = self.parse(node)
         if isinstance(node.parent, nodes.table):
             elem = tag.caption(**attr)
         else:
-            assert self.heading_level >= 0
-            if self.heading_level == 0:
-                self.heading_level = 1
+            assert self.state.heading_level >= 0
+            if self.state.heading_level == 0:
+                self.state.heading_level = 1
             if 'href' in attr:
                 # backref to toc entry
                 del attr['href']
-            elem = getattr(tag, 'h' + str(self.heading_level))(**attr)
+            elem = getattr(tag, 'h' + str(self.state.heading_level))(**attr)
         self.context.commit_elem(elem, indent)
 
     def depart_subtitle(self, node: subtitle) -> None:
         # mount the subtitle heading
-        subheading_level = getattr(tag, 'h' + str(self.heading_level + 1))
+        subheading_level = getattr(tag, 'h' + str(self.state.heading_level + 1))
         self.context.commit_elem(subheading_level)
-        self.heading_level -= 1
+        self.state.heading_level -= 1
 
     def depart_enumerated_list(self, node: enumerated_list) -> None:
         """
@@ -860,13 +1266,11 @@ class HTML5Translator(nodes.NodeVisitor):
     #
 
     def visit_table(self, node: table) -> None:
-        self.th_required = 0
-        self.in_thead = False
+        self.state.tables.append(TableState())
         self.default_visit(node)
 
     def depart_table(self, node: table) -> None:
-        del self.th_required
-        del self.in_thead
+        self.state.tables.pop()
         self.default_departure(node)
 
     def depart_colspec(self, node: colspec) -> None:
@@ -880,28 +1284,26 @@ class HTML5Translator(nodes.NodeVisitor):
         if a colspec node with a "stub" attribute indicates that the column should be a th tag.
         """
         if 'stub' in node:
-            self.th_required += 1
+            self.state.tables[-1].th_required += 1
 
     def visit_thead(self, node: thead) -> None:
-        self.in_thead = True
+        self.state.tables[-1].in_thead = True
         self.default_visit(node)
 
     def depart_thead(self, node: thead) -> None:
-        self.in_thead = False
+        self.state.tables[-1].in_thead = False
         self.default_departure(node)
 
     def visit_row(self, node: row) -> None:
-        self.th_available = self.th_required
+        table_state = self.state.tables[-1]
+        table_state.th_available = table_state.th_required
         self.default_visit(node)
 
-    def depart_row(self, node: row) -> None:
-        del self.th_available
-        self.default_departure(node)
-
     def depart_entry(self, node: entry) -> None:
-        if self.in_thead or self.th_available:
+        table_state = self.state.tables[-1]
+        if table_state.in_thead or table_state.th_available:
             name = 'th'
-            self.th_available -= 1
+            table_state.th_available -= 1
         else:
             name = 'td'
 
@@ -928,17 +1330,15 @@ class HTML5Translator(nodes.NodeVisitor):
     def visit_target(self, node: TextElement) -> None:
         if not node.astext():
             raise nodes.SkipNode
-        self.expand_id_to_anchor = False
+        self.state.expand_id_to_anchor = False
         self.default_visit(node)
 
     def visit_literal(self, node: literal) -> None:
-        self.preserve_space = getattr(self, 'preserve_space', 0) + 1
+        self.state.preserve_space += 1
         self.default_visit(node)
 
     def depart_literal(self, node: literal) -> None:
-        self.preserve_space -= 1
-        if self.preserve_space == 0:
-            del self.preserve_space
+        self.state.preserve_space -= 1
         if node['classes']:
             node['classes'] = node['classes'][-1]
         self.default_departure(node)
@@ -962,11 +1362,11 @@ class HTML5Translator(nodes.NodeVisitor):
             node['classes'].remove(language)
             node['data-language'] = language[len('language-') : :]
 
-        self.preserve_space = 1
+        self.state.preserve_space += 1
         self.default_visit(node)
 
     def depart_literal_block(self, node: Union[literal_block, doctest_block]) -> None:
-        del self.preserve_space
+        self.state.preserve_space -= 1
         self.default_departure(node)
 
     def visit_math_block(self, node: Union[math, math_block]) -> None:
@@ -992,11 +1392,14 @@ class HTML5Translator(nodes.NodeVisitor):
         waste, waste_, attr = self.parse(node)
         elem(**attr)
         self.context.append(elem)
-        if not getattr(self, 'already_has_math_script', None):
+        self._add_math_script()
+        raise nodes.SkipNode
+
+    def _add_math_script(self) -> None:
+        if not self.state.has_math_script:
             src = 'http://cdn.mathjax.org/mathjax/latest/MathJax.js?config=TeX-AMS-MML_HTMLorMML'
             self.scripts.append(tag.script(src=src))
-            self.already_has_math_script = True
-        raise nodes.SkipNode
+            self.state.has_math_script = True
 
     def visit_document(self, node: document) -> None:
         if 'title' in node:
@@ -1005,8 +1408,17 @@ class HTML5Translator(nodes.NodeVisitor):
         else:
             self.title = ''
         self.default_visit(node)
+        if self.stream_write is not None:
+            self.streamed.append((len(self.context.stack), '', False))
 
     def depart_document(self, node: document) -> None:
+        if self._is_streamed(len(self.context.stack)):
+            self.streamed.pop()
+            self._flush(final=True)
+            self._stream('')  # the prefix is still due if the body is empty
+            self._stream(self._template_suffix or '')
+            self.context.stack = []
+            return
         self.context.stack = self.context.stack[0]
 
     def visit_raw(self, node: raw) -> None:
@@ -1015,13 +1427,12 @@ class HTML5Translator(nodes.NodeVisitor):
         raise nodes.SkipNode
 
     def visit_aside(self, node: NodeElement) -> None:
-        self.save_heading_level = self.heading_level
-        self.heading_level = 1
+        self.state.saved_heading_levels.append(self.state.heading_level)
+        self.state.heading_level = 1
         self.default_visit(node)
 
     def depart_aside(self, node: NodeElement) -> None:
-        self.heading_level = self.save_heading_level
-        del self.save_heading_level
+        self.state.heading_level = self.state.saved_heading_levels.pop()
         if node['classes'] and node['classes'][0].startswith('admonition-'):
             del node['classes'][0]
         self.default_departure(node)
@@ -1066,7 +1477,7 @@ class HTML5Translator(nodes.NodeVisitor):
         self.depart_option_list(node)
 
     def visit_option_group(self, node: option_group) -> None:
-        self.option_level = 0
+        self.state.option_level = 0
         self.default_visit(node)
 
     def depart_option_group(self, node: option_group) -> None:
@@ -1083,9 +1494,9 @@ class HTML5Translator(nodes.NodeVisitor):
             self.default_departure(node)
 
     def visit_option(self, node: option) -> None:
-        if self.option_level:
+        if self.state.option_level:
             self.context.append(', ', indent=False)
-        self.option_level += 1
+        self.state.option_level += 1
         self.default_visit(node)
 
     def visit_option_argument(self, node: option_argument) -> None:
@@ -1099,7 +1510,7 @@ class HTML5Translator(nodes.NodeVisitor):
         Instead of a typical visit_reference call this def is required to
         remove the backref id that is included but not used in rst2html5.
         """
-        self.expand_id_to_anchor = False
+        self.state.expand_id_to_anchor = False
         self.default_visit(node)
 
     def depart_label(self, node: nodes.label) -> None:
@@ -1107,10 +1518,10 @@ class HTML5Translator(nodes.NodeVisitor):
         self.context.begin_elem()  # next td
 
     def visit_line(self, node: line) -> None:
-        self.line_level = getattr(self, 'line_level', -1) + 1
-        if self.line_level:
+        self.state.line_level += 1
+        if self.state.line_level:
             tab_width = self.document.settings.tab_width
-            separator = '\n' + ' ' * tab_width * (self.line_block_level - 1)
+            separator = '\n' + ' ' * tab_width * (self.state.line_block_level - 1)
             self.context.append(separator, indent=False)
         raise nodes.SkipDeparture
 
@@ -1119,15 +1530,14 @@ class HTML5Translator(nodes.NodeVisitor):
         Line blocks use <pre>.
         Lines breaks and spacing are reconstructured based on line_block_level
         """
-        self.line_block_level = getattr(self, 'line_block_level', 0) + 1
-        if self.line_block_level == 1:
+        self.state.line_block_level += 1
+        if self.state.line_block_level == 1:
             self.default_visit(node)
 
     def depart_line_block(self, node: line_block) -> None:
-        self.line_block_level -= 1
-        if self.line_block_level == 0:
-            del self.line_block_level
-            del self.line_level
+        self.state.line_block_level -= 1
+        if self.state.line_block_level == 0:
+            self.state.line_level = -1
             self.default_departure(node)
 
     def visit_meta(self, node: meta) -> None:
@@ -1136,7 +1546,7 @@ class HTML5Translator(nodes.NodeVisitor):
         raise nodes.SkipNode
 
     def visit_problematic(self, node: problematic) -> None:
-        self.expand_id_to_anchor = False
+        self.state.expand_id_to_anchor = False
         if len(node['ids']) > 1:
             node['ids'] = node['ids'][0]
         self.default_visit(node)
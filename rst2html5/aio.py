@@ -0,0 +1,178 @@
+"""
+asyncio rendering API.
+
+Converting a large document takes tens of milliseconds,
+long enough to stall every other task of an event loop.
+The functions below run the conversion in an executor and wait for it without blocking::
+
+    >>> from rst2html5.aio import render
+    >>> parts = await render('Title\\n=====\\n\\nText.', {'indent_output': False})
+    >>> parts['body']
+    '<section id="title"><h1>Title</h1><p>Text.</p></section>'
+
+:class:`AsyncRenderer` chooses the executor, thread or process based,
+and how many conversions may run at once.
+Callers beyond that limit wait for a free slot.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+from weakref import WeakKeyDictionary
+
+from docutils.utils import SystemMessage
+
+from .renderer import Renderer
+
+
+class RenderError(Exception):
+    """
+    Error reported by docutils while converting a document
+    """
+
+
+_local_renderer: Optional[Renderer] = None
+
+
+def _get_local_renderer() -> Renderer:
+    # each process of a process executor creates its own renderer
+    global _local_renderer  # noqa: PLW0603
+    if _local_renderer is None:
+        _local_renderer = Renderer()
+    return _local_renderer
+
+
+def render_parts(
+    source: str, settings_overrides: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Convert ``source`` and return the parts assembled by :meth:`HTML5Writer.assemble_parts`.
+    Errors are raised instead of exiting.
+    """
+    try:
+        parts = _get_local_renderer().render(source, settings_overrides)
+    except SystemMessage as error:
+        # SystemMessage cannot be sent back from a process executor
+        raise RenderError(str(error)) from None
+    return dict(parts)
+
+
+class AsyncRenderer:
+    """
+    Run conversions in ``executor``, at most ``max_concurrency`` at a time.
+    A thread pool of ``max_concurrency`` threads is created if no executor is given.
+
+    A slot is only released when its conversion is finished,
+    even if the caller was cancelled or timed out before,
+    because a conversion that has started cannot be interrupted.
+    """
+
+    def __init__(self, executor: Optional[Executor] = None, max_concurrency: int = 4) -> None:
+        self.max_concurrency = max_concurrency
+        self._own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_concurrency)
+        self._semaphores: WeakKeyDictionary = WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # an asyncio.Semaphore can only be used by a single event loop
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def render(
+        self,
+        source: str,
+        settings_overrides: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Convert ``source`` and return its parts.
+        Raise :class:`asyncio.TimeoutError` if it takes longer than ``timeout`` seconds,
+        including the time spent waiting for a free slot.
+        """
+        return await asyncio.wait_for(self._render(source, settings_overrides), timeout)
+
+    async def _render(
+        self, source: str, settings_overrides: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphore()
+        await semaphore.acquire()
+        try:
+            future = self.executor.submit(render_parts, source, settings_overrides)
+        except BaseException:
+            semaphore.release()
+            raise
+
+        def release(_: Any) -> None:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(semaphore.release)
+
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    async def render_many(
+        self,
+        sources: Iterable[str],
+        settings_overrides: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        return_exceptions: bool = False,
+    ) -> List[Any]:
+        """
+        Convert all ``sources`` and return their parts in the same order.
+        ``timeout`` applies to each source.
+        With ``return_exceptions``, errors are returned in place of the parts
+        instead of being raised.
+        """
+        return await asyncio.gather(
+            *(self.render(source, settings_overrides, timeout) for source in sources),
+            return_exceptions=return_exceptions,
+        )
+
+    def close(self) -> None:
+        """
+        Shut down the executor if it was created by the renderer
+        """
+        if self._own_executor:
+            self.executor.shutdown(wait=False)
+
+
+_default_renderer: Optional[AsyncRenderer] = None
+
+
+def get_renderer() -> AsyncRenderer:
+    """
+    Renderer used by :func:`render` and :func:`render_many`
+    """
+    global _default_renderer  # noqa: PLW0603
+    if _default_renderer is None:
+        _default_renderer = AsyncRenderer()
+    return _default_renderer
+
+
+async def render(
+    source: str,
+    settings_overrides: Optional[Dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Convert ``source`` with the default renderer. See :meth:`AsyncRenderer.render`.
+    """
+    return await get_renderer().render(source, settings_overrides, timeout)
+
+
+async def render_many(
+    sources: Iterable[str],
+    settings_overrides: Optional[Dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+    return_exceptions: bool = False,
+) -> List[Any]:
+    """
+    Convert all ``sources`` with the default renderer. See :meth:`AsyncRenderer.render_many`.
+    """
+    return await get_renderer().render_many(sources, settings_overrides, timeout, return_exceptions)
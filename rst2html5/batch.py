@@ -0,0 +1,526 @@
+"""
+Batch conversion of many reStructuredText sources in a single run.
+
+Instead of starting a new interpreter per document,
+the sources are distributed to a pool of worker processes.
+Each worker imports docutils and Pygments once
+and then converts as many documents as it is handed.
+
+Usage::
+
+    $ rst2html5 --batch --output-dir build/html -j 4 docs/ README.rst
+
+Directories are walked recursively and their structure is mirrored into the output directory.
+
+Builds are incremental.
+A manifest in the output directory records, for each output,
+the hash of its source and of every file read during its conversion
+(included files, templates and inline stylesheets).
+Documents whose files and settings are unchanged are skipped on the next run.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import docutils
+import pygments
+from docutils import SettingsSpec
+from docutils.frontend import OptionParser, Values
+from docutils.io import FileInput, FileOutput
+from docutils.parsers.rst import Parser
+from docutils.readers.standalone import Reader
+from docutils.utils import DependencyList
+
+from . import HTML5Writer, __version__, highlight
+from .memory import format_memory_summary
+from .profiling import format_profile, merge_profiles
+from .stats import Publisher, format_stats, merge_stats
+from .tracing import now, span_event, write_trace
+
+
+class BatchSettingsSpec(SettingsSpec):
+    settings_spec = (
+        'rst2html5 Batch Options',
+        None,
+        (
+            (
+                'Convert every SOURCE argument (files or directories) in a single run.',
+                ['--batch'],
+                {
+                    'default': False,
+                    'action': 'store_true',
+                },
+            ),
+            (
+                'Directory where the HTML5 files are written to. '
+                'The structure of source directories is mirrored into it.',
+                ['--output-dir'],
+                {
+                    'metavar': '<path>',
+                    'default': None,
+                },
+            ),
+            (
+                'Number of worker processes. 0 means one per CPU. Default: 1.',
+                ['--jobs', '-j'],
+                {
+                    'metavar': '<N>',
+                    'default': 1,
+                    'type': 'int',
+                },
+            ),
+            (
+                'Suffix of the files converted when a directory is given. '
+                'Default: .rst (This option can be used multiple times)',
+                ['--source-suffix'],
+                {
+                    'metavar': '<suffix>',
+                    'default': None,
+                    'action': 'append',
+                },
+            ),
+            (
+                'Convert all sources, even those that are up to date.',
+                ['--force'],
+                {
+                    'default': False,
+                    'action': 'store_true',
+                },
+            ),
+            (
+                'Keep running and convert the sources again whenever they '
+                'or the files they depend on change. Implies --batch.',
+                ['--watch'],
+                {
+                    'default': False,
+                    'action': 'store_true',
+                },
+            ),
+            (
+                'Seconds between two checks for changes in --watch mode. Default: 0.5.',
+                ['--watch-interval'],
+                {
+                    'metavar': '<seconds>',
+                    'default': 0.5,
+                    'type': 'float',
+                },
+            ),
+            (
+                'Seconds without further changes before a rebuild starts in --watch mode, '
+                'so that a burst of changes triggers a single rebuild. Default: 0.2.',
+                ['--watch-delay'],
+                {
+                    'metavar': '<seconds>',
+                    'default': 0.2,
+                    'type': 'float',
+                },
+            ),
+        ),
+    )
+
+
+class BatchOptionParser(OptionParser):
+    """
+    Accept any number of positional arguments, stored as ``_sources``
+    """
+
+    def check_values(self, values: Any, args: List[str]) -> Any:
+        values = super().check_values(values, [])
+        values._sources = args
+        return values
+
+
+class ConversionResult(NamedTuple):
+    source: str
+    destination: str
+    error: Optional[str] = None
+    dependencies: Tuple[str, ...] = ()
+    stats: Optional[Dict[str, Any]] = None
+    profile: Optional[Dict[str, Any]] = None
+    trace: Optional[List[Dict[str, Any]]] = None
+    memory: Optional[Dict[str, Any]] = None
+
+
+Job = Tuple[str, str]
+
+
+MANIFEST_NAME = '.rst2html5-manifest.json'
+
+# settings that do not change the output of a document
+_VOLATILE_SETTINGS = frozenset(
+    [
+        '_sources',
+        'force',
+        'jobs',
+        'memory_profile',
+        'output_dir',
+        'profile',
+        'record_dependencies',
+        'slow_log',
+        'slow_threshold',
+        'stats',
+        'trace',
+        'traceback',
+        'warning_stream',
+        'watch',
+        'watch_delay',
+        'watch_interval',
+    ]
+)
+
+
+def settings_digest(settings: Values) -> str:
+    """
+    Hash of the settings and versions that affect the output.
+    Values that cannot be represented in JSON are left out.
+    """
+    # an upgrade of rst2html5, docutils or Pygments may change the output of any document
+    items: Dict[str, Any] = {
+        '__versions__': [__version__, docutils.__version__, pygments.__version__]
+    }
+    for name, value in sorted(vars(settings).items()):
+        if name in _VOLATILE_SETTINGS:
+            continue
+        try:
+            items[name] = json.dumps(value)
+        except (TypeError, ValueError):
+            continue
+    return hashlib.sha256(json.dumps(items).encode('utf-8')).hexdigest()
+
+
+def file_digest(path: str) -> Optional[str]:
+    """
+    SHA-256 of the file contents or ``None`` if it cannot be read.
+    """
+    try:
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+class Manifest:
+    """
+    Files each output was built from, with their hashes at the time of the build::
+
+        {"settings": "<digest>", "outputs": {"<destination>": {"<path>": "<digest>", ...}}}
+
+    The source of each output is one of its files.
+    """
+
+    def __init__(self, path: str, settings: str) -> None:
+        self.path = path
+        self.settings = settings
+        self.outputs: Dict[str, Dict[str, Optional[str]]] = {}
+        self._digests: Dict[str, Optional[str]] = {}
+
+    @classmethod
+    def load(cls, path: str, settings: str) -> 'Manifest':
+        """
+        Read the manifest at ``path``.
+        It starts empty if the file is missing, unreadable or was built with other settings.
+        """
+        manifest = cls(path, settings)
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return manifest
+        if isinstance(data, dict) and data.get('settings') == settings:
+            manifest.outputs = data.get('outputs', {})
+        return manifest
+
+    def save(self) -> None:
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(
+                {'settings': self.settings, 'outputs': self.outputs}, f, indent=1, sort_keys=True
+            )
+
+    def digest(self, path: str) -> Optional[str]:
+        # an include shared by many documents is hashed once per run
+        if path not in self._digests:
+            self._digests[path] = file_digest(path)
+        return self._digests[path]
+
+    def forget(self, paths: Iterable[str]) -> None:
+        """
+        Hash ``paths`` again the next time they are checked, because they changed
+        """
+        for path in paths:
+            self._digests.pop(path, None)
+
+    def is_up_to_date(self, source: str, destination: str) -> bool:
+        files = self.outputs.get(destination)
+        if not files or source not in files or not os.path.exists(destination):
+            return False
+        return all(self.digest(path) == digest for path, digest in files.items())
+
+    def record(self, result: ConversionResult) -> None:
+        """
+        Record the files of a successful conversion or forget the output of a failed one.
+        """
+        if result.error:
+            self.outputs.pop(result.destination, None)
+            return
+        paths = [result.source, *result.dependencies]
+        self.outputs[result.destination] = {path: self.digest(path) for path in paths}
+
+
+class OutputCollisionError(ValueError):
+    """
+    Two sources would be converted to the same output file
+    """
+
+
+def _find_sources(paths: Iterable[str], output: Path, suffixes: Sequence[str]) -> Iterator[Job]:
+    for path in map(Path, paths):
+        if path.is_dir():
+            for source in sorted(path.rglob('*')):
+                if source.suffix in suffixes and source.is_file():
+                    destination = output / source.relative_to(path).with_suffix('.html')
+                    yield str(source), str(destination)
+        else:
+            yield str(path), str(output / path.with_suffix('.html').name)
+
+
+def collect_sources(
+    paths: Iterable[str], output_dir: str, suffixes: Sequence[str] = ('.rst',)
+) -> Iterator[Job]:
+    """
+    Yield a ``(source, destination)`` pair for each file to be converted.
+    Files found in a directory keep their relative path under ``output_dir``.
+    Files given by name are written directly to ``output_dir``.
+
+    Raise :class:`OutputCollisionError` if two sources have the same destination.
+    """
+    sources: Dict[str, str] = {}
+    for source, destination in _find_sources(paths, Path(output_dir), suffixes):
+        other = sources.get(destination)
+        if other is None:
+            sources[destination] = source
+            yield source, destination
+        elif os.path.realpath(other) != os.path.realpath(source):
+            raise OutputCollisionError(
+                f'{other} and {source} would both be converted to {destination}'
+            )
+
+
+def convert_file(source_path: str, destination_path: str, settings: Values) -> int:
+    """
+    Convert a single file and return the highest system message level reported.
+    """
+    pub = _publish_file(source_path, destination_path, settings)
+    return pub.document.reporter.max_level  # type: ignore[union-attr]
+
+
+def _publish_file(source_path: str, destination_path: str, settings: Values) -> Publisher:
+    Path(destination_path).parent.mkdir(parents=True, exist_ok=True)
+    pub = Publisher(
+        Reader(),
+        Parser(),
+        HTML5Writer(),
+        source_class=FileInput,
+        destination_class=FileOutput,
+        settings=settings,  # type: ignore[arg-type]
+    )
+    pub.set_source(source_path=source_path)
+    pub.set_destination(destination_path=destination_path)
+    pub.publish()
+    return pub
+
+
+_worker_settings: Optional[Values] = None
+
+
+def _init_worker(settings: Values) -> None:
+    global _worker_settings  # noqa: PLW0603
+    _worker_settings = settings
+    highlight.preload(settings.highlight_preload or [])
+
+
+def _convert(job: Job) -> ConversionResult:
+    source, destination = job
+    if _worker_settings is None:
+        raise RuntimeError('the worker is not initialized: call _init_worker first')
+    # the publisher stores the source and destination paths in the settings
+    settings = copy.copy(_worker_settings)
+    settings.record_dependencies = DependencyList()
+    start = now()
+    try:
+        pub = _publish_file(source, destination, settings)
+    except Exception as error:
+        message = f'{error.__class__.__name__}: {error}'
+        trace = [span_event(source, start, now(), 'document', error=message)]
+        return ConversionResult(
+            source, destination, message, trace=trace if settings.trace else None
+        )
+    level = pub.document.reporter.max_level  # type: ignore[union-attr]
+    parts: Any = pub.writer.parts  # type: ignore[union-attr]
+    measures = {name: parts.get(name) for name in ('stats', 'profile', 'memory')}
+    if settings.trace:
+        measures['trace'] = [*parts['trace'], span_event(source, start, now(), 'document')]
+    if level >= settings.exit_status_level:
+        return ConversionResult(source, destination, f'system message level {level}', **measures)
+    return ConversionResult(
+        source, destination, dependencies=tuple(settings.record_dependencies.list), **measures
+    )
+
+
+def _batch_settings(settings: Values) -> Values:
+    settings = copy.copy(settings)
+    settings.traceback = True  # errors are reported per file by _convert
+    settings.record_dependencies = None  # type: ignore[assignment]
+    return settings
+
+
+def create_executor(settings: Values, workers: int) -> ProcessPoolExecutor:
+    """
+    Pool of ``workers`` processes that convert documents with ``settings``,
+    to be shared by successive calls to :func:`convert_batch`
+    """
+    return ProcessPoolExecutor(
+        workers, initializer=_init_worker, initargs=(_batch_settings(settings),)
+    )
+
+
+def _convert_in(executor: Executor, jobs: Sequence[Job]) -> Iterator[ConversionResult]:
+    futures = [executor.submit(_convert, job) for job in jobs]
+    for future in as_completed(futures):
+        yield future.result()
+
+
+def convert_batch(
+    jobs: Sequence[Job],
+    settings: Values,
+    workers: int = 1,
+    executor: Optional[Executor] = None,
+) -> Iterator[ConversionResult]:
+    """
+    Convert all jobs and yield their results as soon as they are finished.
+    A failing document does not interrupt the conversion of the others.
+
+    The jobs are run in ``executor`` if given (see :func:`create_executor`),
+    otherwise in a pool of ``workers`` processes created for this call.
+    """
+    if executor is not None:
+        yield from _convert_in(executor, jobs)
+        return
+    settings = _batch_settings(settings)
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        _init_worker(settings)
+        yield from map(_convert, jobs)
+        return
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(settings,)) as pool:
+        yield from _convert_in(pool, jobs)
+
+
+class BuildSummary(NamedTuple):
+    converted: int
+    failed: int
+    up_to_date: int
+
+    def __str__(self) -> str:
+        return (
+            f'{self.converted} documents converted, {self.failed} failed, '
+            f'{self.up_to_date} up to date'
+        )
+
+
+def find_sources(settings: Any) -> List[Job]:
+    """
+    Jobs of the sources of ``settings``
+    """
+    suffixes = settings.source_suffix or ['.rst']
+    return list(collect_sources(settings._sources, settings.output_dir, suffixes))
+
+
+def load_manifest(settings: Any) -> Manifest:
+    """
+    Manifest of the output directory of ``settings``
+    """
+    manifest_path = os.path.join(settings.output_dir, MANIFEST_NAME)
+    return Manifest.load(manifest_path, settings_digest(settings))
+
+
+def build(
+    settings: Any,
+    force: bool = False,
+    sources: Optional[List[Job]] = None,
+    manifest: Optional[Manifest] = None,
+    executor: Optional[Executor] = None,
+) -> BuildSummary:
+    """
+    Convert the sources of ``settings`` that are not up to date and update the manifest.
+    Errors are reported per file to ``sys.stderr``.
+
+    ``sources``, ``manifest`` and ``executor`` let successive builds, such as those of
+    :mod:`rst2html5.watch`, reuse the sources found, the manifest and the worker processes.
+    """
+    sources = find_sources(settings) if sources is None else sources
+    manifest = load_manifest(settings) if manifest is None else manifest
+    if force:
+        jobs = sources
+    else:
+        jobs = [job for job in sources if not manifest.is_up_to_date(*job)]
+    failures = 0
+    stats = []
+    profiles = []
+    trace: List[Dict[str, Any]] = []
+    memory = {}
+    for result in convert_batch(jobs, settings, settings.jobs, executor):
+        manifest.record(result)
+        if result.stats:
+            stats.append(result.stats)
+        if result.profile:
+            profiles.append(result.profile)
+        if result.trace:
+            trace.extend(result.trace)
+        if result.memory:
+            memory[result.source] = result.memory
+        if result.error:
+            failures += 1
+            print(f'{result.source}: {result.error}', file=sys.stderr)
+    manifest.save()
+    if stats:
+        print(format_stats(merge_stats(stats)), file=sys.stderr)
+    if profiles:
+        print(format_profile(merge_profiles(profiles)), file=sys.stderr)
+    if settings.trace:
+        write_trace(settings.trace, trace)
+    if memory:
+        print(format_memory_summary(memory), file=sys.stderr)
+    return BuildSummary(len(jobs) - failures, failures, len(sources) - len(jobs))
+
+
+def main(argv: Optional[List[str]] = None, description: Optional[str] = None) -> int:
+    """
+    Entry point of ``rst2html5 --batch``. Return the exit status.
+    """
+    parser = BatchOptionParser(
+        components=(Parser, Reader, HTML5Writer, BatchSettingsSpec),
+        read_config_files=True,
+        usage='%prog --batch --output-dir DIR [options] SOURCE [SOURCE ...]',
+        description=description,
+    )
+    settings: Any = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    if not settings.output_dir:
+        parser.error('--output-dir is required in batch mode.')
+    if not settings._sources:
+        parser.error('At least one SOURCE is required in batch mode.')
+    try:
+        if settings.watch:
+            from .watch import watch
+
+            return watch(settings)
+        summary = build(settings, settings.force)
+    except OutputCollisionError as error:
+        parser.error(str(error))
+    print(f'rst2html5: {summary}', file=sys.stderr)
+    return 1 if summary.failed else 0
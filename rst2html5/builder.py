@@ -0,0 +1,314 @@
+"""
+Lightweight HTML builder with the same API as :mod:`genshi.builder`::
+
+    >>> from rst2html5.builder import tag
+    >>> print(tag.p('1 < 2 ', tag.a('link', href='#target', class_='internal')))
+    <p>1 &lt; 2 <a href="#target" class="internal">link</a></p>
+
+Instead of generating a stream of events that is serialized afterwards,
+each element renders itself directly to a string.
+The rendering is kept until the element is changed or rendered as part of its parent,
+so committing an element to its parent costs a single string concatenation
+and the HTML of a document is not held once per nesting level.
+
+The output is the same as Genshi's ``XHTMLSerializer``.
+Genshi is still available through :func:`serialize` for compatibility,
+and elements built with :data:`genshi.builder.tag` can be appended to native ones.
+"""
+
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from genshi import builder as genshi_builder
+from genshi.core import END, START, TEXT, Attrs, QName, Stream
+from genshi.output import XHTMLSerializer
+
+EMPTY_ELEMS = frozenset(
+    [
+        'area',
+        'base',
+        'basefont',
+        'br',
+        'col',
+        'frame',
+        'hr',
+        'img',
+        'input',
+        'isindex',
+        'link',
+        'meta',
+        'param',
+    ]
+)
+BOOLEAN_ATTRS = frozenset(
+    [
+        'selected',
+        'checked',
+        'compact',
+        'declare',
+        'defer',
+        'disabled',
+        'ismap',
+        'multiple',
+        'nohref',
+        'noresize',
+        'noshade',
+        'nowrap',
+        'autofocus',
+        'readonly',
+        'required',
+        'formnovalidate',
+    ]
+)
+PRESERVE_SPACE = frozenset(['pre', 'textarea'])
+
+_trim_trailing_space = re.compile('[ \t]+(?=\n)').sub
+_collapse_lines = re.compile('\n{2,}').sub
+
+
+class Markup(str):
+    """
+    String that is already HTML and must not be escaped
+    """
+
+    __slots__ = ()
+
+    def __html__(self) -> 'Markup':
+        return self
+
+
+def escape(text: str, quotes: bool = True) -> str:
+    """
+    Escape ``&``, ``<``, ``>`` and, if ``quotes`` is true, ``"``.
+    Markup (any object with a ``__html__`` method) is returned unchanged.
+    """
+    if not text:
+        return ''
+    html = getattr(text, '__html__', None)
+    if html is not None:
+        return html()
+    text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    if quotes:
+        text = text.replace('"', '&#34;')
+    return text
+
+
+def _text(pieces: List[str], preserve: bool) -> str:
+    """
+    Whitespace handling of genshi.output.WhitespaceFilter
+    """
+    text = ''.join(pieces)
+    if not preserve and '\n' in text:
+        text = _collapse_lines('\n', _trim_trailing_space('', text))
+    return text
+
+
+def _render_children(children: List[Any], preserve: bool) -> str:
+    result = []
+    pieces: List[str] = []
+    for child in children:
+        if isinstance(child, Element):
+            if pieces:
+                result.append(_text(pieces, preserve))
+                pieces = []
+            result.append(child.render(preserve))
+            # the HTML of the child is now part of its parent's: keeping both would
+            # hold a copy of the document per nesting level
+            child._html = None
+        elif isinstance(child, str):
+            pieces.append(escape(child, quotes=False))
+        else:
+            pieces.append(escape(str(child), quotes=False))
+    if pieces:
+        result.append(_text(pieces, preserve))
+    return ''.join(result)
+
+
+class Fragment:
+    """
+    List of elements or text nodes without a parent element
+    """
+
+    __slots__ = ('children',)
+
+    def __init__(self) -> None:
+        self.children: List[Any] = []
+
+    def __call__(self, *args: Any) -> 'Fragment':
+        for arg in args:
+            self.append(arg)
+        return self
+
+    def __add__(self, other: Any) -> 'Fragment':
+        return Fragment()(self, other)
+
+    def __repr__(self) -> str:
+        return f'<{self.__class__.__name__}>'
+
+    def __str__(self) -> str:
+        return self.render()
+
+    def __html__(self) -> Markup:
+        return Markup(self.render())
+
+    def append(self, node: Any) -> None:
+        """
+        Append an element, a fragment, a string or a number.
+        Genshi fragments and streams are appended as their serialized markup.
+        Any other iterable has its items appended.
+        """
+        if isinstance(node, (Element, str, int, float)):
+            self.children.append(node)
+        elif isinstance(node, Fragment):
+            self.children.extend(node.children)
+        elif isinstance(node, (genshi_builder.Fragment, Stream)):
+            if isinstance(node, genshi_builder.Fragment):
+                node = node.generate()
+            self.children.append(Markup(''.join(XHTMLSerializer()(node))))
+        elif node is not None:
+            try:
+                items = iter(node)
+            except TypeError:
+                self.children.append(node)
+                return
+            for item in items:
+                Fragment.append(self, item)
+
+    def render(self, preserve: bool = False) -> str:
+        return _render_children(self.children, preserve)
+
+    def _generate(self) -> Iterator[Tuple]:
+        for child in self.children:
+            if isinstance(child, Element):
+                yield from child._generate()
+            else:
+                yield TEXT, child if isinstance(child, str) else str(child), (None, -1, -1)
+
+    def generate(self) -> Any:
+        """
+        Genshi event stream of the fragment
+        """
+        return Stream(self._generate())
+
+
+class Element(Fragment):
+    """
+    HTML element. Calling it appends children and sets attributes::
+
+        >>> print(tag.ul(id='items')(tag.li('one'), tag.li('two')))
+        <ul id="items"><li>one</li><li>two</li></ul>
+
+    Attribute names have trailing underscores removed and the other underscores replaced by hyphens.
+    Attributes whose value is ``None`` are ignored.
+    """
+
+    __slots__ = ('tag', 'attrib', '_html')
+
+    def __init__(self, tag_: str, **attrib: Any) -> None:
+        Fragment.__init__(self)
+        self.tag = tag_
+        self.attrib: Dict[str, str] = {}
+        self._html: Optional[str] = None
+        if attrib:
+            self._update_attrib(attrib)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> 'Element':
+        self._html = None
+        if kwargs:
+            self._update_attrib(kwargs)
+        for arg in args:
+            Fragment.append(self, arg)
+        return self
+
+    def __repr__(self) -> str:
+        return f'<{self.__class__.__name__} "{self.tag}">'
+
+    def _update_attrib(self, kwargs: Dict[str, Any]) -> None:
+        names = set()
+        for key, value in kwargs.items():
+            name = key.rstrip('_').replace('_', '-')
+            if value is not None and name not in names:
+                self.attrib[name] = str(value)
+                names.add(name)
+
+    def append(self, node: Any) -> None:
+        self._html = None
+        Fragment.append(self, node)
+
+    def render(self, preserve: bool = False) -> str:
+        """
+        Return the HTML of the element.
+        ``preserve`` is true inside elements whose whitespace must be kept as is, such as ``<pre>``.
+        """
+        if preserve and self.tag not in PRESERVE_SPACE:
+            return self._render(True)
+        html = self._html
+        if html is None:
+            html = self._html = self._render(self.tag in PRESERVE_SPACE)
+        return html
+
+    def _open_tag(self) -> List[str]:
+        attrib = self.attrib
+        buf = ['<', self.tag]
+        for name, value in attrib.items():
+            if name in BOOLEAN_ATTRS:
+                buf += [' ', name, '="', name, '"']
+                continue
+            if name == 'xml:lang' and 'lang' not in attrib:
+                buf += [' lang="', escape(value), '"']
+            elif name == 'xml:space':
+                continue
+            buf += [' ', name, '="', escape(value), '"']
+        return buf
+
+    def start_tag(self) -> str:
+        """
+        Return the start tag of the element, used when its content is written separately
+        """
+        return ''.join(self._open_tag()) + '>'
+
+    def _render(self, preserve: bool) -> str:
+        tag_ = self.tag
+        buf = self._open_tag()
+        if not self.children:
+            buf.append(' />' if tag_ in EMPTY_ELEMS else f'></{tag_}>')
+        else:
+            buf += ['>', _render_children(self.children, preserve), '</', tag_, '>']
+        return ''.join(buf)
+
+    def _generate(self) -> Iterator[Tuple]:
+        pos = (None, -1, -1)
+        name = QName(self.tag)
+        attrs = Attrs([(QName(key), value) for key, value in self.attrib.items()])
+        yield START, (name, attrs), pos
+        yield from Fragment._generate(self)
+        yield END, name, pos
+
+
+class ElementFactory:
+    """
+    ``tag.name(...)`` creates an :class:`Element` and ``tag(...)`` creates a :class:`Fragment`
+    """
+
+    def __call__(self, *args: Any) -> Fragment:
+        return Fragment()(*args)
+
+    def __getattr__(self, name: str) -> Element:
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return Element(name)
+
+
+tag = ElementFactory()
+
+SERIALIZERS = ('native', 'genshi')
+
+
+def serialize(fragment: Fragment, method: str = 'native') -> str:
+    """
+    Return the HTML of ``fragment``.
+    ``method = 'genshi'`` uses Genshi's ``XHTMLSerializer`` instead of the native rendering.
+    """
+    if method == 'genshi':
+        return ''.join(XHTMLSerializer()(fragment.generate()))
+    return fragment.render()
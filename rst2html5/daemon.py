@@ -0,0 +1,307 @@
+"""
+Long-running render daemon listening on a Unix domain socket.
+
+Starting ``rst2html5`` for each document pays the interpreter startup and import costs every time.
+The daemon converts documents in a pool of worker processes
+that have already imported docutils and Pygments::
+
+    $ rst2html5 --daemon --socket /tmp/rst2html5.sock -j 4
+
+Documents are rendered by :func:`render`::
+
+    >>> from rst2html5.daemon import render
+    >>> render('Some *text*.', '/tmp/rst2html5.sock', settings={'indent_output': False})
+    {'body': '<p>Some <em>text</em>.</p>'}
+
+Each connection carries one request, a JSON object terminated by a newline,
+and gets one response in the same format::
+
+    {"source": "...", "settings": {"indent_output": true}, "parts": ["body"]}
+    {"parts": {"body": "..."}}
+    {"error": "...", "type": "overload"}
+
+At most ``--jobs`` documents are rendered at once and ``--queue-size`` more wait for a worker.
+Requests beyond that are refused at once with an ``overload`` error.
+A request may only change the settings listed in ``RenderServer.request_settings``
+and its document cannot include files or raw content.
+"""
+
+import copy
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, cast
+
+from docutils import SettingsSpec
+from docutils.frontend import OptionParser, Values
+from docutils.io import StringInput, StringOutput
+from docutils.parsers.rst import Parser
+from docutils.readers.standalone import Reader
+
+from . import HTML5Writer, highlight
+from .stats import Publisher
+from .web import RenderApp
+
+MAX_REQUEST_SIZE = 16 * 1024 * 1024
+
+
+class DaemonSettingsSpec(SettingsSpec):
+    settings_spec = (
+        'rst2html5 Daemon Options',
+        None,
+        (
+            (
+                'Run as a daemon that renders documents sent to a Unix domain socket.',
+                ['--daemon'],
+                {
+                    'default': False,
+                    'action': 'store_true',
+                },
+            ),
+            (
+                'Path of the Unix domain socket the daemon listens on.',
+                ['--socket'],
+                {
+                    'metavar': '<path>',
+                    'default': None,
+                },
+            ),
+            (
+                'Number of worker processes. 0 means one per CPU. Default: 1.',
+                ['--jobs', '-j'],
+                {
+                    'metavar': '<N>',
+                    'default': 1,
+                    'type': 'int',
+                },
+            ),
+            (
+                'Number of requests that may wait for a free worker. '
+                'Further requests are refused with an overload error. Default: 16.',
+                ['--queue-size'],
+                {
+                    'metavar': '<N>',
+                    'default': 16,
+                    'type': 'int',
+                },
+            ),
+        ),
+    )
+
+
+class DaemonError(Exception):
+    """
+    Error reported by the daemon
+    """
+
+
+class OverloadError(DaemonError):
+    """
+    The daemon has no room left to queue the request
+    """
+
+
+_worker_settings: Optional[Values] = None
+
+
+def _init_worker(settings: Values) -> None:
+    global _worker_settings  # noqa: PLW0603
+    _worker_settings = settings
+    highlight.preload(settings.highlight_preload or [])
+    # the first conversion loads the rest of docutils
+    render_parts('Warm-up\n=======\n\nText.', {}, ['whole'])
+
+
+def render_parts(source: str, overrides: Dict[str, Any], names: Sequence[str]) -> Dict[str, str]:
+    """
+    Convert ``source`` with the worker settings updated by ``overrides``
+    and return the parts listed in ``names``.
+    """
+    if _worker_settings is None:
+        raise RuntimeError('render_parts runs in the worker processes of a RenderServer')
+    settings = copy.deepcopy(_worker_settings)
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    settings.traceback = True  # errors are sent back instead of exiting
+    try:
+        pub = Publisher(
+            Reader(),
+            Parser(),
+            HTML5Writer(),
+            source_class=StringInput,
+            destination_class=StringOutput,
+            settings=settings,  # type: ignore[arg-type]
+        )
+        pub.set_source(source)
+        pub.set_destination()
+        pub.publish()
+        parts: Any = pub.writer.parts  # type: ignore[union-attr]
+    except Exception as error:
+        # docutils exceptions such as SystemMessage cannot be unpickled by the server
+        raise DaemonError(f'{error.__class__.__name__}: {error}') from None
+    return {name: parts[name] for name in names}
+
+
+class RenderServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Accept render requests on ``path`` and convert them in ``workers`` processes
+    """
+
+    daemon_threads = True
+    # documents come from other processes: they must not read files of the daemon
+    default_overrides = RenderApp.default_overrides
+    # settings that a request may change
+    request_settings = RenderApp.request_settings
+
+    def __init__(self, path: str, settings: Values, workers: int = 1, queue_size: int = 16) -> None:
+        # the server is closed if binding fails, before the workers are started
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.socket_path: Optional[str] = None
+        super().__init__(path, RenderHandler)
+        settings = copy.copy(settings)
+        for name, value in self.default_overrides.items():
+            setattr(settings, name, value)
+        workers = workers or os.cpu_count() or 1
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(settings,))
+        # start and warm up all workers before serving requests
+        for future in [self.executor.submit(os.getpid) for _ in range(workers)]:
+            future.result()
+
+    def server_bind(self) -> None:
+        path = cast(str, self.server_address)
+        if os.path.exists(path):
+            if not stat.S_ISSOCK(os.stat(path).st_mode):
+                raise DaemonError(f'{path} exists and is not a socket')
+            # a socket file left by a daemon that was killed is removed
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                try:
+                    sock.connect(path)
+                except ConnectionRefusedError:
+                    os.unlink(path)
+        super().server_bind()
+        self.socket_path = path
+
+    def render(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Return the response to a request
+        """
+        source = request.get('source')
+        overrides = request.get('settings', {})
+        names = request.get('parts', ['body'])
+        if (
+            not isinstance(source, str)
+            or not isinstance(overrides, dict)
+            or not isinstance(names, list)
+        ):
+            return {'error': 'invalid request', 'type': 'request'}
+        forbidden = sorted(set(overrides) - self.request_settings)
+        if forbidden:
+            return {'error': f'settings not allowed: {", ".join(forbidden)}', 'type': 'request'}
+        if not self.slots.acquire(blocking=False):
+            return {'error': 'too many requests', 'type': 'overload'}
+        try:
+            return self.submit(source, overrides, names)
+        finally:
+            self.slots.release()
+
+    def submit(self, source: str, overrides: Dict[str, Any], names: List[str]) -> Dict[str, Any]:
+        """
+        Render a valid request in a worker and return the response
+        """
+        if self.executor is None:
+            return {'error': 'the daemon is closed', 'type': 'render'}
+        try:
+            parts = self.executor.submit(render_parts, source, overrides, names).result()
+        except KeyError as error:
+            return {'error': f'unknown part {error}', 'type': 'request'}
+        except DaemonError as error:
+            return {'error': str(error), 'type': 'render'}
+        except Exception as error:
+            return {'error': f'{error.__class__.__name__}: {error}', 'type': 'render'}
+        return {'parts': parts}
+
+    def server_close(self) -> None:
+        super().server_close()
+        if self.executor is not None:
+            self.executor.shutdown()
+        # only the socket created by this server is removed
+        path = self.socket_path
+        if path is not None and os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+
+
+class RenderHandler(socketserver.StreamRequestHandler):
+    server: RenderServer
+
+    def handle(self) -> None:
+        try:
+            request = json.loads(self.rfile.readline(MAX_REQUEST_SIZE))
+        except ValueError:
+            response: Dict[str, Any] = {'error': 'invalid JSON', 'type': 'request'}
+        else:
+            if isinstance(request, dict):
+                response = self.server.render(request)
+            else:
+                response = {'error': 'invalid request', 'type': 'request'}
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+def render(
+    source: str,
+    socket_path: str,
+    parts: Sequence[str] = ('body',),
+    settings: Optional[Dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+) -> Dict[str, str]:
+    """
+    Render ``source`` by the daemon listening on ``socket_path`` and return the requested parts.
+    ``settings`` overrides the settings the daemon was started with.
+
+    Raise :class:`OverloadError` if the daemon is busy and :class:`DaemonError` on any other error.
+    """
+    request = {'source': source, 'settings': settings or {}, 'parts': list(parts)}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as response_file:
+            response = json.loads(response_file.readline())
+    if 'error' in response:
+        error_class = OverloadError if response['type'] == 'overload' else DaemonError
+        raise error_class(response['error'])
+    return response['parts']
+
+
+def main(argv: Optional[List[str]] = None, description: Optional[str] = None) -> int:
+    """
+    Entry point of ``rst2html5 --daemon``. Return the exit status.
+    """
+    parser = OptionParser(
+        components=(Parser, Reader, HTML5Writer, DaemonSettingsSpec),
+        read_config_files=True,
+        usage='%prog --daemon --socket PATH [options]',
+        description=description,
+    )
+    settings: Any = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    if not settings.socket:
+        parser.error('--socket is required in daemon mode.')
+    # SIGTERM closes the server and removes the socket file
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server = RenderServer(settings.socket, settings, settings.jobs, settings.queue_size)
+    except DaemonError as error:
+        parser.error(str(error))
+    with server:
+        print(f'rst2html5: listening on {settings.socket}', file=sys.stderr, flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
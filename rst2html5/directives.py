@@ -1,4 +1,3 @@
-import re
 from hashlib import md5
 from typing import Any, Dict, List, Union
 
@@ -6,15 +5,35 @@ from docutils import nodes
 from docutils.nodes import Element, literal_block, table
 from docutils.parsers.rst import Directive, directives
 from docutils.parsers.rst.directives import register_directive
-from pygments import highlight
-from pygments.formatters import HtmlFormatter
-from pygments.lexers import get_lexer_by_name
 
+from .highlight import get_disk_cache, highlight_code, pygmentize  # noqa: F401
+from .profiling import measure
+from .stats import get_timer, phase
 
-def pygmentize(code: str, language: str, **kwargs: Any) -> str:
-    lexer = get_lexer_by_name(language)
-    formatter = HtmlFormatter(**kwargs)
-    return highlight(code, lexer, formatter)
+
+def local_settings(document: nodes.document) -> Dict[str, Any]:
+    """
+    Settings changed by the directives of ``document``.
+
+    ``document.settings`` may be shared by many documents, even by documents translated
+    at the same time. Directives such as ``stylesheet`` or ``define`` store their changes here.
+    """
+    return vars(document).setdefault('rst2html5_settings', {})
+
+
+def get_setting(document: nodes.document, name: str) -> Any:
+    """
+    Value of the setting ``name`` for ``document``, including the changes made by its directives
+    """
+    settings = local_settings(document)
+    return settings[name] if name in settings else getattr(document.settings, name, None)
+
+
+def _local_list(document: nodes.document, name: str) -> List[Any]:
+    settings = local_settings(document)
+    if name not in settings:
+        settings[name] = list(getattr(document.settings, name, None) or [])
+    return settings[name]
 
 
 #
@@ -52,7 +71,8 @@ class CodeBlock(Directive):
     settings.
 
     Pygments is used for highlighting.
-    However, its highlight output is cluttered and thus rst2html5 cleans it up to a more HTML5 style:
+    However, its usual HTML output is cluttered and thus rst2html5 uses its own formatter
+    (see :class:`rst2html5.highlight.CodeBlockFormatter`) to produce a more HTML5 style:
 
     * It uses 'data-language' attributes instead of attributes such as class="sourcecode" or class="code language".
       Thus, these code-block elements should be addressed in CSS3 using '[data-language]', 'pre[data-language]'
@@ -89,6 +109,10 @@ class CodeBlock(Directive):
     }
 
     def run(self) -> List[Element]:
+        with measure(self.state.document, 'CodeBlock.run'):
+            return self._run()
+
+    def _run(self) -> List[Element]:
         self.assert_has_content()
 
         language = self.arguments[0]
@@ -115,21 +139,29 @@ class CodeBlock(Directive):
                 document = self.state.document
                 return [document.reporter.warning(str(err), line=self.lineno)]
 
-        output = pygmentize(code, language, **pygmentize_args)
-        # remove empty span included by Pygments
-        # See:
-        # https://bitbucket.org/birkenfeld/pygments-main/issues/1254/empty-at-the-begining-of-the-highlight
-        output = output.replace('<span></span>', '')
-        pre = re.findall('<pre.*?>(.*?)\n*</pre>', output, re.DOTALL)
-        if len(pre) == 1:
-            node += nodes.raw(pre[0], pre[0], format='html')
-        else:  # pygments returned a table
+        settings = self.state.document.settings
+        disk_cache = None
+        if getattr(settings, 'highlight_cache', None):
+            disk_cache = get_disk_cache(settings.highlight_cache, settings.highlight_cache_size)
+        document = self.state.document
+        with phase(document, 'highlight'):
+            fragments = highlight_code(code, language, disk_cache=disk_cache, **pygmentize_args)
+        timer = get_timer(document)
+        if timer is not None:
+            timer.count('code_blocks')
+        if fragments.linenos is None:
+            node += nodes.raw(fragments.code, fragments.code, format='html')
+        else:
             row = nodes.row()
             node += row
             linenos_cell = nodes.entry(classes=['linenos'])
-            linenos_cell += nodes.literal_block('', '', nodes.raw(pre[0], pre[0], format='html'))
+            linenos_cell += nodes.literal_block(
+                '', '', nodes.raw(fragments.linenos, fragments.linenos, format='html')
+            )
             code_cell = nodes.entry(classes=['code'])
-            code_cell += nodes.literal_block('', '', nodes.raw(pre[1], pre[1], format='html'))
+            code_cell += nodes.literal_block(
+                '', '', nodes.raw(fragments.code, fragments.code, format='html')
+            )
             row += linenos_cell
             row += code_cell
 
@@ -159,10 +191,7 @@ class Define(Directive):
     final_argument_whitespace = True
 
     def run(self) -> List[Element]:
-        if not self.state.document.settings.identifiers:
-            identifiers = self.state.document.settings.identifiers = []
-        else:
-            identifiers = self.state.document.settings.identifiers
+        identifiers = _local_list(self.state.document, 'identifiers')
         arguments = self.arguments[0].lower().split()
         for identifier in arguments:
             identifier = identifier.lower()
@@ -185,7 +214,7 @@ class Undefine(Directive):
     final_argument_whitespace = True
 
     def run(self) -> List[Element]:
-        identifiers = self.state.document.settings.identifiers or []
+        identifiers = _local_list(self.state.document, 'identifiers')
         arguments = self.arguments[0].lower().split()
         for identifier in arguments:
             identifier = identifier.lower()
@@ -222,7 +251,7 @@ class IfDef(Directive):
 
     def check(self) -> bool:
         self.assert_has_content()
-        identifiers = self.state.document.settings.identifiers or []
+        identifiers = get_setting(self.state.document, 'identifiers') or []
         arguments = self.arguments[0].lower().split()
         if len(arguments) == 1:
             identifier = arguments[0]
@@ -274,12 +303,8 @@ class StyleSheet(Directive):
     }
 
     def run(self) -> List[Element]:
-        settings = self.state.document.settings
-        if 'inline' not in self.options:
-            stylesheet = settings.stylesheet = settings.stylesheet or []
-        else:
-            stylesheet = settings.stylesheet_inline = settings.stylesheet_inline or []
-        stylesheet.append(self.arguments[0])
+        name = 'stylesheet_inline' if 'inline' in self.options else 'stylesheet'
+        _local_list(self.state.document, name).append(self.arguments[0])
         return []
 
 
@@ -297,9 +322,7 @@ class Script(Directive):
 
     def run(self) -> List[Element]:
         attr = 'defer' in self.options and 'defer' or 'async' in self.options and 'async' or None
-        settings = self.state.document.settings
-        settings.script = settings.script or []
-        settings.script.append((self.arguments[0], attr))
+        _local_list(self.state.document, 'script').append((self.arguments[0], attr))
         return []
 
 
@@ -322,8 +345,8 @@ class Template(Directive):
     has_content = True
 
     def run(self) -> List[Element]:
-        settings = self.state.document.settings
-        settings.template = len(self.arguments) and self.arguments[0] or '\n'.join(self.content)
+        template = len(self.arguments) and self.arguments[0] or '\n'.join(self.content)
+        local_settings(self.state.document)['template'] = template
         return []
 
 
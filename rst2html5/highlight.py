@@ -0,0 +1,410 @@
+"""
+Pygments highlighting used by the ``code-block`` directive.
+
+Documentation usually repeats the same snippets over and over again
+(installation commands, configuration samples...).
+Highlighting results are kept in a bounded LRU cache
+so that an identical block costs only a dictionary lookup::
+
+    >>> from rst2html5.highlight import highlight_cache
+    >>> highlight_cache.info()
+    CacheInfo(hits=0, misses=0, evictions=0, maxsize=1024, currsize=0)
+
+The ``--highlight-cache`` setting adds a second level stored on disk (see :class:`DiskCache`)
+that is shared by parallel workers and by successive runs.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing.util import Finalize
+from typing import Any, Dict, Hashable, Iterable, NamedTuple, Optional, Set, Tuple
+
+import pygments
+from pygments import highlight
+from pygments.formatters import HtmlFormatter
+from pygments.lexer import Lexer
+from pygments.lexers import get_lexer_by_name
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: int
+    currsize: int
+
+
+class LRUCache:
+    """
+    Thread-safe mapping bounded to ``maxsize`` entries.
+    The least recently used entry is discarded when the cache is full.
+    ``maxsize = 0`` disables the cache.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            if self.maxsize <= 0:
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.evictions, self.maxsize, len(self._data))
+
+
+highlight_cache = LRUCache()
+
+
+def _freeze(options: Dict[str, Any]) -> Tuple:
+    """
+    Hashable version of formatter options. Lists such as ``hl_lines`` become tuples.
+    """
+    return tuple(
+        sorted(
+            (key, tuple(value) if isinstance(value, list) else value)
+            for key, value in options.items()
+        )
+    )
+
+
+# changes whenever the format of the cached values changes
+CACHE_FORMAT = 2
+
+
+class DiskCache:
+    """
+    Content-addressed highlighting cache stored in a SQLite database.
+
+    SQLite serializes concurrent writers, so the same file can be shared by
+    several processes. Once the stored values exceed ``max_size`` bytes,
+    the least recently used entries are deleted.
+    The size is checked each time a process has written ``max_size / EVICT_FRACTION`` bytes,
+    so the file may briefly exceed ``max_size`` by that much per process.
+
+    The cache is only an optimization: a database error skips it instead of failing.
+    """
+
+    # seconds to wait for a database locked by another writer
+    timeout = 60
+    # the size of the cache is checked after writing max_size / EVICT_FRACTION bytes
+    EVICT_FRACTION = 16
+    # number of hits whose recency is saved at once
+    TOUCH_BATCH = 64
+
+    def __init__(self, path: str, max_size: int = 64 * 1024 * 1024) -> None:
+        self.path = path
+        self.max_size = max_size
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid = 0
+        self._lock = threading.Lock()
+        # bytes written since the size was last checked
+        self._written = 0
+        # keys read since their recency was last saved
+        self._used: Set[str] = set()
+
+    @staticmethod
+    def make_key(code: str, language: str, options: Tuple) -> str:
+        """
+        The Pygments version is part of the key so that an upgrade invalidates old entries.
+        """
+        data = json.dumps([CACHE_FORMAT, pygments.__version__, language, options, code])
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # a connection must not be shared with forked processes
+        if self._connection is None or self._pid != os.getpid():
+            self._written = 0
+            self._used.clear()
+            connection = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS highlight ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                'size INTEGER NOT NULL, used REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS highlight_used ON highlight (used)')
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            try:
+                connection = self.connection
+                row = connection.execute(
+                    'SELECT value FROM highlight WHERE key = ?', (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                self._used.add(key)
+                if len(self._used) >= self.TOUCH_BATCH:
+                    self._try_touch(connection)
+                return row[0]
+            except sqlite3.Error:
+                return None
+
+    def put(self, key: str, value: str) -> None:
+        size = len(value.encode('utf-8'))
+        with self._lock:
+            try:
+                connection = self.connection
+                connection.execute('BEGIN IMMEDIATE')
+                try:
+                    connection.execute(
+                        'INSERT OR REPLACE INTO highlight (key, value, size, used) '
+                        'VALUES (?, ?, ?, ?)',
+                        (key, value, size, time.time()),
+                    )
+                    self._touch(connection)
+                    self._written += size
+                    if self._written * self.EVICT_FRACTION >= self.max_size:
+                        self._written = 0
+                        self._evict(connection)
+                except BaseException:
+                    connection.execute('ROLLBACK')
+                    raise
+                connection.execute('COMMIT')
+            except sqlite3.Error:
+                pass
+
+    def _touch(self, connection: sqlite3.Connection) -> None:
+        """
+        Save the recency of the keys read since the last time
+        """
+        now = time.time()
+        connection.executemany(
+            'UPDATE highlight SET used = ? WHERE key = ?', [(now, key) for key in self._used]
+        )
+        self._used.clear()
+
+    def _try_touch(self, connection: sqlite3.Connection) -> None:
+        # recency is just a hint: it is not worth waiting for another writer
+        connection.execute('PRAGMA busy_timeout = 0')
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            self._touch(connection)
+            connection.execute('COMMIT')
+        except sqlite3.OperationalError:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+        finally:
+            connection.execute(f'PRAGMA busy_timeout = {int(self.timeout * 1000)}')
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        excess = connection.execute('SELECT TOTAL(size) FROM highlight').fetchone()[0]
+        excess -= self.max_size
+        if excess <= 0:
+            return
+        keys = []
+        for key, size in connection.execute('SELECT key, size FROM highlight ORDER BY used'):
+            keys.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        connection.executemany('DELETE FROM highlight WHERE key = ?', keys)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                try:
+                    if self._used:
+                        self._try_touch(self._connection)
+                    self._connection.close()
+                except sqlite3.Error:
+                    pass
+            self._connection = None
+
+
+_disk_caches: Dict[str, DiskCache] = {}
+# process that registered close_disk_caches to run at exit
+_closing_pid = 0
+
+
+def close_disk_caches() -> None:
+    """
+    Close the disk caches of the process, saving the recency of the entries read last.
+    It runs when the process exits.
+    """
+    for cache in list(_disk_caches.values()):
+        cache.close()
+
+
+def get_disk_cache(path: str, max_size: int) -> DiskCache:
+    """
+    Return the process-wide :class:`DiskCache` of ``path``.
+    """
+    global _closing_pid  # noqa: PLW0603
+    cache = _disk_caches.get(path)
+    if cache is None:
+        cache = _disk_caches.setdefault(path, DiskCache(path, max_size))
+    cache.max_size = max_size
+    if _closing_pid != os.getpid():
+        # worker processes of a pool exit without running atexit handlers,
+        # but they run multiprocessing finalizers, which the main process runs at exit
+        Finalize(None, close_disk_caches, exitpriority=0)
+        _closing_pid = os.getpid()
+    return cache
+
+
+class Fragments(NamedTuple):
+    """
+    HTML contents of the ``<pre>`` elements of a code block.
+    ``linenos`` is ``None`` unless line numbers were requested.
+    """
+
+    code: str
+    linenos: Optional[str] = None
+
+
+class CodeBlockFormatter(HtmlFormatter):
+    """
+    Pygments formatter that produces only what the ``code-block`` directive needs:
+    the highlighted lines (with ``hl_lines`` spans and line anchors)
+    and the line numbers column as separate fragments.
+
+    Wrappers such as ``<div class="highlight">``, ``<table>`` or ``<pre>``
+    are never generated since they would have to be stripped off afterwards.
+    The lines come from private methods of ``HtmlFormatter``:
+    the tests compare the fragments with the output of ``HtmlFormatter``.
+    """
+
+    def format_fragments(self, tokensource: Iterable) -> Fragments:
+        source = self._format_lines(tokensource)
+        if self.hl_lines:
+            source = self._highlight_lines(source)
+        if self.lineanchors:
+            source = self._wrap_lineanchors(source)
+        lines = []
+        count = 0
+        for is_line, piece in source:
+            count += is_line
+            lines.append(piece)
+        code = ''.join(lines).rstrip('\n')
+        if self.linenos != 1:  # 1 means 'table'
+            return Fragments(code)
+        return Fragments(code, self._format_linenos(count))
+
+    def _format_linenos(self, count: int) -> str:
+        start = self.linenostart
+        width = len(str(count + start - 1))
+        anchor = self.lineanchors or self.linespans
+        numbers = []
+        for number in range(start, start + count):
+            if number % self.linenostep == 0:
+                lineno = f'{number:>{width}}'
+                if self.anchorlinenos:
+                    lineno = f'<a href="#{anchor}-{number}">{lineno}</a>'
+            else:
+                lineno = ' ' * width
+            special = self.linenospecial and number % self.linenospecial == 0
+            numbers.append(f'<span class="{"special" if special else "normal"}">{lineno}</span>')
+        return '\n'.join(numbers)
+
+
+_lexers: Dict[str, Lexer] = {}
+_formatters = LRUCache(maxsize=256)
+
+
+def get_lexer(language: str) -> Lexer:
+    """
+    Return the lexer of ``language``.
+
+    Looking up a lexer by name scans the Pygments registry and plugin entry points
+    and the first instance of a lexer class compiles its regular expressions.
+    Thus, lexers are resolved only once per process and then reused.
+    """
+    lexer = _lexers.get(language)
+    if lexer is None:
+        lexer = _lexers.setdefault(language, get_lexer_by_name(language))
+    return lexer
+
+
+def get_formatter(options: Tuple) -> CodeBlockFormatter:
+    """
+    Return a formatter for the frozen ``options`` (see :func:`_freeze`).
+    """
+    formatter = _formatters.get(options)
+    if formatter is None:
+        formatter = CodeBlockFormatter(
+            **{key: list(value) if isinstance(value, tuple) else value for key, value in options}
+        )
+        _formatters.put(options, formatter)
+    return formatter
+
+
+def preload(languages: Iterable[str]) -> None:
+    """
+    Resolve the lexers of ``languages`` in advance, for example when a worker process starts.
+    """
+    for language in languages:
+        get_lexer(language)
+
+
+def highlight_code(
+    code: str, language: str, disk_cache: Optional[DiskCache] = None, **kwargs: Any
+) -> Fragments:
+    """
+    Highlight ``code`` and return its HTML fragments.
+    ``kwargs`` are :class:`~pygments.formatters.HtmlFormatter` options.
+
+    The in-memory cache is checked first, then ``disk_cache`` if given.
+    """
+    options = _freeze(kwargs)
+    key = (code, language, options)
+    fragments = highlight_cache.get(key)
+    if fragments is not None:
+        return fragments
+    if disk_cache is not None:
+        disk_key = disk_cache.make_key(code, language, options)
+        value = disk_cache.get(disk_key)
+        if value is not None:
+            fragments = Fragments(*json.loads(value))
+    if fragments is None:
+        lexer = get_lexer(language)
+        fragments = get_formatter(options).format_fragments(lexer.get_tokens(code))
+        if disk_cache is not None:
+            disk_cache.put(disk_key, json.dumps(fragments))
+    highlight_cache.put(key, fragments)
+    return fragments
+
+
+def pygmentize(code: str, language: str, **kwargs: Any) -> str:
+    """
+    Complete Pygments HTML output of ``code``. The code-block directive uses :func:`highlight_code`.
+    """
+    return highlight(code, get_lexer(language), HtmlFormatter(**kwargs))
@@ -0,0 +1,170 @@
+"""
+Memory allocated by each phase of a conversion, measured by :mod:`tracemalloc`.
+
+With the ``--memory-profile`` setting, the phases that build the large structures of a conversion
+are traced:
+
+parse
+    construction of the doctree by the parser.
+    Only measured when the document is converted by :class:`rst2html5.stats.Publisher`,
+    as ``rst2html5`` and :class:`rst2html5.renderer.Renderer` do.
+translate
+    accumulation of the HTML elements in the ``ElemStack`` of the translator.
+serialize
+    serialization of the head and body elements into strings.
+template
+    assembly of the whole document from the template.
+
+For each phase, the result holds the peak of memory allocated above the level of its start,
+the memory still allocated at its end (retained) and the source lines that retained the most.
+They are returned as the ``memory`` part::
+
+    >>> overrides = {'memory_profile': True}
+    >>> parts = publish_parts(source, writer=HTML5Writer(), settings_overrides=overrides)
+    >>> parts['memory']['translate']['peak']
+    482133
+
+Tracing slows down the conversion several times and :mod:`tracemalloc` traces the whole process,
+so the figures of documents converted in parallel threads get mixed.
+On Python 3.8, which lacks ``tracemalloc.reset_peak``,
+the peak of a phase is the highest since tracing started.
+"""
+
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from docutils import nodes
+
+MEMORY_PHASES = ('parse', 'translate', 'serialize', 'template')
+# allocation sites reported per phase
+TOP_SITES = 5
+KIB = 1024
+
+
+class MemoryProfiler:
+    """
+    Memory allocated by the phases of the conversion of a document
+    """
+
+    def __init__(self) -> None:
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        self._started = False
+        self._start: Optional[Tuple[int, tracemalloc.Snapshot]] = None
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+        snapshot = tracemalloc.take_snapshot()
+        current, _ = tracemalloc.get_traced_memory()
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        self._start = (current, snapshot)
+
+    def stop(self, name: str) -> None:
+        if self._start is None or not tracemalloc.is_tracing():
+            return
+        start_size, before = self._start
+        self._start = None
+        current, peak = tracemalloc.get_traced_memory()
+        differences = tracemalloc.take_snapshot().compare_to(before, 'lineno')
+        self.phases[name] = {
+            'peak': max(peak - start_size, 0),
+            'retained': current - start_size,
+            'top': [
+                {
+                    'site': f'{diff.traceback[0].filename}:{diff.traceback[0].lineno}',
+                    'size': diff.size_diff,
+                    'count': diff.count_diff,
+                }
+                for diff in differences
+                if diff.size_diff > 0 and diff.traceback[0].filename not in _IGNORED_FILES
+            ][:TOP_SITES],
+        }
+
+    def finish(self) -> None:
+        """
+        Stop tracing if it was started by this profiler
+        """
+        self._start = None
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {name: self.phases[name] for name in MEMORY_PHASES if name in self.phases}
+
+
+# allocations of the measures themselves
+_IGNORED_FILES = {
+    tracemalloc.__file__,
+    __file__,
+    str(Path(__file__).with_name('stats.py')),
+    str(Path(__file__).with_name('tracing.py')),
+}
+
+
+def get_memory_profiler(document: nodes.document) -> Optional[MemoryProfiler]:
+    """
+    Memory profiler of ``document``, created on first use,
+    or None if the ``memory_profile`` setting is off
+    """
+    profiler = vars(document).get('rst2html5_memory')
+    if profiler is None and getattr(document.settings, 'memory_profile', False):
+        profiler = vars(document)['rst2html5_memory'] = MemoryProfiler()
+    return profiler
+
+
+def format_size(size: float) -> str:
+    for unit in ('B', 'KiB', 'MiB'):
+        if abs(size) < KIB:
+            return f'{size:.1f} {unit}'
+        size /= KIB
+    return f'{size:.1f} GiB'
+
+
+def _short_site(site: str) -> str:
+    path, _, line = site.rpartition(':')
+    parts = Path(path).parts[-2:]
+    return f'{"/".join(parts)}:{line}'
+
+
+def format_memory(memory: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Text report of the memory part of a document
+    """
+    lines = [f'{"phase":<44}{"peak":>12}{"retained":>12}']
+    for name, values in memory.items():
+        lines.append(
+            f'{name:<44}{format_size(values["peak"]):>12}{format_size(values["retained"]):>12}'
+        )
+        for site in values['top']:
+            lines.append(
+                f'  {_short_site(site["site"]):<42}{"":>12}{format_size(site["size"]):>12}'
+                f'  {site["count"]} blocks'
+            )
+    return '\n'.join(lines)
+
+
+def format_memory_summary(memories: Dict[str, Dict[str, Dict[str, Any]]], top: int = 10) -> str:
+    """
+    Text report of the documents with the highest peaks,
+    followed by the allocation sites of the highest one
+    """
+
+    def highest_peak(item: Tuple[str, Dict[str, Dict[str, Any]]]) -> int:
+        return max((values['peak'] for values in item[1].values()), default=0)
+
+    ranked = sorted(memories.items(), key=highest_peak, reverse=True)
+    width = max((len(name) for name, _ in ranked[:top]), default=8) + 2
+    lines: List[str] = [f'{"document":<{width}}' + ''.join(f'{n:>12}' for n in MEMORY_PHASES)]
+    for name, memory in ranked[:top]:
+        peaks = (
+            format_size(memory[phase]['peak']) if phase in memory else '-'
+            for phase in MEMORY_PHASES
+        )
+        lines.append(f'{name:<{width}}' + ''.join(f'{peak:>12}' for peak in peaks))
+    if ranked:
+        lines += ['', f'highest peak: {ranked[0][0]}', format_memory(ranked[0][1])]
+    return '\n'.join(lines)
@@ -0,0 +1,143 @@
+"""
+Reusable renderer for converting many strings with the same settings.
+
+:func:`docutils.core.publish_parts` builds an option parser from the settings specs
+of every component, reads the configuration files and creates new components on each call.
+For short snippets, that setup costs more than the conversion itself.
+A :class:`Renderer` resolves the settings once and only layers the overrides of each call on top::
+
+    >>> from rst2html5.renderer import Renderer
+    >>> renderer = Renderer({'indent_output': False})
+    >>> renderer.render('Some *text*.')['body']
+    '<p>Some <em>text</em>.</p>'
+    >>> renderer.render('Some *text*.', {'indent_output': True})['body']
+    '\\n    <p>Some <em>text</em>.</p>\\n'
+
+Directives such as ``stylesheet`` or ``define`` only change the document they belong to
+(see :func:`rst2html5.directives.local_settings`), so nothing leaks from one call to the next.
+A renderer may be shared by many threads.
+"""
+
+import copy
+import threading
+from typing import Any, Dict, Optional
+
+import docutils.statemachine
+from docutils.frontend import OptionParser, Values
+from docutils.io import StringInput, StringOutput
+from docutils.parsers.rst import Parser, roles, states
+from docutils.readers.standalone import Reader
+from docutils.utils import DependencyList
+
+from . import HTML5Writer
+from .stats import Publisher
+
+
+class ReusableParser(Parser):
+    """
+    reStructuredText parser that keeps its state machine from one document to the next.
+
+    Building the state machine compiles the patterns of every state,
+    which takes longer than parsing a short document.
+    A parser must not be used by two threads at once.
+    """
+
+    statemachine = None  # type: ignore[assignment]
+
+    def parse(self, inputstring: str, document: Any) -> None:
+        self.setup_parse(inputstring, document)
+        document.settings.setdefault('tab_width', 8)
+        document.settings.setdefault('syntax_highlight', 'long')
+        debug = document.reporter.debug_flag
+        if self.statemachine is None or self.statemachine.debug != debug:
+            self.statemachine = states.RSTStateMachine(
+                state_classes=self.state_classes, initial_state=self.initial_state, debug=debug
+            )
+        inputlines = docutils.statemachine.string2lines(
+            inputstring, tab_width=document.settings.tab_width, convert_whitespace=True
+        )
+        line_length_limit = getattr(document.settings, 'line_length_limit', None)
+        for i, line in enumerate(inputlines):
+            if line_length_limit is not None and len(line) > line_length_limit:
+                error = document.reporter.error(f'Line {i + 1} exceeds the line-length-limit.')
+                document.append(error)
+                break
+        else:
+            try:
+                self.statemachine.run(inputlines, document, inliner=self.inliner)
+            except BaseException:
+                # the state machine is left in the middle of a run
+                self.statemachine = None
+                raise
+        # restore the "default" default role after parsing a document
+        roles._roles.pop('', None)  # type: ignore[attr-defined]
+        self.finish_parse()
+
+
+class Renderer:
+    """
+    Convert reStructuredText strings with settings resolved once.
+
+    ``settings_overrides`` applies to every call.
+    Configuration files are read only if ``read_config_files`` is set,
+    as :func:`docutils.core.publish_parts` does.
+    Errors are raised instead of exiting.
+    """
+
+    def __init__(
+        self, settings_overrides: Optional[Dict[str, Any]] = None, read_config_files: bool = True
+    ) -> None:
+        option_parser = OptionParser(
+            components=(Parser, Reader, HTML5Writer),
+            defaults=settings_overrides,
+            read_config_files=read_config_files,
+        )
+        self.settings: Values = option_parser.get_default_values()
+        self.settings.traceback = True
+        self._local = threading.local()
+
+    def _parser(self) -> ReusableParser:
+        # each thread has its own parser because the state machine is not thread-safe
+        parser = getattr(self._local, 'parser', None)
+        if parser is None:
+            parser = self._local.parser = ReusableParser()
+        return parser
+
+    def make_settings(self, settings_overrides: Optional[Dict[str, Any]] = None) -> Values:
+        """
+        Settings of a single conversion: the renderer settings updated by ``settings_overrides``
+        """
+        # the publisher stores the source and destination paths in the settings
+        settings = copy.copy(self.settings)
+        for name, value in (settings_overrides or {}).items():
+            setattr(settings, name, value)
+        settings.record_dependencies = DependencyList()
+        return settings
+
+    def publish(
+        self, source: str, settings_overrides: Optional[Dict[str, Any]] = None
+    ) -> Publisher:
+        """
+        Convert ``source`` and return the publisher,
+        whose ``document`` and ``writer`` attributes hold the results
+        """
+        publisher = Publisher(
+            Reader(),
+            self._parser(),
+            HTML5Writer(),
+            source_class=StringInput,
+            destination_class=StringOutput,
+            settings=self.make_settings(settings_overrides),  # type: ignore[arg-type]
+        )
+        publisher.set_source(source)
+        publisher.set_destination()
+        publisher.publish()
+        return publisher
+
+    def render(
+        self, source: str, settings_overrides: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Convert ``source`` and return the parts assembled by :meth:`HTML5Writer.assemble_parts`
+        """
+        return self.publish(source, settings_overrides).writer.parts  # type: ignore[union-attr, return-value]
@@ -0,0 +1,107 @@
+"""
+Log of the documents whose conversion is slower than a threshold.
+
+With ``--slow-log=<path>``, every conversion is timed by phase and by node type
+(see :mod:`rst2html5.stats` and :mod:`rst2html5.profiling`),
+and a conversion that takes longer than ``--slow-threshold`` seconds (default ``1``)
+appends a JSON line to ``<path>``::
+
+    {"time": "2026-10-18T09:12:03+00:00", "source": "docs/api.rst", "sha256": "5f1c...",
+     "size": 482133, "elapsed": 2.41, "threshold": 1.0, "nodes": 61233,
+     "node_types": {"Text": 20411, "paragraph": 5120, ...},
+     "phases": {"parse": 1.52, "highlight": 0.87, "transforms": 0.11, ...},
+     "expensive_nodes": [{"type": "literal_block", "calls": 402, "time": 0.31}, ...]}
+
+It works wherever documents are converted by :class:`rst2html5.stats.Publisher`:
+``rst2html5``, ``--batch``, ``--watch``, ``--daemon``, :mod:`rst2html5.web`
+and :mod:`rst2html5.aio`.
+Sources without a path, such as strings sent to a server, are identified by their hash.
+Lines are appended in a single write, so that processes can share the log.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from docutils import nodes
+
+# node types reported as the most expensive
+TOP_NODES = 5
+
+
+def is_enabled(settings: Any) -> bool:
+    return bool(getattr(settings, 'slow_log', None))
+
+
+def expensive_nodes(profile: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Node types whose visit and depart handlers took the most time
+    """
+    types: Dict[str, Dict[str, Any]] = {}
+    for name, entry in profile.items():
+        action, _, node_type = name.partition('_')
+        if action not in ('visit', 'depart'):
+            continue
+        total = types.setdefault(node_type, {'type': node_type, 'calls': 0, 'time': 0.0})
+        if action == 'visit':
+            total['calls'] += entry['calls']
+        total['time'] += entry['time']
+    return sorted(types.values(), key=lambda item: item['time'], reverse=True)[:TOP_NODES]
+
+
+def slow_entry(
+    document: nodes.document, source: Optional[str], elapsed: float
+) -> Optional[Dict[str, Any]]:
+    """
+    Log entry of ``document`` if its conversion took longer than the threshold, else None
+    """
+    settings = document.settings
+    threshold = float(getattr(settings, 'slow_threshold', 1.0))
+    if elapsed <= threshold:
+        return None
+    data = (source or '').encode('utf-8')
+    source_path = document.get('source')
+    entry: Dict[str, Any] = {
+        'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'source': source_path if source_path and not source_path.startswith('<') else None,
+        'sha256': hashlib.sha256(data).hexdigest(),
+        'size': len(data),
+        'elapsed': elapsed,
+        'threshold': threshold,
+    }
+    timer = vars(document).get('rst2html5_stats')
+    if timer is not None:
+        stats = timer.as_dict()
+        entry['nodes'] = stats['nodes']
+        entry['phases'] = {name: value['wall'] for name, value in stats['phases'].items()}
+    profile = vars(document).get('rst2html5_profile')
+    if profile is not None:
+        entries = profile.as_dict()
+        entry['node_types'] = {
+            name[len('visit_') :]: value['calls']
+            for name, value in sorted(entries.items(), key=lambda item: -item[1]['calls'])
+            if name.startswith('visit_')
+        }
+        entry['expensive_nodes'] = expensive_nodes(entries)
+        if 'CodeBlock.run' in entries:
+            entry['code_blocks'] = entries['CodeBlock.run']
+    return entry
+
+
+def log_if_slow(document: nodes.document, source: Optional[str], elapsed: float) -> bool:
+    """
+    Append the entry of ``document`` to the slow log if its conversion was slow.
+    Return whether it was.
+    """
+    entry = slow_entry(document, source, elapsed)
+    if entry is None:
+        return False
+    line = json.dumps(entry) + '\n'
+    fd = os.open(document.settings.slow_log, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        os.write(fd, line.encode('utf-8'))
+    finally:
+        os.close(fd)
+    return True
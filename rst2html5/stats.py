@@ -0,0 +1,299 @@
+"""
+Time spent in each phase of a conversion.
+
+With the ``--stats`` setting, the conversion of a document records the wall and CPU time
+of its phases and a few counters. They are returned as the ``stats`` part::
+
+    >>> parts = publish_parts(source, writer=HTML5Writer(), settings_overrides={'stats': True})
+    >>> parts['stats']['phases']['translate']
+    {'wall': 0.00153, 'cpu': 0.00152}
+
+The phases are:
+
+parse
+    reading and parsing the source, including the ``code-block`` directives.
+    Only measured when the document is converted by :class:`Publisher`,
+    as ``rst2html5`` and :class:`rst2html5.renderer.Renderer` do.
+highlight
+    Pygments highlighting of code blocks, part of ``parse``.
+transforms
+    docutils transforms, including ``FooterToBottom`` and ``WrapTopTitle``.
+translate
+    traversal of the doctree by :class:`rst2html5.HTML5Translator`.
+serialize
+    serialization of the head and body elements into HTML.
+template
+    loading of the template and formatting of the output.
+write
+    writing of the output to its destination.
+
+The counters are the number of nodes of the doctree,
+the number of code blocks highlighted and the size in bytes of the output.
+No time is measured unless this setting or ``slow_log`` is on.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from docutils import core, nodes
+from docutils.transforms import Transform
+
+from . import slowlog
+from .memory import MEMORY_PHASES, MemoryProfiler, get_memory_profiler
+from .tracing import Tracer, get_tracer, now
+
+PHASES = ('parse', 'highlight', 'transforms', 'translate', 'serialize', 'template', 'write')
+# phases included in another one
+SUBPHASES = {'highlight': 'parse'}
+COUNTERS = ('nodes', 'code_blocks', 'output_bytes')
+
+Clock = Tuple[float, float]
+
+
+def clock() -> Clock:
+    """
+    Wall and CPU time of the current thread
+    """
+    return time.perf_counter(), time.thread_time()
+
+
+class PhaseTimer:
+    """
+    Time and counters of the conversion of a document
+    """
+
+    def __init__(self) -> None:
+        self.phases: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = dict.fromkeys(COUNTERS, 0)
+        self.marks: Dict[str, Clock] = {}
+
+    def add(self, name: str, start: Clock) -> None:
+        """
+        Add the time elapsed since ``start`` to the phase ``name``
+        """
+        wall, cpu = clock()
+        phase = self.phases.setdefault(name, [0.0, 0.0])
+        phase[0] += wall - start[0]
+        phase[1] += cpu - start[1]
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = clock()
+        try:
+            yield
+        finally:
+            self.add(name, start)
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counters[name] += value
+
+    def as_dict(self) -> Dict[str, Any]:
+        phases = {
+            name: {'wall': self.phases[name][0], 'cpu': self.phases[name][1]}
+            for name in PHASES
+            if name in self.phases
+        }
+        top_phases = [value for name, value in phases.items() if name not in SUBPHASES]
+        return {
+            'phases': phases,
+            'total': {
+                'wall': sum(value['wall'] for value in top_phases),
+                'cpu': sum(value['cpu'] for value in top_phases),
+            },
+            **self.counters,
+        }
+
+
+def count_nodes(node: nodes.Node) -> int:
+    """
+    Number of nodes of the tree rooted at ``node``
+    """
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(getattr(node, 'children', ()))
+    return count
+
+
+@contextmanager
+def _no_phase() -> Iterator[None]:
+    yield
+
+
+@contextmanager
+def _measure_phase(
+    timer: Optional[PhaseTimer],
+    tracer: Optional[Tracer],
+    memory: Optional[MemoryProfiler],
+    name: str,
+) -> Iterator[None]:
+    # the snapshots of the memory profiler are left out of the time of the phase
+    if memory is not None:
+        memory.start()
+    start = clock()
+    trace_start = now()
+    try:
+        yield
+    except BaseException:
+        if memory is not None:
+            memory.finish()
+        raise
+    finally:
+        if timer is not None:
+            timer.add(name, start)
+        if tracer is not None:
+            tracer.span(name, trace_start, category='phase')
+        if memory is not None:
+            memory.stop(name)
+
+
+def get_timer(document: nodes.document) -> Optional[PhaseTimer]:
+    """
+    Timer of ``document``, created on first use,
+    or None if neither the ``stats`` nor the ``slow_log`` setting is on
+    """
+    timer = vars(document).get('rst2html5_stats')
+    settings = document.settings
+    if timer is None and (getattr(settings, 'stats', False) or slowlog.is_enabled(settings)):
+        timer = vars(document)['rst2html5_stats'] = PhaseTimer()
+    return timer
+
+
+def phase(document: nodes.document, name: str) -> Any:
+    """
+    Context manager that adds the time of its block to the phase ``name`` of ``document``,
+    its span to the trace of ``document`` and, for :data:`rst2html5.memory.MEMORY_PHASES`,
+    the memory it allocates to the memory profile of ``document``
+    """
+    timer = get_timer(document)
+    tracer = get_tracer(document)
+    memory = get_memory_profiler(document) if name in MEMORY_PHASES else None
+    if tracer is None and memory is None:
+        return _no_phase() if timer is None else timer.phase(name)
+    return _measure_phase(timer, tracer, memory, name)
+
+
+class StartTransforms(Transform):
+    """
+    Mark the start of the transforms. It is applied before any other transform.
+    """
+
+    default_priority = 0
+
+    def apply(self) -> None:
+        timer = get_timer(self.document)
+        if timer is not None:
+            timer.marks['transforms'] = clock()
+        tracer = get_tracer(self.document)
+        if tracer is not None:
+            tracer.trace_transforms(self.document.transformer)
+
+
+class Publisher(core.Publisher):
+    """
+    Publisher that also measures the time of reading and parsing the source
+    and logs slow conversions (see :mod:`rst2html5.slowlog`)
+    """
+
+    _parse_start: Optional[Clock] = None
+    _read_start: float = 0.0
+    _read_end: Optional[float] = None
+    _memory: Optional[MemoryProfiler] = None
+    _source_text: Optional[str] = None
+
+    def publish(self, *args: Any, **kwargs: Any) -> Any:
+        try:
+            output = super().publish(*args, **kwargs)
+        finally:
+            if self._memory is not None:
+                self._memory.finish()
+        if (
+            self.document is not None
+            and self._parse_start is not None
+            and slowlog.is_enabled(self.settings)
+        ):
+            elapsed = time.perf_counter() - self._parse_start[0]
+            slowlog.log_if_slow(self.document, self._source_text, elapsed)
+        return output
+
+    def set_io(
+        self,
+        source_path: Optional[Union[str, 'os.PathLike[str]']] = None,
+        destination_path: Optional[Union[str, 'os.PathLike[str]']] = None,
+    ) -> None:
+        self._memory = None
+        if getattr(self.settings, 'memory_profile', False):
+            self._memory = MemoryProfiler()
+            self._memory.start()
+        self._parse_start = clock()
+        self._read_start = now()
+        self._read_end = None
+        self._source_text = None
+        super().set_io(source_path, destination_path)
+        if getattr(self.settings, 'trace', None) or slowlog.is_enabled(self.settings):
+            read = self.source.read  # type: ignore[union-attr]
+
+            def measured_read() -> Any:
+                self._source_text = read()
+                self._read_end = now()
+                return self._source_text
+
+            self.source.read = measured_read  # type: ignore[method-assign, union-attr]
+
+    def apply_transforms(self) -> None:
+        timer = get_timer(self.document)  # type: ignore[arg-type]
+        if timer is not None and self._parse_start is not None:
+            timer.add('parse', self._parse_start)
+        tracer = get_tracer(self.document)  # type: ignore[arg-type]
+        if tracer is not None and self._read_end is not None:
+            tracer.span('read', self._read_start, self._read_end, 'phase')
+            tracer.span('parse', self._read_end, category='phase')
+        if self._memory is not None:
+            self._memory.stop('parse')
+            vars(self.document)['rst2html5_memory'] = self._memory
+        super().apply_transforms()
+
+
+def merge_stats(stats: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Sum of the stats of many documents
+    """
+    total: Dict[str, Any] = {'documents': 0, 'phases': {}, 'total': {'wall': 0.0, 'cpu': 0.0}}
+    for item in stats:
+        total['documents'] += 1
+        for name, values in item['phases'].items():
+            phase_total = total['phases'].setdefault(name, {'wall': 0.0, 'cpu': 0.0})
+            phase_total['wall'] += values['wall']
+            phase_total['cpu'] += values['cpu']
+        total['total']['wall'] += item['total']['wall']
+        total['total']['cpu'] += item['total']['cpu']
+        for name in COUNTERS:
+            total[name] = total.get(name, 0) + item[name]
+    total['phases'] = {name: total['phases'][name] for name in PHASES if name in total['phases']}
+    return total
+
+
+def format_stats(stats: Dict[str, Any]) -> str:
+    """
+    Text report of the stats of a document or of :func:`merge_stats`
+    """
+    total_wall = stats['total']['wall'] or 1
+    lines = [f'{"phase":<14}{"wall ms":>10}{"cpu ms":>10}{"%":>7}']
+    for name, values in stats['phases'].items():
+        label = f'  {name}' if name in SUBPHASES else name
+        lines.append(
+            f'{label:<14}{values["wall"] * 1000:>10.2f}{values["cpu"] * 1000:>10.2f}'
+            f'{values["wall"] / total_wall * 100:>7.1f}'
+        )
+    lines.append(
+        f'{"total":<14}{stats["total"]["wall"] * 1000:>10.2f}{stats["total"]["cpu"] * 1000:>10.2f}'
+    )
+    counters = ', '.join(f'{name.replace("_", " ")}: {stats[name]}' for name in COUNTERS)
+    if 'documents' in stats:
+        counters = f'documents: {stats["documents"]}, {counters}'
+    lines.append(counters)
+    return '\n'.join(lines)
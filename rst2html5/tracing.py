@@ -0,0 +1,125 @@
+"""
+Trace of conversions in the Chrome Trace Event Format.
+
+With ``--trace=<path>``, the conversion records a span for each step:
+reading and parsing the source, highlighting each code block, each transform,
+the translation and each of its top-level sections, serialization, template and write.
+The spans are written to ``<path>`` as JSON, which ``chrome://tracing``
+and https://ui.perfetto.dev display as a timeline::
+
+    $ rst2html5 --trace=trace.json doc.rst doc.html
+    $ rst2html5 --batch --jobs 4 --output-dir html --trace=trace.json docs/
+
+In batch mode, each worker process has its own track
+and each document is a span of its track,
+so that idle workers and slow documents stand out.
+The spans of a document are also returned as the ``trace`` part.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from docutils import nodes
+from docutils.transforms import Transformer
+
+
+def now() -> float:
+    """
+    Timestamp in microseconds. The clock is shared by the processes of a machine.
+    """
+    return time.perf_counter() * 1e6
+
+
+def span_event(
+    name: str, start: float, end: float, category: str = 'rst2html5', **args: Any
+) -> Dict[str, Any]:
+    """
+    Complete event (``"ph": "X"``) of the current process and thread
+    """
+    event = {
+        'name': name,
+        'cat': category,
+        'ph': 'X',
+        'ts': start,
+        'dur': end - start,
+        'pid': os.getpid(),
+        'tid': threading.get_native_id(),
+    }
+    if args:
+        event['args'] = args
+    return event
+
+
+class Tracer:
+    """
+    Spans of the conversion of a document
+    """
+
+    def __init__(self) -> None:
+        self.events: List[Dict[str, Any]] = []
+
+    def span(
+        self, name: str, start: float, end: Optional[float] = None, category: str = 'rst2html5'
+    ) -> None:
+        """
+        Add a span from ``start`` to ``end`` or to now
+        """
+        self.events.append(span_event(name, start, now() if end is None else end, category))
+
+    @contextmanager
+    def measure(self, name: str, category: str = 'rst2html5') -> Iterator[None]:
+        start = now()
+        try:
+            yield
+        finally:
+            self.span(name, start, category=category)
+
+    def trace_transforms(self, transformer: Transformer) -> None:
+        """
+        Add a span for each transform applied from now on by ``transformer``
+        """
+        # the transformer appends each transform to ``applied`` as soon as it is done
+        transformer.applied = _AppliedTransforms(self, transformer.applied)
+
+
+class _AppliedTransforms(list):
+    def __init__(self, tracer: Tracer, applied: Iterable[Any]) -> None:
+        super().__init__(applied)
+        self.tracer = tracer
+        self.last = now()
+
+    def append(self, item: Any) -> None:
+        end = now()
+        self.tracer.span(item[1].__name__, self.last, end, 'transform')
+        self.last = end
+        super().append(item)
+
+
+def get_tracer(document: nodes.document) -> Optional[Tracer]:
+    """
+    Tracer of ``document``, created on first use, or None if the ``trace`` setting is off
+    """
+    tracer = vars(document).get('rst2html5_trace')
+    if tracer is None and getattr(document.settings, 'trace', None):
+        tracer = vars(document)['rst2html5_trace'] = Tracer()
+    return tracer
+
+
+def write_trace(path: str, events: List[Dict[str, Any]]) -> None:
+    """
+    Write ``events`` to ``path`` as a JSON trace.
+    The tracks of the other processes are named after the workers of a batch.
+    """
+    main_pid = os.getpid()
+    workers = sorted({event['pid'] for event in events} - {main_pid})
+    names = {main_pid: 'rst2html5', **{pid: f'worker {i}' for i, pid in enumerate(workers, 1)}}
+    metadata = [
+        {'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': name}}
+        for pid, name in names.items()
+    ]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}, f)
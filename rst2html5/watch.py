@@ -0,0 +1,149 @@
+"""
+Watch mode: convert the sources again whenever they or the files they depend on change.
+
+Usage::
+
+    $ rst2html5 --watch --output-dir build/html docs/
+
+The process stays alive between rebuilds,
+so docutils, Pygments and the settings are loaded only once.
+Changes are detected by polling modification times and sizes,
+which works the same on every platform.
+The files watched are the sources and the dependencies recorded in the batch manifest.
+Only the documents that are not up to date are converted again (see :mod:`rst2html5.batch`).
+The worker processes, the sources and the manifest are kept between rebuilds:
+source directories are walked again only when files are added to or removed from them,
+and only the files that changed are hashed again.
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .batch import Job, OutputCollisionError, build, create_executor, find_sources, load_manifest
+
+Snapshot = Dict[str, Tuple[int, int]]
+
+
+def take_snapshot(paths: Iterable[str], known: Optional[Snapshot] = None) -> Snapshot:
+    """
+    Modification time and size of each existing file.
+    Files in ``known`` keep their previous values.
+    """
+    known = known or {}
+    snapshot = {}
+    for path in paths:
+        if path in known:
+            snapshot[path] = known[path]
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+
+def changed_files(old: Snapshot, new: Snapshot) -> List[str]:
+    """
+    Files created, changed or deleted between two snapshots
+    """
+    return [path for path in {*old, *new} if old.get(path) != new.get(path)]
+
+
+class Watcher:
+    """
+    State kept between the builds of a watch session:
+    the sources, the directories they were found in and the manifest.
+    """
+
+    def __init__(self, settings: Any) -> None:
+        self.settings = settings
+        self.manifest = load_manifest(settings)
+        self.sources: List[Job] = []
+        # directories change when files are added to or removed from them
+        self.directories: Snapshot = {}
+        self.find_sources()
+
+    def find_sources(self) -> None:
+        """
+        Walk the source directories again
+        """
+        self.sources = find_sources(self.settings)
+        directories = []
+        for path in map(Path, self.settings._sources):
+            if path.is_dir():
+                directories.append(str(path))
+                directories.extend(str(item) for item in path.rglob('*') if item.is_dir())
+        self.directories = take_snapshot(directories)
+
+    def update_sources(self) -> None:
+        """
+        Find the sources again if a file was added to or removed from a source directory
+        """
+        if take_snapshot(self.directories) == self.directories:
+            return
+        try:
+            self.find_sources()
+        except OutputCollisionError as error:
+            # the previous sources are kept until the collision is resolved
+            print(f'rst2html5: {error}', file=sys.stderr, flush=True)
+
+    def watched_files(self) -> List[str]:
+        """
+        Sources and the files their outputs were built from
+        """
+        paths = {source for source, _ in self.sources}
+        for files in self.manifest.outputs.values():
+            paths.update(files)
+        return sorted(paths)
+
+    def snapshot(self, known: Optional[Snapshot] = None) -> Snapshot:
+        self.update_sources()
+        return take_snapshot(self.watched_files(), known)
+
+    def rebuild(self, executor: Optional[ProcessPoolExecutor], force: bool = False) -> None:
+        start = time.perf_counter()
+        summary = build(self.settings, force, self.sources, self.manifest, executor)
+        elapsed = time.perf_counter() - start
+        print(f'rst2html5: {summary} in {elapsed:.3f}s', file=sys.stderr, flush=True)
+
+
+def watch(settings: Any, sleep: Callable[[float], Any] = time.sleep) -> int:
+    """
+    Build the sources and rebuild them on every change until interrupted.
+
+    A rebuild starts only after no change has been seen for ``settings.watch_delay`` seconds,
+    so that saving many files at once triggers a single rebuild.
+    The worker processes are started once for the whole session.
+    """
+    watcher = Watcher(settings)
+    workers = settings.jobs or os.cpu_count() or 1
+    executor = create_executor(settings, workers) if workers > 1 else None
+    try:
+        watcher.rebuild(executor, settings.force)
+        snapshot = watcher.snapshot()
+        print('rst2html5: watching for changes. Press Ctrl+C to stop.', file=sys.stderr, flush=True)
+        while True:
+            sleep(settings.watch_interval)
+            current = watcher.snapshot()
+            if current == snapshot:
+                continue
+            while True:
+                sleep(settings.watch_delay)
+                latest = watcher.snapshot()
+                if latest == current:
+                    break
+                current = latest
+            watcher.manifest.forget(changed_files(snapshot, current))
+            watcher.rebuild(executor)
+            # files changed during the rebuild are detected by the next check
+            snapshot = watcher.snapshot(current)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        if executor is not None:
+            executor.shutdown()
@@ -0,0 +1,334 @@
+"""
+WSGI and ASGI application that renders reStructuredText over HTTP.
+
+Serve it with any WSGI or ASGI server, for example::
+
+    $ gunicorn rst2html5.web:application
+    $ uvicorn rst2html5.web:asgi_application
+
+or create one with other settings::
+
+    from rst2html5.web import RenderApp
+
+    app = RenderApp({'indent_output': False}, maxsize=1024)
+    asgi_app = app.asgi
+
+Requests are ``POST`` s of the reStructuredText source.
+The ``parts`` query parameter lists the parts to return, separated by commas.
+The response is a JSON object ``{"parts": {...}}``,
+or the HTML of a single part with ``format=html`` (the ``whole`` document by default)::
+
+    $ curl --data-binary @README.rst 'http://localhost:8000/?parts=title,body'
+    $ curl --data-binary @README.rst 'http://localhost:8000/?format=html'
+
+A JSON request (``Content-Type: application/json``) uses the format of :mod:`rst2html5.daemon`
+and may override the settings listed in ``RenderApp.request_settings``::
+
+    {"source": "...", "settings": {"indent_output": true}, "parts": ["body"]}
+
+Results are cached in memory by a hash of the source, settings and parts,
+which is also the ``ETag`` of the response.
+A request whose ``If-None-Match`` matches gets a ``304 Not Modified`` without rendering anything.
+Identical requests that arrive while the first one is being rendered wait for its result.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs
+
+import docutils
+import pygments
+
+from . import __version__
+from .highlight import LRUCache
+from .renderer import Renderer
+
+MAX_REQUEST_SIZE = 16 * 1024 * 1024
+
+Headers = List[Tuple[str, str]]
+Response = Tuple[int, Headers, bytes]
+
+STATUS = {
+    200: '200 OK',
+    304: '304 Not Modified',
+    400: '400 Bad Request',
+    405: '405 Method Not Allowed',
+    413: '413 Payload Too Large',
+    422: '422 Unprocessable Entity',
+}
+
+
+class RequestError(Exception):
+    """
+    Request that cannot be rendered
+    """
+
+
+def _error(status: int, message: str) -> Response:
+    body = json.dumps({'error': message}).encode('utf-8')
+    return status, [('Content-Type', 'application/json')], body
+
+
+class RenderApp:
+    """
+    Render reStructuredText posted to it.
+    ``settings_overrides`` applies to every request.
+    ``maxsize`` is the number of results kept in memory.
+    """
+
+    # documents come from the network: they must not read files on the server
+    default_overrides = {
+        'file_insertion_enabled': False,
+        'raw_enabled': False,
+    }
+    # settings that a JSON request may change
+    request_settings = frozenset(
+        [
+            'cloak_email_addresses',
+            'doctitle_xform',
+            'footnote_references',
+            'indent_output',
+            'initial_header_level',
+            'language_code',
+            'math_output',
+            'sectnum_xform',
+            'sectsubtitle_xform',
+            'smart_quotes',
+            'syntax_highlight',
+            'trim_footnote_reference_space',
+        ]
+    )
+
+    def __init__(
+        self, settings_overrides: Optional[Dict[str, Any]] = None, maxsize: int = 256
+    ) -> None:
+        self.settings_overrides = {**self.default_overrides, **(settings_overrides or {})}
+        self.renderer = Renderer(self.settings_overrides, read_config_files=False)
+        self.cache = LRUCache(maxsize)
+        self._rendering: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def make_key(self, source: str, overrides: Dict[str, Any], names: Sequence[str]) -> str:
+        data = json.dumps(
+            [
+                __version__,
+                docutils.__version__,
+                pygments.__version__,
+                self.settings_overrides,
+                overrides,
+                list(names),
+                source,
+            ],
+            sort_keys=True,
+            default=repr,
+        )
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def render_parts(
+        self, source: str, overrides: Dict[str, Any], names: Sequence[str]
+    ) -> Dict[str, str]:
+        parts = self.renderer.render(source, overrides)
+        return {name: parts[name] for name in names}
+
+    def render(
+        self, source: str, overrides: Dict[str, Any], names: Sequence[str], key: str
+    ) -> Dict[str, str]:
+        """
+        Return the parts from the cache or render them.
+        Concurrent calls with the same key share a single rendering.
+        """
+        parts = self.cache.get(key)
+        if parts is not None:
+            return parts
+        with self._lock:
+            future = self._rendering.get(key)
+            owner = future is None
+            if future is None:
+                future = self._rendering[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            parts = self.render_parts(source, overrides, names)
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        else:
+            self.cache.put(key, parts)
+            future.set_result(parts)
+        finally:
+            with self._lock:
+                del self._rendering[key]
+        return parts
+
+    def _parse_request(
+        self, query: str, content_type: str, body: bytes
+    ) -> Tuple[str, Dict[str, Any], List[str], str]:
+        params = parse_qs(query)
+        output_format = params.get('format', ['json'])[-1]
+        if output_format not in ('json', 'html'):
+            raise RequestError(f'unknown format {output_format!r}')
+        names = [name for value in params.get('parts', []) for name in value.split(',') if name]
+        try:
+            text = body.decode('utf-8')
+            request = json.loads(text) if content_type.startswith('application/json') else None
+        except ValueError as error:
+            raise RequestError(f'invalid request: {error}') from None
+        source: Any
+        overrides: Dict[str, Any] = {}
+        if request is None:
+            source = text
+        else:
+            if not isinstance(request, dict):
+                raise RequestError('invalid request')
+            source = request.get('source')
+            overrides = request.get('settings', {})
+            names = request.get('parts', names)
+            if (
+                not isinstance(source, str)
+                or not isinstance(overrides, dict)
+                or not isinstance(names, list)
+                or not all(isinstance(name, str) for name in names)
+            ):
+                raise RequestError('invalid request')
+            forbidden = sorted(set(overrides) - self.request_settings)
+            if forbidden:
+                raise RequestError(f'settings not allowed: {", ".join(forbidden)}')
+        if output_format == 'html':
+            names = names or ['whole']
+            if len(names) != 1:
+                raise RequestError('format=html returns a single part')
+        return source, overrides, names or ['body'], output_format
+
+    def respond(self, method: str, query: str, headers: Dict[str, str], body: bytes) -> Response:
+        """
+        Framework-independent request handling.
+        ``headers`` have lowercase names.
+        """
+        if method != 'POST':
+            status, response_headers, content = _error(405, 'only POST is allowed')
+            return status, [*response_headers, ('Allow', 'POST')], content
+        try:
+            source, overrides, names, output_format = self._parse_request(
+                query, headers.get('content-type', ''), body
+            )
+        except RequestError as error:
+            return _error(400, str(error))
+        key = self.make_key(source, overrides, names)
+        etag = f'"{key[:32]}-{output_format}"'
+        if_none_match = [
+            value.strip().replace('W/', '', 1)
+            for value in headers.get('if-none-match', '').split(',')
+        ]
+        if etag in if_none_match or '*' in if_none_match:
+            return 304, [('ETag', etag)], b''
+        try:
+            parts = self.render(source, overrides, names, key)
+        except KeyError as error:
+            return _error(400, f'unknown part {error}')
+        except Exception as error:
+            return _error(422, f'{error.__class__.__name__}: {error}')
+        if output_format == 'html':
+            content = parts[names[0]].encode('utf-8')
+            content_type = 'text/html; charset=utf-8'
+        else:
+            content = json.dumps({'parts': parts}).encode('utf-8')
+            content_type = 'application/json'
+        return 200, [('Content-Type', content_type), ('ETag', etag)], content
+
+    def __call__(self, environ: Dict[str, Any], start_response: Callable) -> Iterable[bytes]:
+        """
+        WSGI application
+        """
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if length > MAX_REQUEST_SIZE:
+            status, headers, content = _error(413, 'request too large')
+        else:
+            request_headers = {
+                key[5:].replace('_', '-').lower(): value
+                for key, value in environ.items()
+                if key.startswith('HTTP_')
+            }
+            request_headers['content-type'] = environ.get('CONTENT_TYPE', '')
+            body = environ['wsgi.input'].read(length) if length else b''
+            status, headers, content = self.respond(
+                environ['REQUEST_METHOD'], environ.get('QUERY_STRING', ''), request_headers, body
+            )
+        headers.append(('Content-Length', str(len(content))))
+        start_response(STATUS[status], headers)
+        return [content]
+
+    async def asgi(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        """
+        ASGI application. Rendering runs in the default executor of the event loop.
+        """
+        if scope['type'] != 'http':
+            return
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size <= MAX_REQUEST_SIZE:
+                chunks.append(chunk)
+            more_body = message.get('more_body', False)
+        if size > MAX_REQUEST_SIZE:
+            status, headers, content = _error(413, 'request too large')
+        else:
+            request_headers = {
+                name.decode('latin-1').lower(): value.decode('latin-1')
+                for name, value in scope.get('headers', [])
+            }
+            status, headers, content = await asyncio.get_running_loop().run_in_executor(
+                None,
+                self.respond,
+                scope['method'],
+                scope.get('query_string', b'').decode('latin-1'),
+                request_headers,
+                b''.join(chunks),
+            )
+        headers.append(('Content-Length', str(len(content))))
+        await send(
+            {
+                'type': 'http.response.start',
+                'status': status,
+                'headers': [
+                    (name.lower().encode('latin-1'), value.encode('latin-1'))
+                    for name, value in headers
+                ],
+            }
+        )
+        await send({'type': 'http.response.body', 'body': content})
+
+
+_application: Optional[RenderApp] = None
+_application_lock = threading.Lock()
+
+
+def get_application() -> RenderApp:
+    """
+    Return the default application, created on first use
+    """
+    global _application  # noqa: PLW0603
+    with _application_lock:
+        if _application is None:
+            _application = RenderApp()
+        return _application
+
+
+def __getattr__(name: str) -> Any:
+    # ``application`` and ``asgi_application`` are only created when a server loads them,
+    # not when the module is imported by the daemon or the command line
+    if name == 'application':
+        return get_application()
+    if name == 'asgi_application':
+        return get_application().asgi
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -6,15 +6,16 @@ for more information.
 
 import sys
 from pathlib import Path
+from typing import Any, Dict, cast
 
-from docutils.core import default_description, publish_cmdline
+from docutils.core import default_description
 
 # inserts <venv>/lib/<python_version>/site-packages before <venv>/bin in sys.path
 # so that ``from rst2html5 ...`` reaches <venv>/lib/<python_version>/site-packages/rst2html5
 # instead of docutils' <venv>/bin/rst2html5.py
 sys.path.insert(0, str(Path(__file__).parent.absolute()))
 
-from rst2html5 import HTML5Writer  # noqa E402
+from rst2html5 import HTML5Writer, memory, profiling, stats, tracing  # noqa E402
 
 
 def main() -> None:
@@ -22,4 +23,27 @@ def main() -> None:
         'Generates (X)HTML5 documents from standalone reStructuredText sources.'
         + default_description
     )
-    publish_cmdline(writer=HTML5Writer(), description=description)
+    # imported on demand: converting a single document should not pay for them
+    if {'--batch', '--watch'} & set(sys.argv[1:]):
+        from rst2html5 import batch
+
+        sys.exit(batch.main(description=description))
+    if '--daemon' in sys.argv[1:]:
+        from rst2html5 import daemon
+
+        sys.exit(daemon.main(description=description))
+    # same as docutils.core.publish_cmdline, but also measures the parse phase
+    pub = stats.Publisher(writer=HTML5Writer())
+    pub.set_components('standalone', 'restructuredtext', 'null')
+    try:
+        pub.publish(description=description, enable_exit_status=True)
+    finally:
+        parts = cast(Dict[str, Any], pub.writer.parts)
+        if 'stats' in parts:
+            print(stats.format_stats(parts['stats']), file=sys.stderr)
+        if 'profile' in parts:
+            print(profiling.format_profile(parts['profile']), file=sys.stderr)
+        if 'trace' in parts:
+            tracing.write_trace(pub.settings.trace, parts['trace'])  # type: ignore[attr-defined]
+        if 'memory' in parts:
+            print(memory.format_memory(parts['memory']), file=sys.stderr)
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+import pytest
+from docutils.core import publish_parts
+
+from rst2html5 import HTML5Writer, aio
+
+RST = 'Title\n=====\n\nSome *text*.\n'
+OVERRIDES = {'indent_output': False}
+
+
+@pytest.fixture
+def renderer() -> Iterator[aio.AsyncRenderer]:
+    renderer = aio.AsyncRenderer(max_concurrency=2)
+    yield renderer
+    renderer.close()
+
+
+def test_render_returns_the_writer_parts() -> None:
+    parts = asyncio.run(aio.render(RST, OVERRIDES))
+    expected = publish_parts(RST, writer=HTML5Writer(), settings_overrides=OVERRIDES)
+    assert parts == dict(expected)
+
+
+def test_render_many_keeps_the_order(renderer: aio.AsyncRenderer) -> None:
+    sources = [f'Text {index}' for index in range(10)]
+    results = asyncio.run(renderer.render_many(sources, OVERRIDES))
+    assert [parts['body'] for parts in results] == [f'<p>Text {index}</p>' for index in range(10)]
+
+
+def test_render_errors(renderer: aio.AsyncRenderer) -> None:
+    source = '.. include:: missing.rst\n'
+    with pytest.raises(aio.RenderError, match='missing.rst'):
+        asyncio.run(renderer.render(source))
+    results = asyncio.run(renderer.render_many([source, RST], return_exceptions=True))
+    assert isinstance(results[0], aio.RenderError)
+    assert results[1]['title'] == 'Title'
+
+
+def test_process_executor() -> None:
+    with ProcessPoolExecutor(2) as executor:
+        renderer = aio.AsyncRenderer(executor, max_concurrency=2)
+        results = asyncio.run(
+            renderer.render_many([RST, '.. include:: missing.rst\n'], return_exceptions=True)
+        )
+    assert results[0]['title'] == 'Title'
+    assert isinstance(results[1], aio.RenderError)
+
+
+def test_concurrency_is_bounded(
+    renderer: aio.AsyncRenderer, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    running: List[int] = []
+    counter = [0]
+    lock = threading.Lock()
+    render_parts = aio.render_parts
+
+    def slow_render_parts(
+        source: str, settings_overrides: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        with lock:
+            counter[0] += 1
+            running.append(counter[0])
+        time.sleep(0.02)
+        with lock:
+            counter[0] -= 1
+        return render_parts(source, settings_overrides)
+
+    monkeypatch.setattr(aio, 'render_parts', slow_render_parts)
+    renderer.executor = aio.ThreadPoolExecutor(8)
+    asyncio.run(renderer.render_many([RST] * 8))
+    assert max(running) == 2
+
+
+def test_timeout_keeps_the_slot_until_the_conversion_ends(
+    renderer: aio.AsyncRenderer, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    release = threading.Event()
+    render_parts = aio.render_parts
+
+    def blocked_render_parts(
+        source: str, settings_overrides: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        release.wait(5)
+        return render_parts(source, settings_overrides)
+
+    async def scenario() -> None:
+        monkeypatch.setattr(aio, 'render_parts', blocked_render_parts)
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await renderer.render(RST, timeout=0.01)
+        # both slots are still taken by the blocked conversions
+        monkeypatch.setattr(aio, 'render_parts', render_parts)
+        with pytest.raises(asyncio.TimeoutError):
+            await renderer.render(RST, timeout=0.05)
+        release.set()
+        parts = await renderer.render(RST, timeout=5)
+        assert parts['title'] == 'Title'
+
+    asyncio.run(scenario())
+
+
+def test_cancellation(renderer: aio.AsyncRenderer) -> None:
+    async def scenario() -> None:
+        task = asyncio.ensure_future(renderer.render(RST))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert (await renderer.render(RST))['title'] == 'Title'
+
+    asyncio.run(scenario())
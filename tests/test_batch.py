@@ -0,0 +1,121 @@
+from pathlib import Path
+
+import pytest
+
+from rst2html5 import batch
+
+RST = 'Title\n=====\n\nSome text.\n'
+
+
+@pytest.fixture
+def source_tree(tmp_path: Path) -> Path:
+    source = tmp_path / 'source'
+    (source / 'sub').mkdir(parents=True)
+    (source / 'index.rst').write_text(RST)
+    (source / 'sub' / 'page.rst').write_text(RST)
+    (source / 'sub' / 'broken.rst').write_text('.. include:: missing.rst\n')
+    (source / 'notes.txt').write_text(RST)
+    return source
+
+
+def test_collect_sources_mirrors_directories(source_tree: Path, tmp_path: Path) -> None:
+    output = tmp_path / 'output'
+    jobs = list(batch.collect_sources([str(source_tree)], str(output)))
+    assert jobs == [
+        (str(source_tree / 'index.rst'), str(output / 'index.html')),
+        (str(source_tree / 'sub' / 'broken.rst'), str(output / 'sub' / 'broken.html')),
+        (str(source_tree / 'sub' / 'page.rst'), str(output / 'sub' / 'page.html')),
+    ]
+
+
+def test_collect_sources_skips_duplicates(source_tree: Path, tmp_path: Path) -> None:
+    output = tmp_path / 'output'
+    paths = [str(source_tree / 'index.rst'), str(source_tree / 'index.rst')]
+    assert list(batch.collect_sources(paths, str(output))) == [
+        (str(source_tree / 'index.rst'), str(output / 'index.html'))
+    ]
+
+
+def test_output_collision(source_tree: Path, tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    (source_tree / 'sub' / 'index.rst').write_text(RST)
+    output = tmp_path / 'output'
+    paths = [str(source_tree / 'index.rst'), str(source_tree / 'sub' / 'index.rst')]
+    with pytest.raises(batch.OutputCollisionError, match='would both be converted to'):
+        list(batch.collect_sources(paths, str(output)))
+    with pytest.raises(SystemExit):
+        batch.main(['--batch', '--output-dir', str(output), *paths])
+    assert 'would both be converted to' in capsys.readouterr().err
+    assert not output.exists()
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_batch_reports_failures_per_file(
+    source_tree: Path, tmp_path: Path, capsys: pytest.CaptureFixture, jobs: int
+) -> None:
+    output = tmp_path / 'output'
+    argv = ['--batch', '--output-dir', str(output), '-j', str(jobs), str(source_tree)]
+    assert batch.main(argv) == 1
+    assert '<h1>Title</h1>' in (output / 'index.html').read_text()
+    assert '<h1>Title</h1>' in (output / 'sub' / 'page.html').read_text()
+    assert not (output / 'notes.html').exists()
+    stderr = capsys.readouterr().err
+    assert 'broken.rst: SystemMessage' in stderr
+    assert '2 documents converted, 1 failed' in stderr
+
+
+def test_batch_source_suffix(source_tree: Path, tmp_path: Path) -> None:
+    output = tmp_path / 'output'
+    argv = ['--batch', '--output-dir', str(output), '--source-suffix', '.txt', str(source_tree)]
+    assert batch.main(argv) == 0
+    assert (output / 'notes.html').exists()
+    assert not (output / 'index.html').exists()
+
+
+def test_batch_skips_up_to_date_documents(
+    tmp_path: Path, capsys: pytest.CaptureFixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    source = Path('source')
+    source.mkdir()
+    (source / 'index.rst').write_text('Title\n=====\n\n.. include:: part.txt\n')
+    (source / 'other.rst').write_text(RST)
+    (source / 'part.txt').write_text('included')
+    Path('style.css').write_text('p {}')
+    argv = ['--batch', '--output-dir', 'output', '--stylesheet-inline', 'style.css', 'source']
+
+    def run(*options: str) -> str:
+        capsys.readouterr()
+        assert batch.main([*argv, *options]) == 0
+        return capsys.readouterr().err
+
+    assert '2 documents converted, 0 failed, 0 up to date' in run()
+    assert '0 documents converted, 0 failed, 2 up to date' in run()
+    (source / 'part.txt').write_text('changed')
+    assert '1 documents converted, 0 failed, 1 up to date' in run()
+    assert 'changed' in Path('output/index.html').read_text()
+    Path('style.css').write_text('p {color: red}')
+    assert '2 documents converted, 0 failed, 0 up to date' in run()
+    assert '2 documents converted, 0 failed, 0 up to date' in run('--force')
+    assert '2 documents converted, 0 failed, 0 up to date' in run('--stylesheet', 'extra.css')
+    Path('output/other.html').unlink()
+    assert '1 documents converted, 0 failed, 1 up to date' in run('--stylesheet', 'extra.css')
+
+
+def test_upgrade_rebuilds_documents(
+    source_tree: Path,
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    argv = ['--batch', '--output-dir', str(tmp_path / 'output'), str(source_tree / 'index.rst')]
+    assert batch.main(argv) == 0
+    monkeypatch.setattr(batch.pygments, '__version__', '0.0')
+    capsys.readouterr()
+    assert batch.main(argv) == 0
+    assert '1 documents converted, 0 failed, 0 up to date' in capsys.readouterr().err
+
+
+def test_convert_outside_a_worker(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(batch, '_worker_settings', None)
+    with pytest.raises(RuntimeError, match='not initialized'):
+        batch._convert(('index.rst', 'index.html'))
@@ -0,0 +1,73 @@
+import json
+from io import StringIO
+from pathlib import Path
+
+import pytest
+from docutils.core import publish_string
+
+from benchmarks import corpus, percentile, scaling
+from benchmarks.generate import SHAPES, generate
+from rst2html5 import HTML5Writer
+
+
+def test_percentile() -> None:
+    values = [5.0, 1.0, 4.0, 2.0, 3.0]
+    assert percentile(values, 0.5) == 3.0
+    assert percentile(values, 0.99) == 5.0
+    assert percentile(values, 0) == 1.0
+
+
+def test_corpus_benchmark(tmp_path: Path) -> None:
+    documents = corpus.load_corpus()
+    names = {document.name for document in documents}
+    assert {
+        'cases/include',
+        'html4css1.rst',
+        'data/standard.txt',
+        'data/table_complex.txt',
+    } <= names
+
+    output = tmp_path / 'results.json'
+    assert corpus.main(['--repeat', '2', '--filter', 'table_*', '--json', str(output)]) == 0
+    result = json.loads(output.read_text())
+    assert set(result['documents']) == {
+        'data/table_colspan.txt',
+        'data/table_complex.txt',
+        'data/table_rowspan.txt',
+    }
+    summary = result['summary']
+    assert summary['conversions'] == 6
+    assert summary['documents_per_second'] > 0
+    assert summary['p50'] <= summary['p99']
+    assert summary['peak_memory'] > 0
+    assert 'documents_per_second' in corpus.compare(result, result)
+    # results saved without a metric, such as those of an older version
+    del result['summary']['peak_memory']
+    row = corpus.compare(result, result).splitlines()[-1]
+    assert row.split() == ['peak_memory', '-', '-', '-']
+
+
+@pytest.mark.parametrize('name', sorted(SHAPES))
+def test_generated_documents_are_valid(name: str) -> None:
+    source = generate(name, 3)
+    assert source == generate(name, 3)
+    warnings = StringIO()
+    publish_string(
+        source,
+        writer=HTML5Writer(),
+        settings_overrides={'warning_stream': warnings, 'halt_level': 2},
+    )
+    assert warnings.getvalue() == ''
+
+
+def test_growth_exponent() -> None:
+    assert scaling.growth_exponent([1, 2, 4], [3, 12, 48]) == pytest.approx(2)
+
+
+@pytest.mark.benchmark
+def test_scaling_benchmark() -> None:
+    # sizes large enough for the fixed cost of a conversion not to hide the growth
+    shape = scaling.measure_shape('option_list', steps=3, repeat=3, start=100)
+    assert [step['size'] for step in shape['steps']] == [100, 200, 400]
+    assert shape['steps'][0]['lines'] < shape['steps'][-1]['lines']
+    assert 0 < shape['time_exponent'] < 3
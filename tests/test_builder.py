@@ -0,0 +1,81 @@
+from io import StringIO
+from typing import Any
+
+import pytest
+from docutils import nodes
+from docutils.core import publish_parts
+from genshi.builder import tag as genshi_tag
+
+from rst2html5 import HTML5Translator, HTML5Writer
+from rst2html5.builder import Markup, serialize, tag
+
+from .test_html5writer import TestCase, extract_test_cases, idn_func
+
+
+@pytest.mark.parametrize(
+    'fragment',
+    [
+        tag.p('1 < 2 & "3" > 0'),
+        tag.a('link', href='/search?q="a"&b=<c>', title=None, class_='reference'),
+        tag.br,
+        tag.p,
+        tag.img(src='image.png', alt=''),
+        tag.script(src='script.js', defer='defer'),
+        tag.code(**{'xml:space': 'preserve', 'xml:lang': 'en'}),
+        tag.p('trailing   \n\n\n  spaces\t\n', tag.em('in  \n\nline'), ' text \n\n'),
+        tag.pre('keep   \n\n\n', tag.strong('nested  \n\n'), Markup('<b> raw \n\n</b>')),
+        tag.div(Markup('<span>  \n\n</span>'), ' text'),
+        tag.td(colspan=2)(3, tag.span(class_='x'), [' a', (' b', None)], tag(' c', tag.i)),
+        tag(tag.h1('title'), '\n    ', tag.p('text'), '\n'),
+    ],
+)
+def test_native_serializer_matches_genshi(fragment: Any) -> None:
+    assert serialize(fragment) == serialize(fragment, 'genshi')
+
+
+def test_element_rendering_is_updated() -> None:
+    elem = tag.dt('term')
+    assert elem.render() == '<dt>term</dt>'
+    elem(' ', tag.span('classifier'), class_='term')
+    assert elem.render() == '<dt class="term">term <span>classifier</span></dt>'
+
+
+def test_parent_rendering_releases_children_html() -> None:
+    em = tag.em('text')
+    p = tag.p('some ', em)
+    em.render()
+    html = p.render()
+    assert em._html is None
+    assert p._html == html
+    # the parent is rendered again if it changes
+    assert p('.').render() == '<p>some <em>text</em>.</p>'
+
+
+class GenshiTranslator(HTML5Translator):
+    rst_terms = dict(HTML5Translator.rst_terms, emphasis=(None, 'visit_emphasis', None))
+
+    def visit_emphasis(self, node: nodes.emphasis) -> None:
+        self.context.append(genshi_tag.i(node.astext(), class_='em'), indent=False)
+        raise nodes.SkipNode
+
+
+@pytest.mark.parametrize('serializer', ['native', 'genshi'])
+def test_genshi_builder_elements(serializer: str) -> None:
+    writer = HTML5Writer()
+    writer.translator_class = GenshiTranslator
+    parts = publish_parts(
+        'some *1 < 2* text', writer=writer, settings_overrides={'serializer': serializer}
+    )
+    assert parts['body'].strip() == '<p>some <i class="em">1 &lt; 2</i> text</p>'
+
+
+@pytest.mark.parametrize('test_case', extract_test_cases(), ids=idn_func)
+def test_serializers_produce_same_output(test_case: TestCase) -> None:
+    _, case = test_case
+    outputs = []
+    for serializer in ('native', 'genshi'):
+        overrides = {key: value for key, value in case.items() if key not in ('rst', 'part', 'out')}
+        overrides.update(serializer=serializer, warning_stream=StringIO())
+        parts = publish_parts(case['rst'], writer=HTML5Writer(), settings_overrides=overrides)
+        outputs.append(parts['whole'])
+    assert outputs[0] == outputs[1]
@@ -0,0 +1,95 @@
+"""
+Complexity regression tests.
+
+Each structural feature is converted at sizes N and 4N.
+Whatever the speed of the machine, a linear cost takes about 4 times longer at 4N
+and a quadratic one about 16 times longer.
+
+Only the writer is timed: its transforms, the translation, the serialization and the template.
+Documents are parsed beforehand because the parser belongs to docutils.
+The time of an empty document of the same shape is subtracted
+so that the fixed cost of a conversion does not hide the growth.
+The timed tests are marked ``benchmark`` and only run by ``make bench``.
+"""
+
+import copy
+import gc
+import time
+from io import StringIO
+from typing import Dict
+
+import pytest
+from docutils import nodes
+from docutils.core import publish_doctree, publish_from_doctree
+
+from benchmarks.generate import generate
+from rst2html5 import HTML5Writer
+
+# 4N/N time ratio allowed: between linear (4) and quadratic (16)
+MAX_RATIO = 8
+REPEAT = 5
+ATTEMPTS = 3
+
+# shape: (N, node class repeated at least N times by the shape)
+FEATURES = {
+    'table': (50, nodes.entry),
+    'list_table': (50, nodes.row),
+    'line_blocks': (50, nodes.line_block),
+    'citations': (25, nodes.citation),
+    'option_list': (50, nodes.option_list_item),
+    'figures': (40, nodes.figure),
+    'sections': (50, nodes.section),
+    'targets': (40, nodes.target),
+    'nested_list': (8, nodes.enumerated_list),
+    'block_quotes': (8, nodes.block_quote),
+    'code_blocks': (100, nodes.literal_block),
+    'paragraphs': (40, nodes.reference),
+    'api_reference': (8, nodes.field_list),
+}
+
+
+def parse(shape: str, size: int) -> nodes.document:
+    return publish_doctree(generate(shape, size), settings_overrides={'warning_stream': StringIO()})
+
+
+def write(doctree: nodes.document) -> float:
+    # the writer transforms change the doctree
+    doctree = copy.deepcopy(doctree)
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        publish_from_doctree(
+            doctree, writer=HTML5Writer(), settings_overrides={'warning_stream': StringIO()}
+        )
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def growth_ratio(shape: str, size: int) -> float:
+    doctrees = {key: parse(shape, key) for key in (0, size, 4 * size)}
+    write(doctrees[size])  # warm-up
+    best: Dict[int, float] = {}
+    # sizes are interleaved so that a slow period of the machine affects all of them
+    for _ in range(REPEAT):
+        for key, doctree in doctrees.items():
+            best[key] = min(best.get(key, float('inf')), write(doctree))
+    return (best[4 * size] - best[0]) / (best[size] - best[0])
+
+
+@pytest.mark.parametrize('shape', sorted(FEATURES))
+def test_feature_size(shape: str) -> None:
+    size, node_class = FEATURES[shape]
+    assert len(list(parse(shape, size).findall(node_class))) >= size
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('shape', sorted(FEATURES))
+def test_linear_growth(shape: str) -> None:
+    size, _ = FEATURES[shape]
+    ratios = []
+    for _ in range(ATTEMPTS):
+        ratios.append(growth_ratio(shape, size))
+        if ratios[-1] <= MAX_RATIO:
+            break
+    assert min(ratios) <= MAX_RATIO, f'{shape}: 4N/N time ratios {ratios}'
@@ -0,0 +1,105 @@
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, cast
+
+import pytest
+from docutils.frontend import OptionParser
+
+from rst2html5 import HTML5Writer, daemon
+
+RST = 'Title\n=====\n\nSome *text*.\n'
+
+
+@pytest.fixture(scope='module')
+def server(tmp_path_factory: pytest.TempPathFactory) -> Iterator[daemon.RenderServer]:
+    path = str(tmp_path_factory.mktemp('daemon') / 'rst2html5.sock')
+    settings = OptionParser(
+        components=(daemon.Parser, daemon.Reader, HTML5Writer)
+    ).get_default_values()
+    with daemon.RenderServer(path, settings, workers=1, queue_size=0) as server:
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        yield server
+        server.shutdown()
+        thread.join()
+    assert not Path(path).exists()
+
+
+@pytest.fixture
+def socket_path(server: daemon.RenderServer) -> str:
+    return cast(str, server.server_address)
+
+
+def test_render(socket_path: str) -> None:
+    body = '<section id="title"><h1>Title</h1><p>Some <em>text</em>.</p></section>'
+    parts = daemon.render(
+        RST, socket_path, parts=['title', 'body'], settings={'indent_output': False}
+    )
+    assert parts == {'title': 'Title', 'body': body}
+    parts = daemon.render(RST, socket_path)
+    assert parts['body'].startswith('\n    <section id="title">\n        <h1>Title</h1>')
+
+
+@pytest.mark.parametrize(
+    'source, kwargs, message',
+    [
+        (RST, {'parts': ['nothing']}, "unknown part 'nothing'"),
+        (RST, {'settings': {'_source': 'x'}}, 'settings not allowed: _source'),
+        ('=====\nTitle\n', {}, 'SystemMessage'),
+    ],
+)
+def test_render_errors(socket_path: str, source: str, kwargs: Dict[str, Any], message: str) -> None:
+    with pytest.raises(daemon.DaemonError, match=message):
+        daemon.render(source, socket_path, **kwargs)
+
+
+def test_overload(server: daemon.RenderServer, socket_path: str) -> None:
+    assert server.slots.acquire(blocking=False)
+    try:
+        with pytest.raises(daemon.OverloadError):
+            daemon.render(RST, socket_path)
+    finally:
+        server.slots.release()
+    assert daemon.render(RST, socket_path, parts=['title']) == {'title': 'Title'}
+
+
+@pytest.mark.parametrize(
+    'settings',
+    [
+        {'warning_stream': '/tmp/rst2html5-warnings'},
+        {'stylesheet_inline': ['/etc/hostname']},
+        {'file_insertion_enabled': True},
+    ],
+)
+def test_settings_not_allowed(socket_path: str, settings: Dict[str, Any]) -> None:
+    with pytest.raises(daemon.DaemonError, match='settings not allowed'):
+        daemon.render(RST, socket_path, settings=settings)
+    assert not Path('/tmp/rst2html5-warnings').exists()
+
+
+def test_no_file_insertion(socket_path: str) -> None:
+    source = '.. include:: /etc/hostname\n\n.. raw:: html\n\n    <script></script>\n'
+    body = daemon.render(source, socket_path)['body']
+    assert '"include" directive disabled' in body
+    assert '"raw" directive disabled' in body
+    assert '<script>' not in body
+
+
+def test_socket_path_is_not_a_socket(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    notes = tmp_path / 'notes.txt'
+    notes.write_text('keep me')
+    settings = OptionParser(
+        components=(daemon.Parser, daemon.Reader, HTML5Writer)
+    ).get_default_values()
+    with pytest.raises(daemon.DaemonError, match='is not a socket'):
+        daemon.RenderServer(str(notes), settings, workers=1)
+    with pytest.raises(SystemExit):
+        daemon.main(['--daemon', '--socket', str(notes)])
+    assert 'is not a socket' in capsys.readouterr().err
+    assert notes.read_text() == 'keep me'
+
+
+def test_render_parts_outside_a_worker(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(daemon, '_worker_settings', None)
+    with pytest.raises(RuntimeError, match='worker processes'):
+        daemon.render_parts(RST, {}, ['body'])
@@ -0,0 +1,153 @@
+import re
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict
+
+import pygments
+import pytest
+from docutils.core import publish_parts
+
+from rst2html5 import HTML5Writer
+from rst2html5.highlight import (
+    DiskCache,
+    LRUCache,
+    get_disk_cache,
+    get_formatter,
+    get_lexer,
+    highlight_cache,
+    highlight_code,
+    preload,
+    pygmentize,
+)
+
+
+def test_lru_cache_eviction() -> None:
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # 'b' becomes the least recently used
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    info = cache.info()
+    assert (info.hits, info.misses, info.evictions, info.currsize) == (2, 1, 1, 2)
+
+
+def test_highlight_code_reuses_cached_output() -> None:
+    highlight_cache.clear()
+    code = 'print("hello")'
+    first = highlight_code(code, 'python', hl_lines=[1])
+    second = highlight_code(code, 'python', hl_lines=[1])
+    assert first is second
+    assert highlight_cache.info().hits == 1
+    highlight_code(code, 'python', linenos='table')
+    assert highlight_cache.info().misses == 2
+
+
+@pytest.mark.parametrize(
+    'options',
+    [
+        {},
+        {'hl_lines': [1, 3]},
+        {'linenos': 'table', 'lineanchors': 'name', 'anchorlinenos': True},
+        {'linenos': 'table', 'linenostart': 98, 'lineanchors': 'x', 'anchorlinenos': True},
+        {'linenos': 'table', 'lineanchors': 'x', 'anchorlinenos': True, 'hl_lines': [3]},
+        {'linenos': 'table', 'linenostep': 2, 'linenospecial': 3},
+        {'linenos': 'table', 'linenostart': 5, 'hl_lines': [1, 12]},
+    ],
+)
+@pytest.mark.parametrize(
+    'code',
+    [
+        'def f(x):\n\n    return x  # <comment>\n',
+        ''.join(f'x{i} = {i}\n' for i in range(12)),
+        'no_newline = "&"',
+    ],
+)
+def test_fragments_match_pygments_html(code: str, options: Dict[str, Any]) -> None:
+    # CodeBlockFormatter uses private methods of HtmlFormatter: its fragments must stay
+    # the contents of the <pre> elements of HtmlFormatter
+    html = pygmentize(code, 'python', **options).replace('<span></span>', '')
+    expected = re.findall('<pre.*?>(.*?)\n*</pre>', html, re.DOTALL)
+    fragments = highlight_code(code, 'python', **options)
+    assert [fragment for fragment in fragments[::-1] if fragment is not None] == expected
+
+
+def test_disk_cache_is_shared(tmp_path: Path) -> None:
+    path = str(tmp_path / 'highlight.sqlite')
+    writer = DiskCache(path)
+    key = DiskCache.make_key('x = 1', 'python', ())
+    writer.put(key, '<span>x</span>')
+    reader = DiskCache(path)  # another process would open its own connection
+    assert reader.get(key) == '<span>x</span>'
+    assert reader.get(DiskCache.make_key('x = 2', 'python', ())) is None
+
+
+def test_disk_cache_key_includes_pygments_version(monkeypatch: pytest.MonkeyPatch) -> None:
+    key = DiskCache.make_key('x = 1', 'python', ())
+    monkeypatch.setattr(pygments, '__version__', '0.0')
+    assert DiskCache.make_key('x = 1', 'python', ()) != key
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    cache = DiskCache(str(tmp_path / 'highlight.sqlite'), max_size=20)
+    cache.put('a', 'a' * 10)
+    cache.put('b', 'b' * 10)
+    assert cache.get('a')  # 'b' becomes the least recently used
+    cache.put('c', 'c' * 10)
+    assert cache.get('b') is None
+    assert cache.get('a') and cache.get('c')
+
+
+def read_disk_cache(path: str, key: str) -> Any:
+    return get_disk_cache(path, 1024).get(key)
+
+
+def test_disk_caches_save_recency_at_exit(tmp_path: Path) -> None:
+    path = str(tmp_path / 'highlight.sqlite')
+    DiskCache(path).put('a', 'a')
+    with sqlite3.connect(path) as connection:
+        connection.execute('UPDATE highlight SET used = 0')
+    # the recency of a single hit is only saved when the worker process exits
+    with ProcessPoolExecutor(1) as executor:
+        assert executor.submit(read_disk_cache, path, 'a').result() == 'a'
+    with sqlite3.connect(path) as connection:
+        assert connection.execute('SELECT used FROM highlight').fetchone()[0] > 0
+
+
+def test_disk_cache_errors_are_skipped(tmp_path: Path) -> None:
+    # a directory cannot be opened as a database
+    cache = DiskCache(str(tmp_path))
+    cache.put('a', 'a')
+    assert cache.get('a') is None
+    rst = '.. code-block:: python\n\n    print("no cache")\n'
+    highlight_cache.clear()
+    overrides = {'highlight_cache': str(tmp_path)}
+    body = publish_parts(rst, writer=HTML5Writer(), settings_overrides=overrides)['body']
+    assert '<span class="nb">print</span>' in body
+
+
+def test_code_block_uses_disk_cache(tmp_path: Path) -> None:
+    path = str(tmp_path / 'highlight.sqlite')
+    rst = '.. code-block:: python\n\n    print("disk cache")\n'
+    overrides = {'highlight_cache': path}
+    highlight_cache.clear()
+    first = publish_parts(rst, writer=HTML5Writer(), settings_overrides=overrides)['body']
+    highlight_cache.clear()
+    cache = get_disk_cache(path, 1024 * 1024)
+    with sqlite3.connect(path) as connection:
+        assert connection.execute('SELECT COUNT(*) FROM highlight').fetchone()[0] == 1
+    second = publish_parts(rst, writer=HTML5Writer(), settings_overrides=overrides)['body']
+    assert first == second
+    assert highlight_cache.info().misses == 1
+    cache.close()
+
+
+def test_lexers_and_formatters_are_reused() -> None:
+    preload(['python'])
+    assert get_lexer('python') is get_lexer('python')
+    options = (('hl_lines', (1, 2)), ('linenos', False))
+    formatter = get_formatter(options)
+    assert formatter is get_formatter(options)
+    assert formatter.hl_lines == {1, 2}
@@ -11,6 +11,7 @@ from rst2html5 import HTML5Writer
 
 tmpdir = gettempdir()
 TestCase = Tuple[str, Dict[str, Any]]
+LINK = '`link`_\n\n.. _link: http://example.com'
 
 
 def rst_to_html5_part(case: Dict[str, Any]) -> Tuple[str, Any]:
@@ -70,3 +71,20 @@ def test_rst_case(test_case: TestCase) -> None:
         filename.with_suffix('.error.result').write_text(case_error)
     assert expected == result
     assert case_error == error
+
+
+def test_pseudoxml_part_before_translation() -> None:
+    writer = HTML5Writer()
+    publish_parts(LINK, writer=writer)
+    assert '<reference name="link" refuri="http://example.com">' in writer.parts['pseudoxml']
+
+
+def test_no_pseudoxml_part() -> None:
+    writer = HTML5Writer()
+    parts = publish_parts(LINK, writer=writer, settings_overrides={'pseudoxml_part': False})
+    assert 'pseudoxml' not in parts
+    assert parts['body'] == publish_parts(LINK, writer=HTML5Writer())['body']
+    # a writer used again does not keep the part of the previous document
+    publish_parts(LINK, writer=writer)
+    parts = publish_parts(LINK, writer=writer, settings_overrides={'pseudoxml_part': False})
+    assert 'pseudoxml' not in parts
@@ -0,0 +1,99 @@
+"""
+Checks shared by the settings that add a measurement part to the output:
+the part is only computed on request, it doesn't change the HTML
+and the command line and batch builds report it.
+"""
+
+import sys
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import pytest
+from docutils.core import publish_parts
+
+import rst2html5_
+from rst2html5 import HTML5Writer, batch
+from rst2html5.renderer import Renderer
+
+RST = """Title
+=====
+
+Some *text*.
+
+One
+---
+
+.. code-block:: python
+
+    def f(x):
+        return x
+
+Two
+---
+
++-----+-----+
+| a   | b   |
++-----+-----+
+"""
+
+# setting: (value, part, text of the command line report, text of the report of two documents)
+# reports are written to stderr, or to the file named by the value in the temporary directory
+FEATURES: Dict[str, Tuple[Any, str, str, str]] = {
+    'stats': (True, 'stats', 'code blocks: 1', 'documents: 2, '),
+    'profile': (True, 'profile', 'CodeBlock.run', 'visit_table'),
+    'trace': ('trace.json', 'trace', '"translate"', '"document"'),
+    'memory_profile': (True, 'memory', 'retained', 'highest peak: '),
+}
+
+
+def option(setting: str, tmp_path: Path) -> str:
+    value = FEATURES[setting][0]
+    name = '--' + setting.replace('_', '-')
+    return name if value is True else f'{name}={tmp_path / value}'
+
+
+def report(setting: str, tmp_path: Path, capsys: pytest.CaptureFixture) -> str:
+    value = FEATURES[setting][0]
+    stderr = capsys.readouterr().err
+    return stderr if value is True else (tmp_path / value).read_text()
+
+
+def test_no_parts_by_default() -> None:
+    parts = publish_parts(RST, writer=HTML5Writer())
+    for _, part, _, _ in FEATURES.values():
+        assert part not in parts
+
+
+@pytest.mark.parametrize('setting', sorted(FEATURES))
+def test_part_does_not_change_the_output(setting: str) -> None:
+    value, part, _, _ = FEATURES[setting]
+    renderer = Renderer(read_config_files=False)
+    parts = renderer.render(RST, {setting: value})
+    assert part in parts
+    assert parts['whole'] == renderer.render(RST)['whole']
+
+
+@pytest.mark.parametrize('setting', sorted(FEATURES))
+def test_command_line(
+    setting: str, tmp_path: Path, capsys: pytest.CaptureFixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    source = tmp_path / 'source.rst'
+    source.write_text(RST)
+    destination = tmp_path / 'source.html'
+    argv = ['rst2html5', option(setting, tmp_path), str(source), str(destination)]
+    monkeypatch.setattr(sys, 'argv', argv)
+    rst2html5_.main()
+    assert FEATURES[setting][2] in report(setting, tmp_path, capsys)
+    assert '<h1>Title</h1>' in destination.read_text()
+
+
+@pytest.mark.parametrize('setting', sorted(FEATURES))
+def test_batch(setting: str, tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    source = tmp_path / 'source'
+    source.mkdir()
+    (source / 'a.rst').write_text(RST)
+    (source / 'b.rst').write_text(RST)
+    output = tmp_path / 'output'
+    argv = ['--batch', option(setting, tmp_path), '--output-dir', str(output), str(source)]
+    assert batch.main(argv) == 0
+    assert FEATURES[setting][3] in report(setting, tmp_path, capsys)
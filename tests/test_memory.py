@@ -0,0 +1,74 @@
+import tracemalloc
+from pathlib import Path
+
+import pytest
+from docutils.core import publish_parts
+from docutils.utils import SystemMessage
+
+from rst2html5 import HTML5Writer
+from rst2html5.memory import MEMORY_PHASES, format_memory, format_memory_summary
+from rst2html5.renderer import Renderer
+
+from .test_instrumentation import RST
+
+
+def test_memory_part() -> None:
+    parts = Renderer(read_config_files=False).render(RST, {'memory_profile': True})
+    memory = parts['memory']
+    assert list(memory) == list(MEMORY_PHASES)
+    for values in memory.values():
+        assert values['peak'] >= values['retained']
+        assert len(values['top']) <= 5
+    # the doctree and the whole document are still referenced at the end of their phases
+    assert memory['parse']['retained'] > 0
+    assert memory['template']['retained'] >= len(parts['whole'])
+    assert not tracemalloc.is_tracing()
+
+
+def test_top_sites_exclude_the_profiler() -> None:
+    memory = Renderer(read_config_files=False).render(RST, {'memory_profile': True})['memory']
+    sites = [site['site'] for values in memory.values() for site in values['top']]
+    assert sites
+    assert not any(site.startswith(str(Path(tracemalloc.__file__))) for site in sites)
+    assert not any('rst2html5/memory.py' in site for site in sites)
+
+
+def test_tracing_started_elsewhere_is_left_on() -> None:
+    tracemalloc.start()
+    try:
+        parts = publish_parts(
+            RST, writer=HTML5Writer(), settings_overrides={'memory_profile': True}
+        )
+        memory = parts['memory']  # type: ignore[typeddict-item]
+        assert 'parse' not in memory
+        assert 'translate' in memory
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_tracing_stops_on_errors() -> None:
+    renderer = Renderer(read_config_files=False)
+    with pytest.raises(SystemMessage):
+        renderer.render('`unclosed', {'memory_profile': True, 'halt_level': 2})
+    assert not tracemalloc.is_tracing()
+
+
+def test_format_memory() -> None:
+    memory = Renderer(read_config_files=False).render(RST, {'memory_profile': True})['memory']
+    lines = format_memory(memory).splitlines()
+    assert lines[0].split() == ['phase', 'peak', 'retained']
+    assert [line.split()[0] for line in lines[1:] if not line.startswith(' ')] == list(
+        MEMORY_PHASES
+    )
+
+
+def test_format_memory_summary() -> None:
+    renderer = Renderer(read_config_files=False)
+    memories = {
+        name: renderer.render(source, {'memory_profile': True})['memory']
+        for name, source in (('small.rst', 'Text.\n'), ('large.rst', RST * 10))
+    }
+    lines = format_memory_summary(memories).splitlines()
+    assert [line.split()[0] for line in lines[1:3]] == ['large.rst', 'small.rst']
+    assert 'highest peak: large.rst' in lines
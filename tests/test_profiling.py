@@ -0,0 +1,39 @@
+import time
+
+from rst2html5.profiling import Profile, format_profile, merge_profiles
+from rst2html5.renderer import Renderer
+
+from .test_instrumentation import RST
+
+
+def test_profile_part() -> None:
+    profile = Renderer(read_config_files=False).render(RST, {'profile': True})['profile']
+    assert profile['visit_table']['calls'] == 1
+    assert profile['depart_entry']['calls'] == 2
+    assert profile['visit_emphasis']['calls'] == 1
+    assert profile['visit_Text']['calls'] > 1
+    assert profile['CodeBlock.run']['calls'] == 1
+    assert all(entry['time'] >= 0 for entry in profile.values())
+
+
+def test_nested_time_is_not_counted_twice() -> None:
+    profile = Profile()
+    with profile.measure('outer'), profile.measure('inner'):
+        time.sleep(0.01)
+    assert profile.entries['inner'][1] >= 0.01
+    assert profile.entries['outer'][1] < 0.01
+    with profile.measure('outer'):
+        pass
+    assert profile.as_dict()['outer']['calls'] == 2
+
+
+def test_merge_and_format_profiles() -> None:
+    renderer = Renderer(read_config_files=False)
+    profiles = [renderer.render(RST, {'profile': True})['profile'] for _ in range(2)]
+    total = merge_profiles(profiles)
+    assert total['visit_table']['calls'] == 2
+    lines = format_profile(total).splitlines()
+    assert lines[0].split()[:2] == ['handler', 'calls']
+    times = [float(line.split()[2]) for line in lines[1:]]
+    assert times == sorted(times, reverse=True)
+    assert len(format_profile(total, top=3).splitlines()) == 4
@@ -0,0 +1,101 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from pathlib import Path
+
+import pytest
+from docutils.core import publish_doctree, publish_parts
+from docutils.parsers.rst import Parser
+from docutils.utils import SystemMessage
+
+from rst2html5 import HTML5Writer
+from rst2html5.renderer import Renderer, ReusableParser
+
+from .test_html5writer import TestCase, extract_test_cases, idn_func
+from .test_threads import DIRECTIVES
+
+# a single renderer converts every case, so that anything left by a case shows up in the next ones
+renderer = Renderer({'indent_output': True}, read_config_files=False)
+reusable_parser = ReusableParser()
+
+FUNCTIONAL_TESTS = Path(__file__).parent / 'docutils_functional_test'
+FUNCTIONAL_INPUTS = [
+    FUNCTIONAL_TESTS / 'html4css1.rst',
+    *sorted(FUNCTIONAL_TESTS.glob('data/*.txt')),
+]
+
+
+@pytest.mark.parametrize('test_case', extract_test_cases(), ids=idn_func)
+def test_same_output_as_publish_parts(test_case: TestCase) -> None:
+    _, case = test_case
+    overrides = {key: value for key, value in case.items() if key not in ('rst', 'part', 'out')}
+    overrides.setdefault('indent_output', True)
+    expected_errors = StringIO()
+    overrides['warning_stream'] = expected_errors
+    expected = dict(publish_parts(case['rst'], writer=HTML5Writer(), settings_overrides=overrides))
+    errors = StringIO()
+    overrides['warning_stream'] = errors
+    parts = renderer.render(case['rst'], overrides)
+    assert parts[case['part']] == expected[case['part']]
+    assert errors.getvalue() == expected_errors.getvalue()
+
+
+@pytest.mark.parametrize('path', FUNCTIONAL_INPUTS, ids=lambda path: path.name)
+def test_same_doctree_as_docutils_parser(path: Path) -> None:
+    # ReusableParser.parse is a copy of Parser.parse that keeps the state machine
+    doctrees = []
+    for parser in (Parser(), reusable_parser):
+        warnings = StringIO()
+        doctree = publish_doctree(
+            path.read_text(encoding='utf-8'),
+            source_path=str(path),
+            parser=parser,
+            settings_overrides={'warning_stream': warnings},
+        )
+        doctrees.append((doctree.pformat(), warnings.getvalue()))
+    assert doctrees[0] == doctrees[1]
+
+
+def test_directives_do_not_leak() -> None:
+    renderer = Renderer({'stylesheet': ['global.css'], 'identifiers': ['global']})
+    first = renderer.render(DIRECTIVES)['whole']
+    assert 'Defined' in first
+    assert 'Global' in first
+    assert renderer.render(DIRECTIVES)['whole'] == first
+    whole = renderer.render('.. ifdef:: local\n\n    Defined')['whole']
+    assert 'local' not in whole
+    assert 'Defined' not in whole
+    assert 'global.css' in whole
+    assert renderer.settings.stylesheet == ['global.css']
+    assert renderer.settings.identifiers == ['global']
+
+
+def test_overrides_apply_to_a_single_call() -> None:
+    renderer = Renderer({'indent_output': False})
+    source = 'Title\n=====\n\nText.'
+    assert (
+        renderer.render(source)['body']
+        == '<section id="title"><h1>Title</h1><p>Text.</p></section>'
+    )
+    assert renderer.render(source, {'initial_header_level': 3})['body'] == (
+        '<section id="title"><h3>Title</h3><p>Text.</p></section>'
+    )
+    assert (
+        renderer.render(source)['body']
+        == '<section id="title"><h1>Title</h1><p>Text.</p></section>'
+    )
+
+
+def test_errors_are_raised_and_do_not_break_the_renderer() -> None:
+    renderer = Renderer({'halt_level': 2, 'indent_output': False, 'warning_stream': StringIO()})
+    with pytest.raises(SystemMessage):
+        renderer.render('`unclosed')
+    assert renderer.render('*Text*')['body'] == '<p><em>Text</em></p>'
+
+
+def test_renderer_shared_by_threads() -> None:
+    sources = [f'Title {i}\n========\n\n* item {i}\n* ``code``\n' for i in range(40)]
+    expected = [publish_parts(source, writer=HTML5Writer())['body'] for source in sources]
+    renderer = Renderer()
+    with ThreadPoolExecutor(8) as executor:
+        bodies = list(executor.map(lambda source: renderer.render(source)['body'], sources * 4))
+    assert bodies == expected * 4
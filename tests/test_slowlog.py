@@ -0,0 +1,109 @@
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+from docutils.frontend import OptionParser
+
+from rst2html5 import HTML5Writer, batch, daemon
+from rst2html5.renderer import Renderer
+from rst2html5.slowlog import TOP_NODES, expensive_nodes
+
+RST = """Title
+=====
+
+.. code-block:: python
+
+    x = 1
+
++-----+-----+
+| a   | b   |
++-----+-----+
+
+Some *text*.
+"""
+
+
+def read_log(path: Path) -> List[Dict[str, Any]]:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_slow_documents_are_logged(tmp_path: Path) -> None:
+    log = tmp_path / 'slow.jsonl'
+    renderer = Renderer({'slow_log': str(log), 'slow_threshold': 0.0}, read_config_files=False)
+    parts = renderer.render(RST)
+    renderer.render(RST)
+    entries = read_log(log)
+    assert len(entries) == 2
+    entry = entries[0]
+    assert entry['source'] is None
+    assert entry['sha256'] == hashlib.sha256(RST.encode('utf-8')).hexdigest()
+    assert entry['size'] == len(RST)
+    assert entry['elapsed'] > entry['threshold'] == 0
+    assert entry['nodes'] > 0
+    assert {'parse', 'highlight', 'transforms', 'translate', 'write'} <= set(entry['phases'])
+    assert entry['node_types']['entry'] == 2
+    assert entry['code_blocks']['calls'] == 1
+    times = [node['time'] for node in entry['expensive_nodes']]
+    assert times == sorted(times, reverse=True)
+    assert len(times) == TOP_NODES
+    # the slow log does not turn on the stats and profile parts
+    assert 'stats' not in parts
+    assert 'profile' not in parts
+
+
+def test_fast_documents_are_not_logged(tmp_path: Path) -> None:
+    log = tmp_path / 'slow.jsonl'
+    Renderer({'slow_log': str(log)}, read_config_files=False).render(RST)
+    assert not log.exists()
+
+
+def test_expensive_nodes() -> None:
+    profile = {
+        'visit_entry': {'calls': 4, 'time': 0.1},
+        'depart_entry': {'calls': 4, 'time': 0.2},
+        'visit_Text': {'calls': 9, 'time': 0.25},
+        'CodeBlock.run': {'calls': 1, 'time': 1.0},
+    }
+    assert expensive_nodes(profile) == [
+        {'type': 'entry', 'calls': 4, 'time': pytest.approx(0.3)},
+        {'type': 'Text', 'calls': 9, 'time': 0.25},
+    ]
+
+
+def test_batch_slow_log(tmp_path: Path) -> None:
+    source = tmp_path / 'source'
+    source.mkdir()
+    (source / 'a.rst').write_text(RST)
+    (source / 'b.rst').write_text(RST)
+    log = tmp_path / 'slow.jsonl'
+    argv = ['--batch', '-j', '2', '--slow-log', str(log), '--slow-threshold', '0']
+    assert batch.main([*argv, '--output-dir', str(tmp_path / 'out'), str(source)]) == 0
+    sources = sorted(entry['source'] for entry in read_log(log))
+    assert sources == [str(source / 'a.rst'), str(source / 'b.rst')]
+
+
+def test_daemon_slow_log(tmp_path: Path) -> None:
+    log = tmp_path / 'slow.jsonl'
+    settings = OptionParser(
+        components=(daemon.Parser, daemon.Reader, HTML5Writer)
+    ).get_default_values()
+    settings.slow_log = str(log)
+    settings.slow_threshold = 0.0
+    path = str(tmp_path / 'rst2html5.sock')
+    with daemon.RenderServer(path, settings, workers=1, queue_size=0) as server:
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            daemon.render(RST, path)
+            with pytest.raises(daemon.DaemonError, match='settings not allowed'):
+                daemon.render(RST, path, settings={'slow_log': str(tmp_path / 'other.jsonl')})
+        finally:
+            server.shutdown()
+            thread.join()
+    # the warm-up document of the worker is logged too
+    entries = read_log(log)
+    assert entries[-1]['sha256'] == hashlib.sha256(RST.encode('utf-8')).hexdigest()
+    assert not (tmp_path / 'other.jsonl').exists()
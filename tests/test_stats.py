@@ -0,0 +1,40 @@
+import pytest
+from docutils.core import publish_parts
+
+from rst2html5 import HTML5Writer
+from rst2html5.renderer import Renderer
+from rst2html5.stats import PHASES, format_stats, merge_stats
+
+from .test_instrumentation import RST
+
+
+def test_stats_part() -> None:
+    stats = Renderer(read_config_files=False).render(RST, {'stats': True})['stats']
+    assert list(stats['phases']) == list(PHASES)
+    assert stats['code_blocks'] == 1
+    assert stats['nodes'] > 0
+    assert stats['output_bytes'] > 0
+    # highlight is part of parse
+    assert stats['total']['wall'] == pytest.approx(
+        sum(value['wall'] for name, value in stats['phases'].items() if name != 'highlight')
+    )
+
+
+def test_parse_is_only_measured_by_stats_publisher() -> None:
+    parts = publish_parts(RST, writer=HTML5Writer(), settings_overrides={'stats': True})
+    stats = parts['stats']  # type: ignore[typeddict-item]
+    assert 'parse' not in stats['phases']
+    assert 'translate' in stats['phases']
+
+
+def test_merge_stats() -> None:
+    renderer = Renderer(read_config_files=False)
+    stats = [renderer.render(RST, {'stats': True})['stats'] for _ in range(2)]
+    total = merge_stats(stats)
+    assert total['documents'] == 2
+    assert total['code_blocks'] == 2
+    assert total['nodes'] == stats[0]['nodes'] * 2
+    report = format_stats(total)
+    assert 'documents: 2' in report
+    for name in PHASES:
+        assert name in report
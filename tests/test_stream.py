@@ -0,0 +1,88 @@
+from io import StringIO
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+from docutils.core import Publisher, publish_file, publish_string
+from docutils.io import FileOutput, StringInput
+
+from rst2html5 import HTML5Writer
+
+from .test_html5writer import TestCase, extract_test_cases, idn_func
+
+DOCUMENT = """\
+Title
+=====
+
+:author: Somebody
+:keywords: stream
+
+.. meta::
+    :description: streaming test
+
+First
+-----
+
+Some *text* and math :math:`x^2`.
+
+Second
+------
+
+More text.
+"""
+
+
+def publish_to_file(rst: str, path: Path, overrides: Dict[str, Any]) -> str:
+    publish_file(
+        source=StringIO(rst),
+        source_path='<string>',
+        destination_path=str(path),
+        writer=HTML5Writer(),
+        settings_overrides=overrides,
+    )
+    return path.read_text()
+
+
+@pytest.mark.parametrize('test_case', extract_test_cases(), ids=idn_func)
+def test_stream_output_is_the_same(test_case: TestCase, tmp_path: Path) -> None:
+    _, case = test_case
+    overrides = {key: value for key, value in case.items() if key not in ('rst', 'part', 'out')}
+    overrides['warning_stream'] = StringIO()
+    expected = publish_string(
+        case['rst'], source_path='<string>', writer=HTML5Writer(), settings_overrides=overrides
+    ).decode()
+    overrides.update(stream=True, warning_stream=StringIO())
+    assert publish_to_file(case['rst'], tmp_path / 'output.html', overrides) == expected
+
+
+def test_head_is_written_first(tmp_path: Path) -> None:
+    expected = publish_string(DOCUMENT, writer=HTML5Writer()).decode()
+    output = publish_to_file(DOCUMENT, tmp_path / 'output.html', {'stream': True})
+    assert output == expected
+    head = output.partition('</head>')[0]
+    assert '<meta content="streaming test" name="description" />' in head
+    assert '<meta content="Somebody" name="author" />' in head
+    assert 'MathJax.js' in head
+
+
+class Chunks(list):
+    def write(self, data: str) -> None:
+        self.append(data)
+
+    def close(self) -> None:
+        pass
+
+
+def test_sections_are_written_as_they_are_translated() -> None:
+    chunks = Chunks()
+    publisher = Publisher(
+        writer=HTML5Writer(), source_class=StringInput, destination=FileOutput(destination=chunks)
+    )
+    publisher.set_components('standalone', 'restructuredtext', 'null')
+    publisher.process_programmatic_settings(None, {'stream': True}, None)
+    publisher.set_source(DOCUMENT)
+    publisher.publish()
+    assert ''.join(chunks) == publish_string(DOCUMENT, writer=HTML5Writer()).decode()
+    assert chunks[0].endswith('<body>')
+    assert any(chunk.lstrip().startswith('<section id="first">') for chunk in chunks)
+    assert publisher.writer.parts['body'] == ''
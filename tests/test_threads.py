@@ -0,0 +1,84 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from typing import Any, Dict, List, Tuple
+
+from docutils.core import publish_parts
+from docutils.frontend import OptionParser
+from docutils.parsers.rst import Parser
+from docutils.readers.standalone import Reader
+
+from rst2html5 import HTML5Writer
+
+from .test_html5writer import extract_test_cases
+
+DIRECTIVES = """\
+.. define:: local
+.. stylesheet:: local.css
+.. script:: local.js
+.. template:: <body>{body}</body>
+
+.. ifdef:: local
+
+    Defined
+
+.. ifdef:: global
+
+    Global
+"""
+
+
+def make_settings(**overrides: Any) -> Any:
+    overrides['warning_stream'] = StringIO()
+    return OptionParser(
+        components=(Parser, Reader, HTML5Writer), defaults=overrides
+    ).get_default_values()
+
+
+def test_directives_do_not_change_settings() -> None:
+    settings = make_settings(stylesheet=['global.css'], script=[], identifiers=['global'])
+    outputs = {
+        publish_parts(DIRECTIVES, writer=HTML5Writer(), settings=settings)['whole']
+        for _ in range(3)
+    }
+    assert len(outputs) == 1
+    whole = outputs.pop()
+    assert 'Defined' in whole
+    assert 'Global' in whole
+    assert settings.stylesheet == ['global.css']
+    assert settings.script == []
+    assert settings.identifiers == ['global']
+    assert settings.template is None
+    assert 'local' not in publish_parts('Text', writer=HTML5Writer(), settings=settings)['whole']
+
+
+def test_concurrent_translation_with_shared_settings() -> None:
+    """
+    Every test case is translated many times at once by many threads
+    that share the settings of each case. The output must not change.
+    """
+    jobs: List[Tuple[str, Any, str, str]] = []
+    expected: Dict[str, Any] = {}
+    for name, case in extract_test_cases():
+        overrides = {
+            key: value for key, value in case.items() if key not in ('rst', 'part', 'out', 'error')
+        }
+        overrides.setdefault('indent_output', True)
+        part = case['part']
+        expected[name] = dict(
+            publish_parts(
+                case['rst'],
+                writer=HTML5Writer(),
+                settings_overrides={**overrides, 'warning_stream': StringIO()},
+            )
+        )[part]
+        jobs.extend([(name, make_settings(**overrides), case['rst'], part)] * 4)
+    random.Random(0).shuffle(jobs)
+
+    def translate(job: Tuple[str, Any, str, str]) -> Tuple[str, Any]:
+        name, settings, rst, part = job
+        return name, dict(publish_parts(rst, writer=HTML5Writer(), settings=settings))[part]
+
+    with ThreadPoolExecutor(8) as executor:
+        for name, output in executor.map(translate, jobs):
+            assert output == expected[name], name
@@ -0,0 +1,73 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from rst2html5 import batch
+from rst2html5.renderer import Renderer
+from rst2html5.tracing import write_trace
+
+from .test_instrumentation import RST
+
+
+def test_trace_part() -> None:
+    events = Renderer(read_config_files=False).render(RST, {'trace': 'unused.json'})['trace']
+    names = {(event['cat'], event['name']) for event in events}
+    for name in ('read', 'parse', 'highlight', 'translate', 'serialize', 'template', 'write'):
+        assert ('phase', name) in names
+    assert ('transform', 'DocTitle') in names
+    assert ('transform', 'WrapTopTitle') in names
+    assert {name for category, name in names if category == 'section'} == {
+        'section one',
+        'section two',
+    }
+    assert all(event['ph'] == 'X' and event['dur'] >= 0 for event in events)
+
+
+def test_trace_spans_are_in_order() -> None:
+    events = Renderer(read_config_files=False).render(RST, {'trace': 'unused.json'})['trace']
+    start = {event['name']: event['ts'] for event in events}
+    assert start['read'] <= start['parse'] <= start['DocTitle'] <= start['translate']
+    assert start['translate'] <= start['section one'] <= start['section two'] <= start['write']
+
+
+def test_write_trace(tmp_path: Path) -> None:
+    events = Renderer(read_config_files=False).render(RST, {'trace': 'unused.json'})['trace']
+    trace = tmp_path / 'trace.json'
+    write_trace(str(trace), events)
+    written = json.loads(trace.read_text())['traceEvents']
+    assert written[0] == {
+        'name': 'process_name',
+        'ph': 'M',
+        'pid': os.getpid(),
+        'tid': 0,
+        'args': {'name': 'rst2html5'},
+    }
+    assert written[1:] == events
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_batch_trace(tmp_path: Path, jobs: int) -> None:
+    source = tmp_path / 'source'
+    source.mkdir()
+    for name in ('a', 'b', 'c'):
+        (source / f'{name}.rst').write_text(RST)
+    (source / 'broken.rst').write_text('.. include:: missing.rst\n')
+    trace = tmp_path / 'trace.json'
+    argv = ['--batch', '-j', str(jobs), f'--trace={trace}', '--output-dir', str(tmp_path / 'out')]
+    assert batch.main([*argv, str(source)]) == 1
+    events = json.loads(trace.read_text())['traceEvents']
+    documents = {event['name']: event for event in events if event.get('cat') == 'document'}
+    assert sorted(Path(name).name for name in documents) == [
+        'a.rst',
+        'b.rst',
+        'broken.rst',
+        'c.rst',
+    ]
+    assert 'error' in documents[str(source / 'broken.rst')]['args']
+    tracks = {event['args']['name'] for event in events if event['ph'] == 'M'}
+    if jobs == 1:
+        assert tracks == {'rst2html5'}
+    else:
+        assert 'worker 1' in tracks
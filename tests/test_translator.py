@@ -0,0 +1,46 @@
+from typing import Any, Dict
+
+from docutils.core import publish_parts
+from docutils.nodes import emphasis
+
+from rst2html5 import HTML5Translator, HTML5Writer
+
+
+class UnderlineTranslator(HTML5Translator):
+    rst_terms: Dict[str, Any] = dict(
+        HTML5Translator.rst_terms, emphasis=('u', 'visit_em', 'default_departure')
+    )
+
+    def visit_em(self, node: emphasis) -> None:
+        self.default_visit(node)
+
+
+class UnderlineWriter(HTML5Writer):
+    def __init__(self) -> None:
+        super().__init__()
+        self.translator_class = UnderlineTranslator
+
+
+def test_subclass_has_its_own_dispatch_table() -> None:
+    rst = '*text*'
+    overrides = {'indent_output': False}
+    body = publish_parts(rst, writer=UnderlineWriter(), settings_overrides=overrides)['body']
+    assert body == '<p><u>text</u></p>'
+    body = publish_parts(rst, writer=HTML5Writer(), settings_overrides=overrides)['body']
+    assert body == '<p><em>text</em></p>'
+    assert '_dispatch_table' in UnderlineTranslator.__dict__
+    assert UnderlineTranslator._parse_plans[emphasis] == ('u', False, True)
+    assert HTML5Translator._parse_plans[emphasis] == ('em', False, False)
+
+
+def test_rst_terms_handlers_are_attributes() -> None:
+    translator = HTML5Translator.__new__(HTML5Translator)
+    assert translator.visit_strong == translator.default_visit
+    assert translator.depart_block_quote == translator.default_departure
+
+
+def test_attribute_map() -> None:
+    rst = '.. _target:\n\n`link <http://example.com>`_'
+    overrides = {'indent_output': False}
+    body = publish_parts(rst, writer=HTML5Writer(), settings_overrides=overrides)['body']
+    assert body == '<p id="target"><a href="http://example.com">link</a></p>'
@@ -0,0 +1,103 @@
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from rst2html5 import batch, watch
+
+RST = 'Title\n=====\n\n.. include:: part.txt\n'
+
+
+def test_take_snapshot(tmp_path: Path) -> None:
+    path = tmp_path / 'index.rst'
+    path.write_text(RST)
+    missing = str(tmp_path / 'missing.rst')
+    snapshot = watch.take_snapshot([str(path), missing])
+    assert list(snapshot) == [str(path)]
+    assert watch.take_snapshot([str(path), missing], {missing: (0, 0)})[missing] == (0, 0)
+    path.write_text(RST * 2)
+    assert watch.take_snapshot([str(path)]) != snapshot
+
+
+def test_watch_rebuilds_changed_documents(
+    tmp_path: Path, capsys: pytest.CaptureFixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    source = Path('source')
+    source.mkdir()
+    (source / 'index.rst').write_text(RST)
+    (source / 'part.txt').write_text('included')
+    (source / 'other.rst').write_text('Other\n=====\n')
+    delays: List[float] = []
+    edits = [
+        lambda: None,
+        # a burst of changes is rebuilt once
+        lambda: (source / 'part.txt').write_text('changed once'),
+        lambda: (source / 'part.txt').write_text('changed twice'),
+        lambda: None,
+        lambda: None,
+        lambda: (source / 'new.rst').write_text('New\n===\n'),
+        lambda: None,
+    ]
+
+    def sleep(seconds: float) -> None:
+        delays.append(seconds)
+        if not edits:
+            raise KeyboardInterrupt
+        edits.pop(0)()
+
+    settings = batch.BatchOptionParser(
+        components=(batch.Parser, batch.Reader, batch.HTML5Writer, batch.BatchSettingsSpec)
+    ).parse_args(['--watch', '--output-dir', 'output', '--watch-delay', '0.1', 'source'])
+    assert watch.watch(settings, sleep) == 0
+    assert delays == [0.5, 0.5, 0.1, 0.1, 0.5, 0.5, 0.1, 0.5]
+    assert 'changed twice' in Path('output/index.html').read_text()
+    assert Path('output/new.html').exists()
+    lines = [line for line in capsys.readouterr().err.splitlines() if 'converted' in line]
+    assert len(lines) == 3
+    assert '2 documents converted, 0 failed, 0 up to date in ' in lines[0]
+    assert '1 documents converted, 0 failed, 1 up to date in ' in lines[1]
+    assert '1 documents converted, 0 failed, 2 up to date in ' in lines[2]
+
+
+def test_watch_keeps_its_state(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    source = Path('source')
+    source.mkdir()
+    (source / 'index.rst').write_text(RST)
+    (source / 'part.txt').write_text('included')
+    calls: Dict[str, int] = {}
+
+    def counted(name: str) -> Any:
+        func = getattr(watch, name)
+
+        def wrapper(*args: Any) -> Any:
+            calls[name] = calls.get(name, 0) + 1
+            return func(*args)
+
+        monkeypatch.setattr(watch, name, wrapper)
+
+    for name in ('create_executor', 'find_sources', 'load_manifest'):
+        counted(name)
+    edits = [
+        lambda: (source / 'part.txt').write_text('changed'),
+        lambda: None,
+        lambda: None,
+        lambda: (source / 'new.rst').write_text('New\n===\n'),
+        lambda: None,
+        lambda: None,
+    ]
+
+    def sleep(seconds: float) -> None:
+        if not edits:
+            raise KeyboardInterrupt
+        edits.pop(0)()
+
+    settings = batch.BatchOptionParser(
+        components=(batch.Parser, batch.Reader, batch.HTML5Writer, batch.BatchSettingsSpec)
+    ).parse_args(['--watch', '-j', '2', '--output-dir', 'output', 'source'])
+    assert watch.watch(settings, sleep) == 0
+    assert 'changed' in Path('output/index.html').read_text()
+    assert Path('output/new.html').exists()
+    # the sources are only searched again when a file is added
+    assert calls == {'create_executor': 1, 'find_sources': 2, 'load_manifest': 1}
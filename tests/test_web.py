@@ -0,0 +1,203 @@
+import asyncio
+import io
+import json
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from wsgiref.util import setup_testing_defaults
+
+import pytest
+
+from rst2html5 import web
+from rst2html5.web import RenderApp
+
+RST = 'Title\n=====\n\nSome *text*.\n'
+BODY = '<section id="title"><h1>Title</h1><p>Some <em>text</em>.</p></section>'
+
+
+def call(
+    app: RenderApp,
+    body: bytes = RST.encode(),
+    query: str = '',
+    method: str = 'POST',
+    headers: Optional[Dict[str, str]] = None,
+) -> Tuple[str, Dict[str, str], bytes]:
+    environ: Dict[str, Any] = {
+        'REQUEST_METHOD': method,
+        'QUERY_STRING': query,
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    }
+    for name, value in (headers or {}).items():
+        key = name.upper().replace('-', '_')
+        environ[key if key == 'CONTENT_TYPE' else f'HTTP_{key}'] = value
+    setup_testing_defaults(environ)
+    response: List[Any] = []
+    content = b''.join(app(environ, lambda status, headers: response.extend([status, headers])))
+    return response[0], dict(response[1]), content
+
+
+@pytest.fixture
+def app() -> RenderApp:
+    return RenderApp({'indent_output': False}, maxsize=2)
+
+
+def test_json_response(app: RenderApp) -> None:
+    status, headers, content = call(app, query='parts=title,body')
+    assert status == '200 OK'
+    assert headers['Content-Type'] == 'application/json'
+    assert json.loads(content) == {'parts': {'title': 'Title', 'body': BODY}}
+
+
+def test_html_response(app: RenderApp) -> None:
+    status, headers, content = call(app, query='format=html')
+    assert status == '200 OK'
+    assert headers['Content-Type'] == 'text/html; charset=utf-8'
+    assert content.decode().startswith('<!DOCTYPE html>')
+    assert call(app, query='format=html&parts=body')[2] == BODY.encode()
+
+
+def test_json_request(app: RenderApp) -> None:
+    request = {'source': RST, 'settings': {'initial_header_level': 2}, 'parts': ['body']}
+    headers = {'Content-Type': 'application/json'}
+    status, _, content = call(app, json.dumps(request).encode(), headers=headers)
+    assert status == '200 OK'
+    assert '<h2>Title</h2>' in json.loads(content)['parts']['body']
+
+
+@pytest.mark.parametrize(
+    'kwargs, status, message',
+    [
+        ({'method': 'GET'}, '405 Method Not Allowed', 'only POST is allowed'),
+        ({'query': 'format=xml'}, '400 Bad Request', "unknown format 'xml'"),
+        ({'query': 'parts=nothing'}, '400 Bad Request', "unknown part 'nothing'"),
+        ({'query': 'format=html&parts=title,body'}, '400 Bad Request', 'single part'),
+        (
+            {'body': b'{"source": "x", "settings": {"stylesheet_inline": ["/etc/passwd"]}}'},
+            '400 Bad Request',
+            'settings not allowed: stylesheet_inline',
+        ),
+        ({'body': b'[1, 2]'}, '400 Bad Request', 'invalid request'),
+        ({'body': b'{"source": "x'}, '400 Bad Request', 'invalid request'),
+        ({'body': b'A\n=\n\nB\n-\n\nC\n=\n\nD\n~\n'}, '422 Unprocessable Entity', 'SystemMessage'),
+    ],
+)
+def test_errors(app: RenderApp, kwargs: Dict[str, Any], status: str, message: str) -> None:
+    if kwargs.get('body', b'').startswith((b'{', b'[')):
+        kwargs['headers'] = {'Content-Type': 'application/json'}
+    response_status, headers, content = call(app, **kwargs)
+    assert response_status == status
+    assert headers['Content-Type'] == 'application/json'
+    assert message in json.loads(content)['error']
+
+
+def test_files_are_not_read(app: RenderApp) -> None:
+    status, _, content = call(app, b'.. include:: /etc/passwd\n', 'format=html&parts=body')
+    assert status == '200 OK'
+    assert b'"include" directive disabled' in content
+    assert b'root:' not in content
+
+
+def test_cache_and_etag(app: RenderApp, monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = []
+    render_parts = app.render_parts
+
+    def counting_render_parts(*args: Any) -> Dict[str, str]:
+        calls.append(args)
+        return render_parts(*args)
+
+    monkeypatch.setattr(app, 'render_parts', counting_render_parts)
+    _, headers, content = call(app)
+    etag = headers['ETag']
+    assert call(app)[2] == content
+    assert len(calls) == 1
+    assert call(app, query='format=html')[1]['ETag'] != etag
+    assert call(app, RST.encode() + b'More.\n')[1]['ETag'] != etag
+    assert len(calls) == 3
+
+    status, headers, content = call(app, headers={'If-None-Match': f'"other", W/{etag}'})
+    assert status == '304 Not Modified'
+    assert headers['ETag'] == etag
+    assert content == b''
+    # the ETag depends only on the request: no rendering is needed to answer a 304
+    app.cache.clear()
+    assert call(app, headers={'If-None-Match': etag})[0] == '304 Not Modified'
+    assert len(calls) == 3
+    # only the last two results are kept
+    for index in range(3):
+        call(app, f'Text {index}'.encode())
+    assert app.cache.info().currsize == 2
+
+
+def test_concurrent_requests_are_coalesced(app: RenderApp, monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+    render_parts = app.render_parts
+
+    def slow_render_parts(
+        source: str, overrides: Dict[str, Any], names: Sequence[str]
+    ) -> Dict[str, str]:
+        calls.append(source)
+        started.set()
+        release.wait(5)
+        return render_parts(source, overrides, names)
+
+    waiting = []
+
+    class CountingFuture(Future):
+        def result(self, timeout: Optional[float] = None) -> Any:
+            waiting.append(self)
+            return super().result(timeout)
+
+    monkeypatch.setattr(app, 'render_parts', slow_render_parts)
+    monkeypatch.setattr(web, 'Future', CountingFuture)
+    results: List[bytes] = []
+    threads = [threading.Thread(target=lambda: results.append(call(app)[2])) for _ in range(4)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    while len(waiting) < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len(results) == 4
+    assert len(set(results)) == 1
+
+
+def test_asgi(app: RenderApp) -> None:
+    messages: List[Dict[str, Any]] = [
+        {'type': 'http.request', 'body': RST.encode()[:5], 'more_body': True},
+        {'type': 'http.request', 'body': RST.encode()[5:]},
+    ]
+    sent: List[Dict[str, Any]] = []
+
+    async def receive() -> Dict[str, Any]:
+        return messages.pop(0)
+
+    async def send(message: Dict[str, Any]) -> None:
+        sent.append(message)
+
+    scope = {
+        'type': 'http',
+        'method': 'POST',
+        'query_string': b'parts=body',
+        'headers': [(b'content-type', b'text/x-rst')],
+    }
+    asyncio.run(app.asgi(scope, receive, send))
+    assert sent[0]['status'] == 200
+    assert (b'content-type', b'application/json') in sent[0]['headers']
+    assert json.loads(sent[1]['body']) == {'parts': {'body': BODY}}
+
+
+def test_default_application(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(web, '_application', None)
+    assert isinstance(web.application, RenderApp)
+    assert web.application is web.get_application()
+    assert web.asgi_application == web.application.asgi
+    with pytest.raises(AttributeError):
+        web.unknown  # noqa: B018